@@ -3,13 +3,16 @@
 # ==============================================================================
 
 import streamlit as st
-import asyncio
-import json
-from typing import List, Optional
-from pydantic import BaseModel, Field
-from agents import Agent, Runner, function_tool
+import time
+from agents import RunConfig
+from agents.tracing import gen_trace_id
 from dotenv import load_dotenv
-import os
+
+from model_client import run_in_background, iterate_in_background, install_pooled_client, get_connection_stats
+from response_cache import CachedResponse
+from recommendation import BookRecommendation, MovieRecommendation, Recommender, model as recommendation_model
+from sessions import SessionStore
+from tracing_export import install_tracing
 
 # Load environment variables
 load_dotenv()
@@ -167,148 +170,59 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-model = os.getenv('MODEL_CHOICE', 'gpt-4.1-nano')
-
-# --- Models for structured outputs ---
+# --- Agents and caches (only once per server process) ---
 
-class BookRecommendation(BaseModel):
-    title: str
-    author: str
-    genre: str
-    reading_time_hours: int
-    reason: str = Field(description="Why this book is recommended")
+@st.cache_resource
+def get_recommender():
+    """Create the agents, caches and router once and share them."""
+    return Recommender()
 
-class MovieRecommendation(BaseModel):
-    title: str
-    director: str
-    genre: str
-    duration_minutes: int
-    reason: str = Field(description="Why this movie is recommended")
+def initialize_agents():
+    """The entertainment agent (with its specialists)."""
+    return get_recommender().agent
 
-class EntertainmentPlan(BaseModel):
-    activity_type: str
-    recommendation: str
-    time_needed: str
-    why_chosen: str
+def get_response_cache():
+    """The on-disk response cache."""
+    return get_recommender().response_cache
 
-# --- Tools ---
+def get_similarity_cache():
+    """In-memory cache that also matches paraphrased questions."""
+    return get_recommender().similarity_cache
 
-@function_tool
-def get_book_info(genre: str) -> str:
-    """Get information about popular books in a specific genre."""
-    book_database = {
-        "mystery": [
-            {"title": "The Girl with the Dragon Tattoo", "author": "Stieg Larsson", "hours": 15},
-            {"title": "Gone Girl", "author": "Gillian Flynn", "hours": 12}
-        ],
-        "romance": [
-            {"title": "Pride and Prejudice", "author": "Jane Austen", "hours": 10},
-            {"title": "The Notebook", "author": "Nicholas Sparks", "hours": 8}
-        ],
-        "fantasy": [
-            {"title": "Harry Potter and the Sorcerer's Stone", "author": "J.K. Rowling", "hours": 9},
-            {"title": "The Hobbit", "author": "J.R.R. Tolkien", "hours": 11}
-        ]
-    }
-    
-    if genre.lower() in book_database:
-        books = book_database[genre.lower()]
-        return json.dumps(books)
-    else:
-        return "Genre not found in our database."
+def get_router():
+    """Local router that skips the triage turn for obvious book/movie requests."""
+    return get_recommender().router
 
-@function_tool
-def get_movie_info(genre: str) -> str:
-    """Get information about popular movies in a specific genre."""
-    movie_database = {
-        "comedy": [
-            {"title": "The Grand Budapest Hotel", "director": "Wes Anderson", "minutes": 99},
-            {"title": "Superbad", "director": "Greg Mottola", "minutes": 113}
-        ],
-        "action": [
-            {"title": "Mad Max: Fury Road", "director": "George Miller", "minutes": 120},
-            {"title": "John Wick", "director": "Chad Stahelski", "minutes": 101}
-        ],
-        "drama": [
-            {"title": "The Shawshank Redemption", "director": "Frank Darabont", "minutes": 142},
-            {"title": "Forrest Gump", "director": "Robert Zemeckis", "minutes": 142}
-        ]
-    }
-    
-    if genre.lower() in movie_database:
-        movies = movie_database[genre.lower()]
-        return json.dumps(movies)
-    else:
-        return "Genre not found in our database."
+@st.cache_resource
+def get_session_store():
+    """Conversation histories (in memory, backed by SQLite)."""
+    return SessionStore()
 
-# --- Initialize Agents (only once) ---
+def current_session():
+    """This browser tab's conversation; its id lives in st.session_state."""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = SessionStore.new_id()
+    return get_session_store().get(st.session_state["session_id"])
 
-@st.cache_resource
-def initialize_agents():
-    """Initialize agents once and cache them."""
-    
-    book_agent = Agent(
-        name="Book Specialist",
-        handoff_description="Expert who recommends books based on your preferences",
-        instructions="""
-        You are a friendly book specialist who loves helping people find their next great read!
-        
-        Use the get_book_info tool to find books in the genre the user wants.
-        Pick the best option and explain why it's perfect for them.
-        
-        Be enthusiastic about reading and make the person excited to start their book!
-        """,
-        model=model,
-        tools=[get_book_info],
-        output_type=BookRecommendation
-    )
+# --- Helper Functions ---
 
-    movie_agent = Agent(
-        name="Movie Specialist", 
-        handoff_description="Expert who recommends movies based on your preferences",
-        instructions="""
-        You are a movie buff who loves helping people find the perfect film to watch!
-        
-        Use the get_movie_info tool to find movies in the genre the user wants.
-        Pick the best option and explain why they'll love it.
-        
-        Be exciting about movies and make them want to grab popcorn and start watching!
-        """,
-        model=model,
-        tools=[get_movie_info],
-        output_type=MovieRecommendation
-    )
+def get_cached_recommendation(query: str):
+    """Look for an answer in the similarity cache, then in the on-disk cache."""
+    return get_recommender().cached(query)
 
-    entertainment_agent = Agent(
-        name="Entertainment Helper",
-        instructions="""
-        You are a friendly entertainment assistant who helps people decide what to do in their free time!
-        
-        You can help with:
-        1. General entertainment advice
-        2. Hand off to book specialist for book recommendations
-        3. Hand off to movie specialist for movie recommendations
-        
-        Be enthusiastic and helpful! When someone asks specifically about books or movies, 
-        hand them off to the right specialist.
-        
-        For general questions, give friendly advice about entertainment options.
-        """,
-        model=model,
-        tools=[],
-        handoffs=[book_agent, movie_agent],
-        output_type=EntertainmentPlan
-    )
-    
-    return entertainment_agent
+def save_recommendation(query: str, response: CachedResponse):
+    """Remember an answer in both caches."""
+    get_recommender().save(query, response)
 
-# --- Helper Functions ---
+async def get_recommendation(query: str, session=None, **run_kwargs):
+    """Get recommendation from the entertainment agent (or from the cache)."""
+    return await get_recommender().recommend(query, session=session, **run_kwargs)
 
-async def get_recommendation(query: str):
-    """Get recommendation from the entertainment agent."""
-    entertainment_agent = initialize_agents()
-    result = await Runner.run(entertainment_agent, query)
-    return result
+def new_run_config():
+    """Give the next run its own trace id, so we can show its timing afterwards."""
+    trace_id = gen_trace_id()
+    st.session_state["last_trace_id"] = trace_id
+    return RunConfig(trace_id=trace_id, workflow_name="Entertainment recommendation")
 
 def display_book_recommendation(book):
     """Display book recommendation in a nice format."""
@@ -352,9 +266,116 @@ def display_general_plan(plan):
     st.write(f"**Time Needed:** {plan.time_needed}")
     st.write(f"**Why This Choice:** {plan.why_chosen}")
 
+def display_result(final_output):
+    """Show who answered and the recommendation."""
+    if isinstance(final_output, BookRecommendation):
+        st.info("🔄 Handed off to: Book Specialist")
+        display_book_recommendation(final_output)
+    elif isinstance(final_output, MovieRecommendation):
+        st.info("🔄 Handed off to: Movie Specialist")
+        display_movie_recommendation(final_output)
+    else:
+        st.info("🔄 Handled by: Main Entertainment Agent")
+        display_general_plan(final_output)
+
+def display_partial(fields):
+    """Show the fields of an answer that is still being written."""
+    for name, value in fields.items():
+        st.write(f"**{name.replace('_', ' ').title()}:** {value}")
+
+def show_streamed_recommendation(query: str, session):
+    """Show the agents' progress live and fill in the answer as it arrives."""
+    start = time.perf_counter()
+    status, preview = None, st.empty()
+    first_content_seconds = None
+    final = None
+    # Caches first (first questions only), then the router, the agents and the cascade
+    run_config = new_run_config()
+    for update in iterate_in_background(get_recommender().recommend_stream(query, session=session, run_config=run_config)):
+        if update.kind == "final":
+            final = update
+        elif status is None:
+            # Only drawn when the agents run (a cached answer comes as the one and only update)
+            status = st.status("Finding the perfect recommendation for you...", expanded=True)
+        if update.kind == "route" and update.text != "triage":
+            status.write(f"⚡ Sent straight to {update.agent}")
+        elif update.kind == "agent":
+            status.write(f"🤖 {update.agent} is working on it...")
+        elif update.kind == "handoff":
+            status.write(f"🔄 Handed off to: {update.text}")
+        elif update.kind == "tool_call":
+            status.write(f"🛠️ Calling `{update.tool_name}` {update.text or ''}")
+        elif update.kind == "tool_output":
+            status.write("✅ Tool finished")
+        elif update.kind == "escalate":
+            status.write(f"🔁 {update.text}...")
+        elif update.kind == "partial":
+            if first_content_seconds is None:
+                first_content_seconds = time.perf_counter() - start
+            with preview.container():
+                display_partial(update.fields)
+    
+    if final.cached:
+        st.session_state["last_trace_id"] = None
+        st.caption("⚡ Served from cache")
+    else:
+        total_seconds = time.perf_counter() - start
+        first = f"first content after {first_content_seconds:.2f}s, " if first_content_seconds is not None else ""
+        status.update(label=f"Done ({first}total {total_seconds:.2f}s)", state="complete", expanded=False)
+    preview.empty()
+    get_session_store().add_turn(session, query, final.final_output, final.agent)
+    display_result(final.final_output)
+
+def display_waterfall(trace_id):
+    """Draw when each agent turn, model call, tool call and handoff started and how long it took."""
+    if "last_trace_id" not in st.session_state:
+        st.write("Ask for a recommendation first.")
+        return
+    if trace_id is None:
+        st.write("⚡ The last answer came from the cache, no agents ran.")
+        return
+    trace = install_tracing().get_trace(trace_id)
+    if trace is None or not trace["spans"]:
+        st.write("No timing recorded for the last request.")
+        return
+    
+    import altair as alt
+    icons = {"agent": "🤖", "generation": "🧠", "response": "🧠", "function": "🛠️", "handoff": "🔄"}
+    rows = []
+    for order, span in enumerate(trace["spans"]):
+        rows.append({
+            "order": order,
+            "span": f"{'  ' * span['depth']}{icons.get(span['type'], '•')} {span['name']}",
+            "type": span["type"],
+            "start_ms": span["start_ms"],
+            "end_ms": span["start_ms"] + span["duration_ms"],
+            "duration_ms": span["duration_ms"],
+            "self_ms": span["self_ms"],
+            "tokens": span.get("input_tokens", 0) + span.get("output_tokens", 0),
+            "output_bytes": span.get("output_bytes", 0),
+        })
+    
+    st.write(f"Total: **{trace['duration_ms'] / 1000:.2f}s**")
+    chart = alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+        x=alt.X("start_ms:Q", title="ms"),
+        x2="end_ms:Q",
+        y=alt.Y("span:N", sort=alt.EncodingSortField(field="order"), title=None),
+        color=alt.Color("type:N", legend=None),
+        tooltip=["span:N", "duration_ms:Q", "self_ms:Q", "tokens:Q", "output_bytes:Q"],
+    )
+    st.altair_chart(chart, use_container_width=True)
+
 # --- Main Streamlit App ---
 
 def main():
+    # Keep a span tree of every run (optional traces.jsonl and /metrics endpoint)
+    install_tracing()
+    
+    # Share one event loop and one pooled HTTP client across all requests
+    # (not needed when the agents run on the offline mock model)
+    if isinstance(recommendation_model, str):
+        install_pooled_client()
+    
     # Title and header
     st.title("🎬 Entertainment Helper")
     st.write("Get personalized book and movie recommendations!")
@@ -366,6 +387,44 @@ def main():
     st.sidebar.write("• What should I watch tonight?")
     st.sidebar.write("• I need a good fantasy book")
     
+    # Connection reuse metrics for the shared client
+    with st.sidebar.expander("🔌 Connection stats"):
+        stats = get_connection_stats()
+        st.write(f"Requests: {stats['requests']}")
+        st.write(f"New connections: {stats['new_connections']}")
+        st.write(f"Reused connections: {stats['reused_connections']} ({stats['reuse_ratio']:.0%})")
+    
+    with st.sidebar.expander("⚡ Cache stats"):
+        cache_stats = get_response_cache().stats()
+        st.write(f"Hits: {cache_stats['hits']}")
+        st.write(f"Misses: {cache_stats['misses']}")
+        st.write(f"Hit rate: {cache_stats['hit_rate']:.0%}")
+        st.write(f"Cached answers: {cache_stats['entries']}")
+        similar_stats = get_similarity_cache().stats()
+        st.write(f"Similar-question hits: {similar_stats['hits']} ({similar_stats['hit_rate']:.0%})")
+    
+    with st.sidebar.expander("💰 Usage"):
+        budget = get_recommender().budget
+        usage = budget.tracker.summary()
+        st.write(f"Model: {budget.current_model}")
+        st.write(f"Runs: {usage['runs']}")
+        st.write(f"Tokens: {usage['input_tokens']} in / {usage['output_tokens']} out")
+        st.write(f"Cost: ${usage['cost_usd']:.4f} (budget window: ${usage['window']['spend_usd']:.4f})")
+        for agent_usage in usage["agents"].values():
+            st.caption(f"{agent_usage['agent']}: {agent_usage['input_tokens'] + agent_usage['output_tokens']} tokens, ${agent_usage['cost_usd']:.4f}")
+    
+    with st.sidebar.expander("🧵 Conversation"):
+        session = current_session()
+        st.write(f"Turns: {len(session.turns)} (+ {len(session.summary)} summarized)")
+        st.write(f"History: ~{session.tokens() if session.has_history else 0} / {get_session_store().token_budget} tokens")
+        if st.button("Start a new conversation"):
+            st.session_state["session_id"] = SessionStore.new_id()
+            st.rerun()
+    
+    # Streaming shows progress and partial answers while the agents work
+    stream_results = st.sidebar.toggle("📡 Stream results", value=True)
+    show_timing = st.sidebar.toggle("🕒 Show request timing", value=False)
+    
     # Main input
     user_query = st.text_input(
         "What kind of entertainment are you looking for?",
@@ -375,27 +434,31 @@ def main():
     # Submit button
     if st.button("Get Recommendation", type="primary"):
         if user_query:
-            with st.spinner("Finding the perfect recommendation for you..."):
-                try:
-                    # Get recommendation
-                    result = asyncio.run(get_recommendation(user_query))
+            try:
+                session = current_session()
+                if stream_results:
+                    show_streamed_recommendation(user_query, session)
+                else:
+                    with st.spinner("Finding the perfect recommendation for you..."):
+                        # Get recommendation (runs on the long-lived background loop)
+                        run_config = new_run_config()
+                        result = run_in_background(get_recommendation(user_query, session=session, run_config=run_config))
+                    if result.cached:
+                        st.session_state["last_trace_id"] = None
+                        st.caption("⚡ Served from cache")
+                    get_session_store().add_turn(session, user_query, result.final_output, result.last_agent_name)
+                    display_result(result.final_output)
                     
-                    # Show handoff information
-                    if hasattr(result.final_output, "title") and hasattr(result.final_output, "author"):
-                        st.info("🔄 Handed off to: Book Specialist")
-                        display_book_recommendation(result.final_output)
-                    elif hasattr(result.final_output, "title") and hasattr(result.final_output, "director"):
-                        st.info("🔄 Handed off to: Movie Specialist")
-                        display_movie_recommendation(result.final_output)
-                    else:
-                        st.info("🔄 Handled by: Main Entertainment Agent")
-                        display_general_plan(result.final_output)
-                        
-                except Exception as e:
-                    st.error(f"Sorry, something went wrong: {str(e)}")
+            except Exception as e:
+                st.error(f"Sorry, something went wrong: {str(e)}")
         else:
             st.warning("Please enter a question or request!")
     
+    # Waterfall of the last request (drawn after the request has finished)
+    if show_timing:
+        with st.sidebar.expander("🕒 Last request timing", expanded=True):
+            display_waterfall(st.session_state.get("last_trace_id"))
+    
     # Footer
     st.markdown("---")
     st.markdown("*Built with Streamlit and Open AI Agents* 🤖")
@@ -0,0 +1,235 @@
+
+# ==============================================================================
+# Batch Pipeline: run a whole file of queries through an agent
+# Reads queries from a JSONL file, runs them N at a time and writes every
+# answer to an output JSONL file as soon as it is ready. Progress is saved in
+# a small checkpoint file, so a stopped run (Ctrl+C, crash, reboot) picks up
+# where it left off. Memory stays the same for 100 or 500k queries.
+#
+# Usage:
+#   python batch_pipeline.py --agent entertainment --input queries.jsonl --output answers.jsonl
+# Input lines look like {"query": "I want to read a mystery book"} (or just a JSON string).
+# ==============================================================================
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+
+from pydantic import BaseModel
+
+from batch_runner import BatchResult, stream_batch
+from cascade import CASCADE, ModelCascade, print_cascade_stats
+from model_factory import resolve_model
+from response_cache import dump_output
+from tracing_export import install_tracing
+from usage_tracking import BudgetController, print_usage_summary
+
+AGENTS = {
+    "travel": ("v2_structured_output", "travel_agent"),
+    "recipe": ("v3_tool_calls", "recipe_agent"),
+    "entertainment": ("v4_handoffs", "entertainment_agent"),
+}
+
+# --- Checkpoint ---
+
+class Checkpoint(BaseModel):
+    watermark: int = -1 # every input line up to this one is done
+    input_offset: int = 0 # where the line after the watermark starts in the input file
+    output_offset: int = 0 # size of the output file when this checkpoint was saved
+    done_above: List[int] = [] # lines after the watermark that are already done
+    completed: int = 0
+    failed: int = 0
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    if not os.path.exists(path):
+        return Checkpoint()
+    with open(path) as f:
+        return Checkpoint.model_validate_json(f.read())
+
+
+def save_checkpoint(checkpoint: Checkpoint, path: str):
+    # Write then rename, so a crash never leaves a half-written checkpoint
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(checkpoint.model_dump_json())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def recover_output(path: str, checkpoint: Checkpoint) -> Set[int]:
+    """Cut off a half-written last line and return the lines finished after the checkpoint."""
+    done = set(checkpoint.done_above)
+    if not os.path.exists(path):
+        return done
+    with open(path, "r+b") as f:
+        f.seek(checkpoint.output_offset)
+        tail = f.read()
+        end = tail.rfind(b"\n") + 1
+        f.truncate(checkpoint.output_offset + end)
+    for line in tail[:end].splitlines():
+        done.add(json.loads(line)["line"])
+    return done
+
+# --- Pipeline ---
+
+class Progress:
+    """Moves the watermark forward as lines finish, in any order."""
+
+    def __init__(self, checkpoint: Checkpoint, done: Set[int]):
+        self.checkpoint = checkpoint
+        self.done_above = {n for n in done if n > checkpoint.watermark}
+        self.line_ends: Dict[int, int] = {} # byte offset where each unfinished line ends
+
+    def mark_done(self, line: int):
+        self.done_above.add(line)
+        # Only move past lines that were read, so we know where the next one starts
+        while self.checkpoint.watermark + 1 in self.done_above and self.checkpoint.watermark + 1 in self.line_ends:
+            self.checkpoint.watermark += 1
+            self.done_above.remove(self.checkpoint.watermark)
+            self.checkpoint.input_offset = self.line_ends.pop(self.checkpoint.watermark)
+
+    def snapshot(self, output_offset: int) -> Checkpoint:
+        self.checkpoint.output_offset = output_offset
+        self.checkpoint.done_above = sorted(self.done_above)
+        return self.checkpoint
+
+
+def read_queries(path: str, progress: Progress, field: str, bad_lines: List[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, query) for every line not done yet, starting at the checkpoint."""
+    line_number = progress.checkpoint.watermark
+    with open(path, "rb") as f:
+        f.seek(progress.checkpoint.input_offset)
+        for raw in iter(f.readline, b""):
+            line_number += 1
+            progress.line_ends[line_number] = f.tell()
+            if line_number in progress.done_above:
+                progress.mark_done(line_number)
+                continue
+            try:
+                item = json.loads(raw)
+                query = item if isinstance(item, str) else item[field]
+            except (ValueError, KeyError, TypeError):
+                bad_lines.append((line_number, f"Line has no '{field}' field"))
+                continue
+            yield line_number, query
+
+
+def result_record(result: BatchResult) -> Dict:
+    return {
+        "line": result.index,
+        "query": result.query,
+        "agent": result.last_agent,
+        "output": dump_output(result.output) if result.ok else None,
+        "error": result.error,
+        "latency_seconds": round(result.latency_seconds, 3),
+    }
+
+
+async def run_pipeline(
+    agent_name: str,
+    input_path: str,
+    output_path: str,
+    concurrency: int = 20,
+    field: str = "query",
+    checkpoint_every: int = 100,
+    restart: bool = False,
+):
+    import importlib
+
+    # Local span recorder + metrics, the same as the scripts and the app
+    install_tracing()
+    module_name, attribute = AGENTS[agent_name]
+    module = importlib.import_module(module_name)
+    agent = getattr(module, attribute)
+
+    # Counts tokens and cost, and moves to a cheaper model when over budget (see usage_tracking.py)
+    budget = BudgetController([agent], resolve=resolve_model)
+    # CASCADE=1: smallest model first, bigger ones only when the answer fails its checks
+    # (the travel and recipe rules are registered with @output_check when their module loads)
+    cascade = ModelCascade(agent) if CASCADE else None
+    run = functools.partial(budget.run, run=cascade.run) if cascade else budget.run
+    if agent_name == "entertainment":
+        from fast_router import FastRouter
+        run = functools.partial(FastRouter(log_path=None).run, run=run)
+
+    checkpoint_path = output_path + ".checkpoint.json"
+    if restart:
+        for path in (output_path, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint = load_checkpoint(checkpoint_path)
+    progress = Progress(checkpoint, recover_output(output_path, checkpoint))
+    bad_lines: List[Tuple[int, str]] = []
+    input_size = os.path.getsize(input_path)
+    start = time.perf_counter()
+    since_checkpoint = 0
+
+    def write(f, record: Dict):
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        progress.mark_done(record["line"])
+
+    with open(output_path, "a") as out:
+        try:
+            async for result in stream_batch(
+                agent,
+                read_queries(input_path, progress, field, bad_lines),
+                concurrency=concurrency,
+                window=concurrency * 4,
+                run=run,
+            ):
+                for line, error in bad_lines:
+                    write(out, {"line": line, "query": None, "agent": None, "output": None, "error": error})
+                    checkpoint.failed += 1
+                bad_lines.clear()
+                write(out, result_record(result))
+                checkpoint.completed += 1
+                checkpoint.failed += 0 if result.ok else 1
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    out.flush()
+                    save_checkpoint(progress.snapshot(out.tell()), checkpoint_path)
+                    since_checkpoint = 0
+                    rate = checkpoint.completed / (time.perf_counter() - start)
+                    print(f"{checkpoint.completed} done ({checkpoint.failed} failed) | "
+                          f"{checkpoint.input_offset / input_size:.1%} of input | {rate:.1f} queries/s")
+            for line, error in bad_lines:
+                write(out, {"line": line, "query": None, "agent": None, "output": None, "error": error})
+                checkpoint.failed += 1
+        finally:
+            # Always save what we have, also on Ctrl+C
+            out.flush()
+            save_checkpoint(progress.snapshot(out.tell()), checkpoint_path)
+
+    print(f"Finished: {checkpoint.completed} queries ({checkpoint.failed} failed) -> {output_path}")
+    print_usage_summary(budget.tracker)
+    if cascade:
+        print_cascade_stats(cascade)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through an agent")
+    parser.add_argument("--agent", choices=list(AGENTS), required=True)
+    parser.add_argument("--input", required=True, help="JSONL file, one query per line")
+    parser.add_argument("--output", required=True, help="JSONL file for the answers (appended to when resuming)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Queries running at the same time")
+    parser.add_argument("--field", default="query", help="Name of the query field in each input line")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Save progress every N answers")
+    parser.add_argument("--restart", action="store_true", help="Ignore earlier progress and start over")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_pipeline(
+            args.agent, args.input, args.output, args.concurrency, args.field, args.checkpoint_every, args.restart,
+        ))
+    except KeyboardInterrupt:
+        print("Stopped. Run the same command again to continue where it left off.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+
+# ==============================================================================
+# Batch Runner: send many queries to an agent at the same time
+# Instead of waiting for each query one by one, we run up to N at once
+# ==============================================================================
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+from agents import Agent, Runner
+
+from latency_stats import latency_summary
+
+# --- Models for batch results ---
+
+class BatchResult(BaseModel):
+    index: int # position of the query in the input list
+    query: str
+    output: Any = None # the agent's final_output (None if the query failed)
+    last_agent: Optional[str] = None # name of the agent that produced the output
+    error: Optional[str] = None # error message if the query failed
+    latency_seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+# --- Batch execution ---
+
+async def run_one(
+    agent: Agent,
+    query: str,
+    index: int = 0,
+    run: Callable[..., Awaitable[Any]] = Runner.run,
+    **run_kwargs,
+) -> BatchResult:
+    """Run a single query and capture its output, error and latency."""
+    start = time.perf_counter()
+    try:
+        result = await run(agent, query, **run_kwargs)
+    except Exception as e:
+        # One failing query should never stop the rest of the batch
+        return BatchResult(
+            index=index,
+            query=query,
+            error=f"{type(e).__name__}: {e}",
+            latency_seconds=time.perf_counter() - start,
+        )
+    return BatchResult(
+        index=index,
+        query=query,
+        output=result.final_output,
+        last_agent=result.last_agent.name,
+        latency_seconds=time.perf_counter() - start,
+    )
+
+
+async def run_batch(
+    agent: Agent,
+    queries: List[str],
+    concurrency: int = 5,
+    run: Callable[..., Awaitable[Any]] = Runner.run,
+    **run_kwargs,
+) -> List[BatchResult]:
+    """Run all queries with at most `concurrency` in flight, results in input order.
+
+    Extra keyword arguments (run_config, hooks, max_turns...) are passed to `run`.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int, query: str) -> BatchResult:
+        async with semaphore:
+            return await run_one(agent, query, index, run=run, **run_kwargs)
+
+    # gather keeps the same order as the input list
+    return await asyncio.gather(*(limited(i, q) for i, q in enumerate(queries)))
+
+
+async def stream_batch(
+    agent: Agent,
+    queries: Iterable[Tuple[int, str]],
+    concurrency: int = 5,
+    window: Optional[int] = None,
+    run: Callable[..., Awaitable[Any]] = Runner.run,
+    **run_kwargs,
+) -> AsyncIterator[BatchResult]:
+    """Run (index, query) pairs from any iterable and yield results as they finish.
+
+    Only `concurrency` queries are in flight, so memory stays the same for 100
+    or 500k queries. With `window`, a query is not started while one more than
+    `window` positions before it is still running (keeps checkpoints small).
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    items = iter(queries)
+    running = {} # task -> position in the input
+    position = 0
+    exhausted = False
+
+    try:
+        while True:
+            # Start new queries until the pool (and the window) is full
+            while not exhausted and len(running) < concurrency:
+                if window is not None and running and position - min(running.values()) >= window:
+                    break
+                try:
+                    index, query = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                task = asyncio.ensure_future(run_one(agent, query, index, run=run, **run_kwargs))
+                running[task] = position
+                position += 1
+            if not running:
+                return
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del running[task]
+                yield task.result()
+    finally:
+        # The caller stopped early (or was cancelled): don't leave queries running
+        for task in running:
+            task.cancel()
+
+
+def print_batch_summary(results: List[BatchResult], wall_seconds: float):
+    """Print a short latency report for a finished batch."""
+    latencies = [r.latency_seconds for r in results]
+    summary = latency_summary(latencies)
+    failed = sum(1 for r in results if not r.ok)
+    print("\n" + "="*50)
+    print(f"BATCH: {len(results)} queries in {wall_seconds:.2f}s ({failed} failed)")
+    print(f"Latency p50: {summary['p50']:.2f}s | p95: {summary['p95']:.2f}s | max: {summary['max']:.2f}s")
+    for r in results:
+        status = "ok" if r.ok else f"FAILED ({r.error})"
+        print(f"  [{r.index}] {r.latency_seconds:.2f}s {status} - {r.query}")
@@ -0,0 +1,257 @@
+# ==============================================================================
+# Benchmark: end-to-end latency of every agent in the repo (v1 to v4 + the app)
+# All agents run against the offline MockModel with a fixed, seeded latency,
+# so numbers only change when our code (or the agents library) changes.
+# Reports p50/p95/p99, throughput at increasing concurrency, peak memory and
+# where the time goes (model calls, tools, handoffs, everything else).
+# All requests share one event loop, so the CPU time per request (our code +
+# the agents library) caps throughput at about 1000 / cpu_ms req/s, however
+# fast the mock model is. Span times are wall times: under load they include
+# waiting for the loop, so a tool's span grows with concurrency even when the
+# tool itself doesn't get slower.
+# Results are saved as JSON; compare two commits with --compare.
+#
+# Run from the repo root:  python -m benchmarks.agents
+# ==============================================================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+import agents
+from agents import Runner, set_trace_processors
+from agents.tracing import TracingProcessor
+
+from batch_runner import run_batch
+from latency_stats import latency_summary
+from mock_model import LatencyProfile, MockModel
+from model_factory import with_model
+
+# Queries per agent (repeated to fill the batch)
+QUERIES = {
+    "v1_basic": [
+        "Say hello and tell me something nice in max 30 words.",
+        "Write a haiku about recursion.",
+    ],
+    "v2_travel": [
+        "I'm planning a trip to Dubai for 5 days with a budget of $5000. What should I do there?",
+        "I want to visit London for a week with a budget of $2000. What activities do you recommend?",
+    ],
+    "v3_recipe": [
+        "I have chicken and rice at home. What's an easy recipe I can make?",
+        "I'm a complete beginner and only have eggs and bread. Help me make something simple!",
+    ],
+    "v4_handoffs": [
+        "I want to read a good mystery book",
+        "Recommend me a funny movie to watch tonight",
+        "I'm bored, what should I do this weekend?",
+    ],
+    "app_cold": [
+        "I want to read a good mystery book",
+        "Recommend me a funny movie to watch tonight",
+        "I need a good fantasy book",
+        "What should I watch tonight?",
+        "I'm bored, what should I do this weekend?",
+    ],
+}
+QUERIES["app_warm"] = QUERIES["app_cold"]
+
+# Scenarios whose queries get a unique suffix, so every request misses the caches
+UNIQUE_QUERIES = {"app_cold"}
+_request_ids = itertools.count()
+
+# --- Per-stage timing from the agents' tracing spans ---
+
+class StageTimer(TracingProcessor):
+    """Adds up how long each kind of span took (generation = model call, function = tool...)."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def reset(self):
+        self.seconds.clear()
+
+    def on_span_end(self, span):
+        if span.started_at and span.ended_at:
+            duration = datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)
+            self.seconds[span.span_data.type] += duration.total_seconds()
+
+    def on_trace_start(self, trace): pass
+    def on_trace_end(self, trace): pass
+    def on_span_start(self, span): pass
+    def shutdown(self): pass
+    def force_flush(self): pass
+
+# --- Scenarios ---
+
+def build_scenarios(model: MockModel, workdir: str) -> Dict[str, Any]:
+    """Each scenario: (agent, run function) using the mock model."""
+    import v1_basic_agent, v2_structured_output, v3_tool_calls, v4_handoffs
+    from benchmarks.targets import mock_recommender
+
+    def app_runner(recommender):
+        async def app_run(agent, query, **run_kwargs):
+            # Same path as the app's "Get Recommendation" button (caches + router + agents)
+            response = await recommender.recommend(query, **run_kwargs)
+            return SimpleNamespace(
+                final_output=response.final_output, last_agent=SimpleNamespace(name=response.last_agent_name)
+            )
+        return app_run
+
+    # Cold: unique queries and no similarity matches, so every request pays for lookups + agents
+    cold = mock_recommender(model, workdir, "cold", 1.01)
+    # Warm: the same few questions again and again, answered from the caches
+    warm = mock_recommender(model, workdir, "warm", 0.75)
+
+    return {
+        "v1_basic": (with_model(v1_basic_agent.agent, model), Runner.run),
+        "v2_travel": (with_model(v2_structured_output.travel_agent, model), Runner.run),
+        "v3_recipe": (with_model(v3_tool_calls.recipe_agent, model), Runner.run),
+        "v4_handoffs": (with_model(v4_handoffs.entertainment_agent, model), Runner.run),
+        "app_cold": (cold.agent, app_runner(cold)),
+        "app_warm": (warm.agent, app_runner(warm)),
+    }
+
+
+def make_batch(name: str, requests: int) -> List[str]:
+    queries = QUERIES[name]
+    batch = [queries[i % len(queries)] for i in range(requests)]
+    if name in UNIQUE_QUERIES:
+        batch = [f"{q} (request {next(_request_ids)})" for q in batch]
+    return batch
+
+
+async def run_level(agent, run: Callable, batch: List[str], concurrency: int, timer: StageTimer):
+    requests = len(batch)
+    timer.reset()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    results = await run_batch(agent, batch, concurrency=concurrency, run=run)
+    wall = time.perf_counter() - start
+    cpu_ms = (time.process_time() - cpu_start) / requests * 1000
+    failed = [r.error for r in results if not r.ok]
+    summary = latency_summary([r.latency_seconds for r in results])
+    # Stage times are summed over all requests, report the average per request
+    stages = {name: seconds / requests * 1000 for name, seconds in timer.seconds.items() if name != "agent"}
+    stages["other"] = max(0.0, summary["mean"] * 1000 - stages.get("generation", 0) - stages.get("function", 0)
+                          - stages.get("handoff", 0))
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "failed": len(failed),
+        "first_error": failed[0] if failed else None,
+        "throughput_rps": round(requests / wall, 2),
+        # CPU time per request; 1000 / cpu_ms is the most one event loop can do
+        "cpu_ms": round(cpu_ms, 3),
+        "latency_ms": {k: (v if k == "count" else round(v * 1000, 3)) for k, v in summary.items()},
+        "stages_ms": {k: round(v, 3) for k, v in sorted(stages.items())},
+    }
+
+
+async def peak_memory(agent, run: Callable, batch: List[str], concurrency: int) -> float:
+    """Highest Python memory use (MB) while running a batch."""
+    tracemalloc.start()
+    try:
+        await run_batch(agent, batch, concurrency=concurrency, run=run)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1e6, 2)
+
+# --- Results ---
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]):
+    """Print p50/p95 and throughput changes between two result files."""
+    print(f"\nCompared with {old['commit']} ({old['time']}):")
+    for name, scenario in new["scenarios"].items():
+        before = {level["concurrency"]: level for level in old["scenarios"].get(name, {}).get("levels", [])}
+        for level in scenario["levels"]:
+            prev = before.get(level["concurrency"])
+            if prev is None:
+                continue
+            def change(a, b):
+                return f"{(b - a) / a:+.1%}" if a else "n/a"
+            print(f"  {name:<12} c={level['concurrency']:<4} "
+                  f"p50 {change(prev['latency_ms']['p50'], level['latency_ms']['p50']):>7}  "
+                  f"p95 {change(prev['latency_ms']['p95'], level['latency_ms']['p95']):>7}  "
+                  f"throughput {change(prev['throughput_rps'], level['throughput_rps']):>7}")
+
+
+async def bench(args) -> Dict[str, Any]:
+    timer = StageTimer()
+    # Only our timer: no trace upload while benchmarking
+    set_trace_processors([timer])
+    model = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=args.latency_ms), seed=0, model_name="mock")
+
+    results = {
+        "commit": git_commit(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "agents_version": getattr(agents, "__version__", "unknown"),
+        "settings": {"latency_ms": args.latency_ms, "requests": args.requests, "concurrency": args.concurrency},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        scenarios = build_scenarios(model, workdir)
+        for name in args.scenarios:
+            agent, run = scenarios[name]
+            await run_level(agent, run, make_batch(name, len(QUERIES[name])), 1, timer)  # warm up
+            levels = []
+            for concurrency in args.concurrency:
+                level = await run_level(agent, run, make_batch(name, args.requests), concurrency, timer)
+                levels.append(level)
+                ms = level["latency_ms"]
+                stages = "  ".join(f"{k} {v:.1f}" for k, v in level["stages_ms"].items())
+                print(f"{name:<12} c={concurrency:<4} | p50 {ms['p50']:8.2f} ms  p95 {ms['p95']:8.2f} ms  "
+                      f"p99 {ms['p99']:8.2f} ms | {level['throughput_rps']:8.1f} req/s  cpu {level['cpu_ms']:.1f} ms | {stages}")
+            peak = await peak_memory(agent, run, make_batch(name, args.requests), max(args.concurrency))
+            print(f"{name:<12} peak Python memory {peak:.2f} MB")
+            results["scenarios"][name] = {"levels": levels, "peak_memory_mb": peak}
+    # ru_maxrss is in KB on Linux (bytes on macOS)
+    results["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end agent benchmark with the mock model")
+    parser.add_argument("--scenarios", nargs="+", default=list(QUERIES), choices=list(QUERIES))
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fixed mock model latency per call")
+    parser.add_argument("--output", help="Where to save the JSON results (default: benchmark_results/agents-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+
+    output = args.output or os.path.join("benchmark_results", f"agents-{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
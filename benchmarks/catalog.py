@@ -0,0 +1,95 @@
+
+# ==============================================================================
+# Benchmark: catalog tool lookups with a big catalog
+# Compares the old way (build a dict + json.dumps on every whole-genre call)
+# with one genre_payload() page from the in-memory, SQLite and memory-mapped
+# catalog backends. Nothing is warmed up or memoized: every call reads its page
+# (a first page and a deep page per genre), straight after loading.
+# Run from the repo root:  python -m benchmarks.catalog --size 300000
+# ==============================================================================
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from catalog import (
+    GENRE_PAGE_SIZE, Catalog, MmapCatalog, SQLiteCatalog, build_mmap_catalog, build_sqlite_catalog, group_by_genre,
+    tool_view,
+)
+from latency_stats import latency_summary
+
+GENRES = ["mystery", "romance", "fantasy", "sci-fi", "horror", "history", "biography", "thriller",
+          "poetry", "travel", "cooking", "science", "self-help", "classics", "comics", "young-adult"]
+
+
+def make_books(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {"genre": rng.choice(GENRES), "title": f"Book Title {i}", "author": f"Author {rng.randint(1, count // 10 + 1)}",
+         "hours": rng.randint(2, 30), "rating": round(rng.uniform(1, 5), 2)}
+        for i in range(count)
+    ]
+
+
+def time_calls(fn, genres, repeat: int, offsets):
+    latencies = []
+    for _ in range(repeat):
+        for genre in genres:
+            for offset in offsets:
+                start = time.perf_counter()
+                fn(genre, offset)
+                latencies.append(time.perf_counter() - start)
+    return {k: (v * 1e6 if k != "count" else v) for k, v in latency_summary(latencies).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog lookup benchmark")
+    parser.add_argument("--size", type=int, default=300_000, help="Number of books in the catalog")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=GENRE_PAGE_SIZE, help="Records per genre_payload() page")
+    parser.add_argument("--output", help="Optional path to save the results as JSON")
+    args = parser.parse_args()
+
+    books = make_books(args.size)
+    lookups = GENRES + ["unknown-genre"]
+    offsets = [0, args.size // len(GENRES) // 2] # the first page and one from the middle of a genre
+
+    # The old tool: the whole database is rebuilt and serialized on each call
+    def old_tool(genre, _offset):
+        database = {g: [tool_view(r) for r in items] for g, items in group_by_genre(books).items()}
+        if genre.lower() in database:
+            return json.dumps(database[genre.lower()])
+        return "Genre not found in our database."
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = os.path.join(tmp, "books.sqlite3")
+        mmap_path = os.path.join(tmp, "books.catalog")
+        build_sqlite_catalog(books, sqlite_path, "author")
+        build_mmap_catalog(books, mmap_path, "author")
+
+        backends = {
+            "old (rebuild + json.dumps)": (lambda: None, old_tool, 1),
+            "in-memory": (lambda: Catalog(books, "author"), None, args.repeat),
+            "sqlite": (lambda: SQLiteCatalog(sqlite_path, "author"), None, args.repeat),
+            "mmap": (lambda: MmapCatalog(mmap_path, "author"), None, args.repeat),
+        }
+        for name, (load, fn, repeat) in backends.items():
+            start = time.perf_counter()
+            catalog = load()
+            load_seconds = time.perf_counter() - start
+            fn = fn or (lambda genre, offset, c=catalog: c.genre_payload(genre, offset, args.page_size))
+            us = time_calls(fn, lookups, repeat, [0] if name.startswith("old") else offsets)
+            results[name] = {"load_seconds": round(load_seconds, 3), "lookup_us": {k: round(v, 2) for k, v in us.items()}}
+            print(f"{name:<28} load {load_seconds:>7.3f}s | lookup p50 {us['p50']:>12.2f} us  p99 {us['p99']:>12.2f} us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "page_size": args.page_size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+
+# ==============================================================================
+# Benchmark: tail latency of the entertainment agent -> specialist chain with
+# and without hedged requests (hedging.py)
+# Runs the app's agent graph on the mock model with a long-tailed (lognormal)
+# latency, once on the plain model and once on a HedgedModel, and compares
+# p50/p95/p99 and how many extra requests the hedges cost. With --error-rate
+# some calls fail with a connection error, to see the retries at work.
+#
+# Run from the repo root:  python -m benchmarks.hedging
+# ==============================================================================
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from agents import Runner, set_trace_processors
+
+from hedging import HedgeBudget, HedgedModel, HedgeStats
+from latency_stats import latency_summary
+from mock_model import LatencyProfile, MockModel
+from recommendation import build_agents
+
+QUERIES = [
+    "I want to read a good mystery book",
+    "Recommend me a funny movie to watch tonight",
+    "I need a good fantasy book",
+    "a scary horror film for friday",
+]
+
+
+async def run_chain(model, requests: int, concurrency: int, seed: int) -> List[float]:
+    """Latencies of `requests` full runs, `concurrency` at a time (failed runs are left out)."""
+    agent = build_agents(model)
+    rng = random.Random(seed)
+    queries = [rng.choice(QUERIES) for _ in range(requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query: str):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await Runner.run(agent, query)
+            except Exception:
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(q) for q in queries))
+    return latencies
+
+
+def to_ms(summary: Dict[str, float]) -> Dict[str, float]:
+    return {k: (v if k == "count" else round(v * 1000, 1)) for k, v in summary.items()}
+
+
+async def bench(args) -> Dict[str, Any]:
+    set_trace_processors([])
+    latency = LatencyProfile(distribution="lognormal", median_ms=args.latency_ms, sigma=args.sigma)
+    results = {}
+    for name in ("plain", "hedged"):
+        mock = MockModel(latency=latency, seed=args.seed, model_name="mock", error_rate=args.error_rate)
+        stats = HedgeStats()
+        model = mock if name == "plain" else HedgedModel(
+            mock, budget=HedgeBudget(args.budget_ratio), stats=stats, seed=args.seed,
+            attempts=1 if args.error_rate == 0 else 3,
+        )
+        if name == "hedged":
+            # Learn the model's latency first, like a process that has been serving for a while
+            await run_chain(model, args.warmup, args.concurrency, args.seed + 1)
+            stats = model.stats = HedgeStats()
+            mock.calls = 0
+            mock.rng = random.Random(args.seed)
+        latencies = await run_chain(model, args.requests, args.concurrency, args.seed)
+        counters = stats.summary().get("mock", {})
+        results[name] = {
+            "latency_ms": to_ms(latency_summary(latencies)),
+            "failed_runs": args.requests - len(latencies),
+            "model_requests": mock.calls,
+            **({"hedge": counters} if name == "hedged" else {}),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hedged requests benchmark")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100, help="Runs before measuring, to learn the p95")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Median mock latency per call")
+    parser.add_argument("--sigma", type=float, default=1.0, help="Lognormal spread (bigger = longer tail)")
+    parser.add_argument("--budget-ratio", type=float, default=0.1, help="Extra requests allowed per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a connection error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Optional path to save the results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args))
+    for name, r in results.items():
+        ms = r["latency_ms"]
+        print(f"{name:<7} p50 {ms['p50']:>7.1f} ms  p95 {ms['p95']:>7.1f} ms  p99 {ms['p99']:>7.1f} ms  "
+              f"max {ms['max']:>7.1f} ms | {r['model_requests']} model requests, {r['failed_runs']} failed runs")
+    h = results["hedged"]["hedge"]
+    print(f"hedges: {h['hedges']} sent ({h['hedges'] / max(1, h['calls']):.1%} of calls), {h['hedge_wins']} won, "
+          f"{h['over_budget']} refused by the budget, {h['retries']} retries, {h['errors']} errors")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+
+# ==============================================================================
+# Load test: how many users can one process serve before latency falls apart?
+# Drives the app's answer path (Recommender.recommend, what get_recommendation
+# in app.py calls) in this process on the mock model with realistic, random
+# latency, or the HTTP service (service.py) at --url. Two kinds of load:
+#   - open:   users arrive at random (Poisson) at each --rates requests/second,
+#             whether or not earlier requests have finished
+#   - closed: --users simulated users, each asking, waiting for the answer,
+#             thinking for a while and asking again
+# Each level reports throughput, latency percentiles, errors and how late the
+# event loop runs its callbacks (loop lag). Results are saved as JSON.
+#
+# Run from the repo root:
+#   python -m benchmarks.load --mode open --rates 5 10 20 50 100
+#   python -m benchmarks.load --mode closed --users 1 8 32 128
+#   MOCK_MODEL=1 python service.py --workers 2 &
+#   python -m benchmarks.load --url http://127.0.0.1:8000 --mode open --rates 20 50 100
+# ==============================================================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agents import set_trace_processors
+
+from latency_stats import latency_summary
+from mock_model import LatencyProfile, MockModel
+
+QUERIES = [
+    "I want to read a good mystery book",
+    "Recommend me a funny movie to watch tonight",
+    "I need a good fantasy book",
+    "What should I watch tonight?",
+    "I'm bored, what should I do this weekend?",
+    "a scary horror film for friday",
+    "something romantic to read on the beach",
+]
+
+# --- Targets ---
+
+def local_target(latency_ms: float, sigma: float, similarity_threshold: float, workdir: str) -> Callable[[str], Awaitable[Any]]:
+    """The app's answer path in this process, on the mock model (no API key, no cost)."""
+    from benchmarks.targets import mock_recommender
+
+    model = MockModel(latency=LatencyProfile(distribution="lognormal", median_ms=latency_ms, sigma=sigma), model_name="mock")
+    return mock_recommender(model, workdir, "load", similarity_threshold).recommend
+
+
+def http_target(url: str, timeout: float) -> Callable[[str], Awaitable[Any]]:
+    """POST /recommend on a running service.py."""
+    import httpx
+
+    client = httpx.AsyncClient(base_url=url, timeout=timeout, limits=httpx.Limits(max_connections=None))
+
+    async def recommend(query: str):
+        response = await client.post("/recommend", json={"query": query})
+        response.raise_for_status()
+        return response.json()
+
+    recommend.client = client
+    return recommend
+
+
+class QueryMix:
+    """Mostly new questions (cache misses), with a share of popular repeats (cache hits)."""
+
+    def __init__(self, repeat_share: float, seed: int = 0):
+        self.repeat_share = repeat_share
+        self.rng = random.Random(seed)
+        self.ids = itertools.count()
+
+    def next(self) -> str:
+        query = self.rng.choice(QUERIES)
+        if self.rng.random() < self.repeat_share:
+            return query
+        return f"{query} (user {next(self.ids)})"
+
+# --- Measuring ---
+
+class LoopLagMonitor:
+    """Sleeps `interval` again and again and records how much later than asked it woke up."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self.lags = []
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return latency_summary(self.lags)
+
+
+class Recorder:
+    """Latencies and errors of one load level."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.send_seconds: Optional[float] = None # open loop: how long starting all requests took
+        self.planned: Optional[int] = None # open loop: arrivals drawn for the level's duration
+
+    async def call(self, target: Callable[[str], Awaitable[Any]], query: str, timeout: float):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(target(query), timeout)
+            self.latencies.append(time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            self.errors["timeout"] = self.errors.get("timeout", 0) + 1
+        except Exception as e:
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        finally:
+            self.in_flight -= 1
+
+# --- Load patterns ---
+
+async def open_loop(target, mix: QueryMix, rate: float, duration: float, timeout: float, rng: random.Random) -> Recorder:
+    """Poisson arrivals at `rate` per second for `duration` seconds, then wait for the stragglers."""
+    recorder = Recorder()
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - start >= duration:
+            break
+        # Sleep until the planned arrival time, so a slow loop doesn't lower the offered load
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(recorder.call(target, mix.next(), timeout)))
+    recorder.send_seconds = max(duration, time.perf_counter() - start)
+    recorder.planned = len(tasks)
+    await asyncio.gather(*tasks)
+    return recorder
+
+
+async def closed_loop(target, mix: QueryMix, users: int, duration: float, timeout: float, think_ms: float,
+                      rng: random.Random) -> Recorder:
+    """`users` users asking one question at a time, with exponential think time between questions."""
+    recorder = Recorder()
+    stop_at = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < stop_at:
+            await recorder.call(target, mix.next(), timeout)
+            if think_ms > 0:
+                await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+    await asyncio.gather(*(user() for _ in range(users)))
+    return recorder
+
+
+def level_result(mode: str, level: float, recorder: Recorder, wall: float, lag: Dict[str, float],
+                 duration: float) -> Dict[str, Any]:
+    done = len(recorder.latencies)
+    failed = sum(recorder.errors.values())
+    total = done + failed
+    return {
+        "mode": mode,
+        "level": level, # requests/second asked for (open) or users (closed)
+        "requests": total,
+        # Open loop: the random arrivals drawn for this level (close to `level`, but not exactly)...
+        "planned_rps": round(recorder.planned / duration, 2) if recorder.planned is not None else None,
+        # ...and how fast they were really started: lower when the process was too busy to keep up
+        "offered_rps": round(total / recorder.send_seconds, 2) if recorder.send_seconds else None,
+        "throughput_rps": round(done / wall, 2) if wall else 0.0,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": recorder.errors,
+        "max_in_flight": recorder.max_in_flight,
+        "latency_ms": {k: (v if k == "count" else round(v * 1000, 2)) for k, v in latency_summary(recorder.latencies).items()},
+        "loop_lag_ms": {k: (v if k == "count" else round(v * 1000, 2)) for k, v in lag.items()},
+    }
+
+
+def capacity(points: List[Dict[str, Any]], slo_ms: float, max_error_rate: float = 0.01) -> Optional[Dict[str, Any]]:
+    """The highest level whose p95 latency and error rate are within the target (and, open loop, that kept up)."""
+    good = [
+        p for p in points
+        if p["latency_ms"]["p95"] <= slo_ms and p["error_rate"] <= max_error_rate
+        # Compared with the arrivals actually drawn: a Poisson level sends a bit more or less than `level`
+        and (p["mode"] == "closed" or p["offered_rps"] >= 0.9 * p["planned_rps"])
+    ]
+    return max(good, key=lambda p: p["level"]) if good else None
+
+
+async def run_load(args) -> Dict[str, Any]:
+    # No trace upload while load testing
+    set_trace_processors([])
+    rng = random.Random(args.seed)
+    mix = QueryMix(args.repeat_share, args.seed)
+    levels = args.rates if args.mode == "open" else args.users
+    points = []
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.url:
+            target = http_target(args.url, args.timeout)
+        else:
+            target = local_target(args.latency_ms, args.sigma, args.similarity_threshold, workdir)
+        await target("warm up: a good book")
+        monitor = LoopLagMonitor()
+        for level in levels:
+            monitor.start()
+            start = time.perf_counter()
+            if args.mode == "open":
+                recorder = await open_loop(target, mix, level, args.duration, args.timeout, rng)
+            else:
+                recorder = await closed_loop(target, mix, int(level), args.duration, args.timeout, args.think_ms, rng)
+            wall = time.perf_counter() - start
+            point = level_result(args.mode, level, recorder, wall, await monitor.stop(), args.duration)
+            points.append(point)
+            ms, lag = point["latency_ms"], point["loop_lag_ms"]
+            if args.mode == "open":
+                load = f"{level:>7g} req/s asked ({point['planned_rps']:>7.1f} drawn, {point['offered_rps']:>7.1f} sent)"
+            else:
+                load = f"{level:>7g} users"
+            print(f"{load} | {point['throughput_rps']:>7.1f} req/s done | p50 {ms['p50']:>8.1f} ms  "
+                  f"p95 {ms['p95']:>8.1f} ms  p99 {ms['p99']:>8.1f} ms | errors {point['error_rate']:>6.1%} | "
+                  f"in flight {point['max_in_flight']:>5} | loop lag p99 {lag['p99']:>6.1f} ms  max {lag['max']:>7.1f} ms")
+        if args.url:
+            await target.client.aclose()
+
+    best = capacity(points, args.slo_ms)
+    if best is None:
+        print(f"\nNo level kept p95 under {args.slo_ms:g} ms with under 1% errors")
+    else:
+        print(f"\nCapacity: {best['level']:g} {'req/s' if args.mode == 'open' else 'users'} "
+              f"({best['throughput_rps']:.1f} req/s) with p95 under {args.slo_ms:g} ms and under 1% errors")
+    return {
+        "target": args.url or "in-process Recommender (mock model)",
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "points": points,
+        "capacity": best,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the recommendation path")
+    parser.add_argument("--mode", choices=["open", "closed"], default="open")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 50, 100], help="Arrivals per second (open)")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 8, 32, 128], help="Simulated users (closed)")
+    parser.add_argument("--think-ms", type=float, default=1000, help="Mean think time between a user's questions (closed)")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per level")
+    parser.add_argument("--timeout", type=float, default=30, help="A request slower than this counts as an error")
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="Share of popular repeated questions")
+    parser.add_argument("--latency-ms", type=float, default=400, help="Median mock model latency per call")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal spread of the mock latency")
+    parser.add_argument("--similarity-threshold", type=float, default=1.01,
+                        help="Similarity cache threshold (default: off, so only exact repeats hit a cache)")
+    parser.add_argument("--slo-ms", type=float, default=3000, help="p95 latency target for the capacity estimate")
+    parser.add_argument("--url", help="Load test a running service.py instead of the in-process path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Where to save the curve (default: benchmark_results/load-<mode>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+
+    output = args.output or os.path.join("benchmark_results", f"load-{args.mode}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
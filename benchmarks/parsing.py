@@ -0,0 +1,119 @@
+
+# ==============================================================================
+# Benchmark: parsing structured outputs (TravelPlan) of growing size
+# Final answer: the agents library's path (output schema built every turn),
+# json.loads + model_validate, and fast_parsing.validate_json (str and bytes).
+# Streaming: re-parsing everything on every 16-byte piece (parse_partial_json)
+# vs the IncrementalJSONParser. The re-parse path is quadratic, so it is
+# skipped above --max-reparse-bytes.
+# Run from the repo root:  python -m benchmarks.parsing
+# ==============================================================================
+
+import argparse
+import json
+import random
+import time
+
+from agents import AgentOutputSchema
+
+from fast_parsing import IncrementalJSONParser, validate_json
+from streaming import parse_partial_json
+from v2_structured_output import TravelPlan
+
+PLACES = ["museum", "old town", "harbour", "market", "cathedral", "park", "night market", "castle", "beach", "gallery"]
+VERBS = ["Visit the", "Walk around the", "Take a tour of the", "Have lunch near the", "Watch the sunset at the"]
+
+
+def make_plan_json(activities: int, seed: int = 0) -> str:
+    """A TravelPlan answer as the model would write it, with `activities` list items."""
+    rng = random.Random(seed)
+    plan = TravelPlan(
+        destination="Lisbon, Portugal",
+        duration_days=max(1, activities // 4),
+        budget=1500.0 + activities,
+        activities=[f"{rng.choice(VERBS)} {rng.choice(PLACES)} (day {i // 4 + 1}, \"must see\")" for i in range(activities)],
+        notes="Buy a 24h transport pass; many museums are closed on Mondays.",
+    )
+    return plan.model_dump_json()
+
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_final(text: str, repeat: int):
+    raw = text.encode("utf-8")
+    return {
+        # What Runner does when output_type is a plain class: a new schema (and TypeAdapter) every turn
+        "sdk_per_turn_ms": best_of(lambda: AgentOutputSchema(TravelPlan).validate_json(text), repeat) * 1000,
+        "dict_ms": best_of(lambda: TravelPlan.model_validate(json.loads(text)), repeat) * 1000,
+        "direct_str_ms": best_of(lambda: validate_json(TravelPlan, text), repeat) * 1000,
+        "direct_bytes_ms": best_of(lambda: validate_json(TravelPlan, raw), repeat) * 1000,
+    }
+
+
+def stream_reparse(text: str, delta: int):
+    received = ""
+    for i in range(0, len(text), delta):
+        received += text[i:i + delta]
+        parse_partial_json(received)
+
+
+def stream_incremental(text: str, delta: int):
+    parser = IncrementalJSONParser()
+    for i in range(0, len(text), delta):
+        parser.feed(text[i:i + delta])
+
+
+def bench_stream(text: str, delta: int, max_reparse_bytes: int):
+    deltas = (len(text) + delta - 1) // delta
+    result = {"deltas": deltas, "incremental_ms": best_of(lambda: stream_incremental(text, delta), 1) * 1000}
+    if len(text) <= max_reparse_bytes:
+        result["reparse_ms"] = best_of(lambda: stream_reparse(text, delta), 1) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured output parsing benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10_000], help="Activities per plan")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--delta", type=int, default=16, help="Bytes per streamed piece")
+    parser.add_argument("--max-reparse-bytes", type=int, default=200_000, help="Skip the quadratic path above this size")
+    parser.add_argument("--output", help="Optional path to save the results as JSON")
+    args = parser.parse_args()
+
+    # Warm up the cached validators so the first size isn't charged for building them
+    validate_json(TravelPlan, make_plan_json(1))
+
+    results = []
+    print("Final answer (ms, best of repeats):")
+    for size in args.sizes:
+        text = make_plan_json(size)
+        result = {"activities": size, "bytes": len(text), "final": bench_final(text, args.repeat)}
+        results.append(result)
+        f = result["final"]
+        print(f"{size:>7,} activities {len(text):>9,} B | sdk per turn {f['sdk_per_turn_ms']:>8.3f} | "
+              f"json.loads+validate {f['dict_ms']:>8.3f} | direct str {f['direct_str_ms']:>8.3f} | "
+              f"direct bytes {f['direct_bytes_ms']:>8.3f}")
+
+    print(f"\nStreaming in {args.delta}-byte pieces (ms for the whole answer):")
+    for result in results:
+        text = make_plan_json(result["activities"])
+        s = result["stream"] = bench_stream(text, args.delta, args.max_reparse_bytes)
+        reparse = f"{s['reparse_ms']:>10.1f}" if "reparse_ms" in s else f"{'skipped':>10}"
+        print(f"{result['activities']:>7,} activities {s['deltas']:>7,} pieces | re-parse {reparse} | "
+              f"incremental {s['incremental_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+
+# ==============================================================================
+# Benchmark: similarity cache lookup latency at 10k, 100k and 1M entries
+# Run from the repo root:  python -m benchmarks.similarity_cache
+# ==============================================================================
+
+import argparse
+import itertools
+import json
+import random
+import time
+
+import numpy as np
+
+from latency_stats import latency_summary
+from similarity_cache import SimilarityCache
+
+ACTIVITIES = ["read", "watch", "see", "find", "recommend", "suggest"]
+KINDS = ["book", "movie", "novel", "film", "series", "documentary", "podcast", "show"]
+GENRES = ["mystery", "comedy", "romance", "fantasy", "horror", "action", "drama", "sci-fi", "thriller", "history"]
+EXTRAS = ["for tonight", "for the weekend", "for a long flight", "for my kids", "that is short", "from the 90s",
+          "with a twist ending", "set in space", "about friendship", "that will make me cry"]
+
+
+def make_queries(count: int, seed: int = 0):
+    """Generate realistic-looking queries from templates."""
+    rng = random.Random(seed)
+    base = [f"{a} a {g} {k} {e}" for a, k, g, e in itertools.product(ACTIVITIES, KINDS, GENRES, EXTRAS)]
+    return [rng.choice(base) + f" #{i}" for i in range(count)]
+
+
+def fill_cache(cache: SimilarityCache, size: int, seed: int = 0):
+    """Fill the cache quickly: vectorize a pool of queries, then add small random variations of them."""
+    rng = np.random.default_rng(seed)
+    pool_queries = make_queries(min(size, 10_000), seed)
+    pool = np.stack([cache.vectorizer.transform(q) for q in pool_queries])
+    batch = 100_000
+    for start in range(0, size, batch):
+        count = min(batch, size - start)
+        picks = rng.integers(0, len(pool), size=count)
+        vectors = pool[picks] + rng.normal(0, 0.05, size=(count, pool.shape[1])).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        cache.add_vectors(vectors, [pool_queries[p] for p in picks], [None] * count)
+
+
+def bench(size: int, lookups: int):
+    # No eviction or expiry here: we measure lookups at this size
+    cache = SimilarityCache(max_entries=size, ttl_seconds=float("inf"))
+    start = time.perf_counter()
+    fill_cache(cache, size)
+    build_seconds = time.perf_counter() - start
+
+    queries = make_queries(lookups, seed=1)
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        cache.lookup(q)
+        latencies.append(time.perf_counter() - t)
+    summary = {k: v * 1000 if k != "count" else v for k, v in latency_summary(latencies).items()}
+    return {
+        "entries": size,
+        "build_seconds": round(build_seconds, 2),
+        "memory_mb": round(cache.stats()["memory_mb"], 1),
+        "lookup_ms": {k: round(v, 3) for k, v in summary.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similarity cache lookup benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--output", help="Optional path to save the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = bench(size, args.lookups)
+        results.append(result)
+        ms = result["lookup_ms"]
+        print(f"{size:>9,} entries | build {result['build_seconds']:>6.2f}s | {result['memory_mb']:>6.1f} MB | "
+              f"lookup p50 {ms['p50']:.3f} ms  p95 {ms['p95']:.3f} ms  p99 {ms['p99']:.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# ==============================================================================
+# Targets: the app's answer path on the mock model, for the benchmarks
+# One place that builds a Recommender (agents, caches, router, budget) around a
+# MockModel, so every benchmark measures the same path the app runs.
+# ==============================================================================
+
+import os
+
+from fast_router import FastRouter
+from mock_model import MockModel
+from recommendation import Recommender, build_agents
+from response_cache import ResponseCache
+from similarity_cache import SimilarityCache
+from usage_tracking import BudgetController
+
+
+def mock_recommender(model: MockModel, workdir: str, name: str, similarity_threshold: float) -> Recommender:
+    """A Recommender whose agents all run on `model`, with its own cache file in `workdir`.
+
+    A similarity_threshold above 1 turns the similarity cache off (only exact repeats hit a cache).
+    """
+    agent = build_agents(model)
+    return Recommender(
+        agent=agent,
+        response_cache=ResponseCache(path=os.path.join(workdir, f"{name}.sqlite3")),
+        similarity_cache=SimilarityCache(threshold=similarity_threshold),
+        # No decision log and no audits: every query takes the router's own path
+        router=FastRouter(log_path=None),
+        # Cheaper tiers must stay on the mock model too
+        budget=BudgetController([agent], resolve=lambda _name: model),
+    )
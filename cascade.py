@@ -0,0 +1,335 @@
+
+# ==============================================================================
+# Cascade: try the small model first, escalate only when its answer is bad
+# Most questions don't need the biggest model. A ModelCascade runs the agent
+# on the cheapest, fastest model of CASCADE_MODELS, checks the answer, and
+# only runs it again on the next model when the answer fails a check:
+#   - the output didn't parse into the agent's output_type,
+#   - a rule for that type failed (registered with @output_check, e.g. a
+#     recipe's difficulty must be Easy, Medium or Hard),
+#   - a text field is empty or a placeholder ("unknown", "n/a", ...), our
+#     cheap stand-in for a confidence check.
+# It counts escalations and the time saved compared to always using the
+# biggest model, per agent. To know what the biggest model takes, a small share
+# of requests (CASCADE_BASELINE_SAMPLE_RATE) go straight to it. Tool results
+# of one request are reused when it escalates, so a bigger model doesn't run
+# the same tool calls again.
+#
+# Usage:
+#   CASCADE=1 python v3_tool_calls.py
+#   CASCADE=1 CASCADE_MODELS=gpt-4.1-nano,gpt-4.1-mini,gpt-4.1 streamlit run app.py
+# ==============================================================================
+
+import contextvars
+import dataclasses
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from agents import Agent, FunctionTool, MaxTurnsExceeded, ModelBehaviorError, Runner
+from dotenv import load_dotenv
+
+from model_factory import resolve_model, with_model
+from common import iter_agents
+from tool_cache import TOOL_ERROR_PREFIX, arguments_key
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+CASCADE = os.getenv('CASCADE', '').lower() in ('1', 'true', 'yes')
+# Smallest model first
+CASCADE_MODELS = [m.strip() for m in os.getenv('CASCADE_MODELS', 'gpt-4.1-nano,gpt-4.1-mini,gpt-4.1').split(',') if m.strip()]
+# Share of requests answered by the biggest model directly, to measure the baseline
+CASCADE_BASELINE_SAMPLE_RATE = float(os.getenv('CASCADE_BASELINE_SAMPLE_RATE', '0.05'))
+KEEP_BASELINE_SAMPLES = 1000 # recent baseline runs kept per agent
+
+# Answers that mean the model didn't really know
+PLACEHOLDERS = {"", "unknown", "n/a", "na", "none", "null", "tbd", "todo", "...", "i don't know", "not sure"}
+
+# --- Output checks ---
+
+OutputCheck = Callable[[Any], List[str]]
+_checks: Dict[Type[BaseModel], List[OutputCheck]] = defaultdict(list)
+
+
+def output_check(output_type: Type[BaseModel]) -> Callable[[OutputCheck], OutputCheck]:
+    """Register a rule for an output type. The function returns a list of problems (empty = fine).
+
+        @output_check(TravelPlan)
+        def check_travel_plan(plan):
+            return ["budget must be positive"] if plan.budget <= 0 else []
+    """
+    def register(check: OutputCheck) -> OutputCheck:
+        _checks[output_type].append(check)
+        return check
+    return register
+
+
+def placeholder_problems(output: BaseModel) -> List[str]:
+    """Empty or placeholder text fields (in lists too)."""
+    problems = []
+    for name, value in output:
+        values = value if isinstance(value, list) else [value]
+        if isinstance(value, list) and not value:
+            problems.append(f"{name} is empty")
+        for v in values:
+            if isinstance(v, str) and v.strip().lower() in PLACEHOLDERS:
+                problems.append(f"{name} is empty or a placeholder ({v!r})")
+                break
+    return problems
+
+
+def check_output(output: Any) -> List[str]:
+    """Every problem found in a final output (registered rules + placeholder check)."""
+    if not isinstance(output, BaseModel):
+        return [] if str(output).strip() else ["empty answer"]
+    problems = placeholder_problems(output)
+    for cls in type(output).__mro__:
+        for check in _checks.get(cls, []):
+            problems.extend(check(output))
+    return problems
+
+# --- Reusing tool results between attempts ---
+
+# (tool name, arguments key) -> result, for the request being answered (None = not in a cascade run)
+_tool_results: contextvars.ContextVar[Optional[Dict[Tuple[str, str], Any]]] = contextvars.ContextVar(
+    "cascade_tool_results", default=None
+)
+
+
+def reuse_results(tool: FunctionTool) -> FunctionTool:
+    """A copy of the tool that gives back the result an earlier attempt of the same request got."""
+    original = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx, arguments: str) -> Any:
+        results = _tool_results.get()
+        key = arguments_key(arguments)
+        if results is None or key is None:
+            return await original(ctx, arguments)
+        if (tool.name, key) in results:
+            return results[(tool.name, key)]
+        result = await original(ctx, arguments)
+        if not (isinstance(result, str) and result.startswith(TOOL_ERROR_PREFIX)):
+            results[(tool.name, key)] = result
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+# --- Stats ---
+
+class CascadeStats:
+    """Per agent: where answers were accepted, why they escalated, and time saved.
+
+    The baseline is the average time of runs sampled straight onto the biggest
+    model (not of runs that escalated there: those are the hard questions).
+    """
+
+    def __init__(self, models: List[str]):
+        self.models = models
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, agent: str) -> Dict[str, Any]:
+        return self._agents.setdefault(agent, {
+            "runs": 0, "escalated": 0, "accepted": Counter(), "reasons": Counter(),
+            "seconds": 0.0, # all attempts of all runs
+            "baseline_seconds": deque(maxlen=KEEP_BASELINE_SAMPLES), # sampled runs on the biggest model
+        })
+
+    def record(self, agent: str, accepted_tier: Optional[int], attempts: List[float], reasons: List[str]):
+        with self._lock:
+            entry = self._entry(agent)
+            entry["runs"] += 1
+            entry["escalated"] += accepted_tier != 0
+            entry["reasons"].update(reason.split(" (")[0] for reason in reasons)
+            entry["accepted"][self.models[accepted_tier] if accepted_tier is not None else "none"] += 1
+            entry["seconds"] += sum(attempts)
+
+    def record_baseline(self, agent: str, seconds: float):
+        """A sampled run that went straight to the biggest model (not counted as a cascade run)."""
+        with self._lock:
+            self._entry(agent)["baseline_seconds"].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for agent, e in self._agents.items():
+                samples = e["baseline_seconds"]
+                # Baseline: what the biggest model takes on any question (None until one was sampled)
+                baseline = sum(samples) / len(samples) if samples else None
+                result[agent] = {
+                    "runs": e["runs"],
+                    # Share of runs the smallest model didn't answer well enough
+                    "escalation_rate": e["escalated"] / e["runs"] if e["runs"] else 0.0,
+                    "accepted": dict(e["accepted"]),
+                    "reasons": dict(e["reasons"].most_common(5)),
+                    "avg_seconds": e["seconds"] / e["runs"] if e["runs"] else 0.0,
+                    "top_model_seconds": baseline,
+                    "baseline_runs": len(samples),
+                    # Positive: the cascade was faster than always using the biggest model
+                    "saved_seconds": baseline * e["runs"] - e["seconds"] if baseline is not None else None,
+                }
+            return result
+
+# --- Cascade ---
+
+class ModelCascade:
+    """Runs an agent graph on each model of `models` in turn until an answer passes the checks.
+
+    Use cascade.run wherever a run function is expected (run_batch, BudgetController.run,
+    FastRouter.run). Each model gets its own copy of the graph; a tool call an
+    earlier attempt already made gives back the same result instead of running again.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        models: Optional[List[str]] = None,
+        resolve: Callable[[str], Any] = resolve_model,
+        check: Callable[[Any], List[str]] = check_output,
+        baseline_sample_rate: float = CASCADE_BASELINE_SAMPLE_RATE,
+        seed: Optional[int] = None,
+    ):
+        self.models = list(models or CASCADE_MODELS)
+        self.check = check
+        self.baseline_sample_rate = baseline_sample_rate
+        self.rng = random.Random(seed)
+        self.graphs = [with_model(agent, resolve(name)) for name in self.models]
+        for graph in self.graphs:
+            for a in iter_agents(graph):
+                a.tools = [reuse_results(t) if isinstance(t, FunctionTool) else t for t in a.tools]
+        self.stats = CascadeStats(self.models)
+
+    def start_tier(self) -> int:
+        """0 (the smallest model), or now and then the biggest one, to measure the baseline."""
+        if len(self.models) > 1 and self.rng.random() < self.baseline_sample_rate:
+            return len(self.models) - 1
+        return 0
+
+    def agent_for(self, tier: int, agent: Agent) -> Agent:
+        """The same agent (by name) in the copy of the graph that uses model number `tier`."""
+        for candidate in iter_agents(self.graphs[tier]):
+            if candidate.name == agent.name:
+                return candidate
+        raise ValueError(f"Agent {agent.name} is not part of this cascade's graph")
+
+    async def run(
+        self,
+        agent: Agent,
+        input: Any,
+        start_tier: int = 0,
+        attempts: Optional[List[float]] = None,
+        reasons: Optional[List[str]] = None,
+        tool_results: Optional[Dict[Tuple[str, str], Any]] = None,
+        **run_kwargs,
+    ):
+        """Drop-in replacement for Runner.run(agent, input, ...).
+
+        To continue after an attempt made elsewhere (the app streams the first
+        model's answer itself), pass start_tier, that attempt's seconds and reason
+        and the tool results it collected.
+        """
+        token = _tool_results.set({} if tool_results is None else tool_results)
+        try:
+            if start_tier == 0 and not attempts and self.start_tier() != 0:
+                return await self._baseline_run(agent, input, **run_kwargs)
+            return await self._escalate(agent, input, start_tier, list(attempts or []), list(reasons or []),
+                                        **run_kwargs)
+        finally:
+            _tool_results.reset(token)
+
+    async def _baseline_run(self, agent: Agent, input: Any, **run_kwargs):
+        start = time.perf_counter()
+        result = await Runner.run(self.agent_for(len(self.models) - 1, agent), input, **run_kwargs)
+        self.stats.record_baseline(result.last_agent.name, time.perf_counter() - start)
+        return result
+
+    async def _escalate(self, agent: Agent, input: Any, start_tier: int, attempts: List[float], reasons: List[str],
+                        **run_kwargs):
+        last_error: Optional[Exception] = None
+        result = None
+        for tier in range(start_tier, len(self.models)):
+            name = self.models[tier]
+            start = time.perf_counter()
+            try:
+                result = await Runner.run(self.agent_for(tier, agent), input, **run_kwargs)
+            except (ModelBehaviorError, MaxTurnsExceeded) as e:
+                # Unparseable output or a model going in circles: try a bigger one
+                attempts.append(time.perf_counter() - start)
+                reasons.append(f"{type(e).__name__} (on {name})")
+                last_error, result = e, None
+                continue
+            attempts.append(time.perf_counter() - start)
+            problems = self.check(result.final_output)
+            if not problems:
+                self.stats.record(result.last_agent.name, tier, attempts, reasons)
+                return result
+            reasons.append(f"{problems[0]} (on {name})")
+        # Even the biggest model failed: return its answer anyway, or raise its error
+        self.stats.record(result.last_agent.name if result is not None else agent.name, None, attempts, reasons)
+        if result is None:
+            raise last_error
+        return result
+
+    def first_problem(self, output: Any) -> Optional[str]:
+        """The first problem the checks find in an answer, or None when it passes."""
+        problems = self.check(output)
+        return problems[0] if problems else None
+
+    def share_tool_results(self, items: AsyncIterable[Any], results: Dict[Tuple[str, str], Any]) -> AsyncIterator[Any]:
+        """Iterate a stream (e.g. streaming.stream_run of the first attempt) that saves its tool results in `results`."""
+        return _with_tool_results(items, results)
+
+    async def finish(self, agent: Agent, input: Any, result: Any, seconds: float, problem: Optional[str] = None,
+                     tier: int = 0, tool_results: Optional[Dict[Tuple[str, str], Any]] = None, **run_kwargs):
+        """Take over after a first attempt ran elsewhere (e.g. streamed): accept its answer or escalate.
+
+        `result` is that run (None when it failed), `problem` why its answer failed (None = it passed),
+        `tier` the start_tier() it ran on and `tool_results` what its tools returned.
+        """
+        if tier != 0:
+            # A baseline sample on the biggest model: nothing to escalate to
+            if result is None:
+                raise ModelBehaviorError(f"{problem} (on {self.models[tier]})")
+            self.stats.record_baseline(result.last_agent.name, seconds)
+            return result
+        reasons = [] if problem is None else [f"{problem} (on {self.models[0]})"]
+        if problem is None or len(self.models) == 1:
+            self.stats.record(result.last_agent.name, 0 if problem is None else None, [seconds], reasons)
+            return result
+        return await self.run(agent, input, start_tier=1, attempts=[seconds], reasons=reasons,
+                              tool_results=tool_results, **run_kwargs)
+
+
+async def _with_tool_results(items: AsyncIterable[Any], results: Dict[Tuple[str, str], Any]) -> AsyncIterator[Any]:
+    # Like rate_limiter.limited_stream: the run (and its task) starts with the first item,
+    # so only that step needs the context variable
+    iterator = items.__aiter__()
+    token = _tool_results.set(results)
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        return
+    finally:
+        _tool_results.reset(token)
+    yield first
+    async for item in iterator:
+        yield item
+
+
+def print_cascade_stats(cascade: ModelCascade):
+    print("\n" + "="*50)
+    print(f"Cascade: {' -> '.join(cascade.models)}")
+    for agent, s in cascade.stats.summary().items():
+        saved = (f"{s['saved_seconds']:+.2f}s ({s['baseline_runs']} baseline runs)" if s["saved_seconds"] is not None
+                 else "n/a (no baseline run on the biggest model yet)")
+        accepted = ", ".join(f"{model}: {count}" for model, count in s["accepted"].items())
+        print(f"  {agent}: {s['runs']} runs, escalation rate {s['escalation_rate']:.0%}, accepted by {accepted}, "
+              f"avg {s['avg_seconds']:.2f}s, saved vs biggest model {saved}")
+        for reason, count in s["reasons"].items():
+            print(f"    escalated {count}x: {reason}")
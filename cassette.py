@@ -0,0 +1,313 @@
+
+# ==============================================================================
+# Cassettes: record real agent runs once, replay them offline forever
+# While recording, every model request and its response are saved to a small
+# JSONL file. Replaying answers the same requests from that file: no network,
+# no API key, no waiting. Great for regression and performance checks, and for
+# comparing library versions on exactly the same inputs.
+#
+# Record:  CASSETTE_MODE=record CASSETTE_PATH=runs.jsonl.gz python v4_handoffs.py
+# Replay:  CASSETTE_MODE=replay CASSETTE_PATH=runs.jsonl.gz python v4_handoffs.py
+#
+# The model name is part of each request's key, so every model of a cascade
+# keeps its own answers; replay with the same MODEL_CHOICE / CASSETTE_MODELS.
+# The mock model's "mock-" prefix is left out: a cassette recorded with
+# MOCK_MODEL=1 replays with or without it. Replays turn off the trace upload
+# only, so the local span recorder (tracing_export.py) still sees every run.
+# ==============================================================================
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputItem,
+    ResponseOutputMessage,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+from agents import Model, ModelProvider, ModelResponse, OpenAIProvider, Usage
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+CASSETTE_MODE = os.getenv('CASSETTE_MODE', '') # "record", "replay" or empty (off)
+CASSETTE_PATH = os.getenv('CASSETTE_PATH', 'cassette.jsonl.gz')
+
+_output_item = TypeAdapter(ResponseOutputItem)
+
+
+class CassetteMiss(KeyError):
+    """Raised when replaying a request that was never recorded."""
+
+# --- Request keys ---
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _canonical_item(item: Any) -> Any:
+    """Keep only the fields that mean something, so keys survive library upgrades."""
+    item = _plain(item)
+    if not isinstance(item, dict):
+        return item
+    kind = item.get("type", "message")
+    if kind == "message":
+        content = item.get("content")
+        if isinstance(content, list):
+            content = "".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        return {"role": item.get("role"), "content": content}
+    if kind == "function_call":
+        return {"type": kind, "name": item.get("name"), "arguments": item.get("arguments"), "call_id": item.get("call_id")}
+    if kind == "function_call_output":
+        return {"type": kind, "call_id": item.get("call_id"), "output": item.get("output")}
+    return {k: v for k, v in item.items() if k not in ("id", "status")}
+
+
+def request_key(model_name: str, system_instructions, input, tools, output_schema, handoffs) -> str:
+    """Hash of everything that decides what the model answers."""
+    request = {
+        # The mock model answers for the model it stands in for ("mock-gpt-4.1-nano")
+        "model": model_name.removeprefix("mock-"),
+        "instructions": system_instructions,
+        "input": input if isinstance(input, str) else [_canonical_item(i) for i in input],
+        "tools": sorted(getattr(t, "name", type(t).__name__) for t in tools),
+        "handoffs": sorted(h.tool_name for h in handoffs),
+        "output": None if output_schema is None else output_schema.name(),
+    }
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+# --- Cassette file ---
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _dump_usage(usage: Usage) -> Dict[str, int]:
+    return {
+        "requests": usage.requests,
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "total_tokens": usage.total_tokens,
+        "cached_tokens": usage.input_tokens_details.cached_tokens,
+        "reasoning_tokens": usage.output_tokens_details.reasoning_tokens,
+    }
+
+
+def _load_usage(data: Dict[str, int]) -> Usage:
+    return Usage(
+        requests=data["requests"],
+        input_tokens=data["input_tokens"],
+        output_tokens=data["output_tokens"],
+        total_tokens=data["total_tokens"],
+        input_tokens_details=InputTokensDetails(cached_tokens=data.get("cached_tokens", 0)),
+        output_tokens_details=OutputTokensDetails(reasoning_tokens=data.get("reasoning_tokens", 0)),
+    )
+
+
+class Cassette:
+    """Recorded model responses, one JSON line per request: {"key", "output", "usage"}.
+
+    A recording keeps the file open (one gzip member per process, not per line)
+    and writes through the file's buffer; close() it, or let the process exit,
+    before reading the cassette back.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            with _open(path, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def record(self, key: str, response: ModelResponse):
+        entry = {
+            "key": key,
+            "output": [item.model_dump(exclude_none=True) for item in response.output],
+            "usage": _dump_usage(response.usage),
+        }
+        with self._lock:
+            self._entries.setdefault(key, []).append(entry)
+            if self._file is None:
+                self._file = _open(self.path, "a")
+                atexit.register(self.close)
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def close(self):
+        """Write out what is buffered and close the file (recording again reopens it)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                atexit.unregister(self.close)
+
+    def play(self, key: str) -> ModelResponse:
+        """Return the recorded response (the same request recorded twice plays back in order)."""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(key)
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            entry = entries[index % len(entries)]
+        return ModelResponse(
+            output=[_output_item.validate_python(item) for item in entry["output"]],
+            usage=_load_usage(entry["usage"]),
+            response_id=None,
+        )
+
+# --- Models ---
+
+class RecordingModel(Model):
+    """Calls the real model and saves every response to the cassette."""
+
+    def __init__(self, model: Union[str, Model], cassette: Cassette, model_name: str):
+        self.model = model
+        self.cassette = cassette
+        self.model_name = model_name
+
+    def _inner(self) -> Model:
+        # Model names are resolved on first use, so the app's pooled client is already installed
+        if isinstance(self.model, str):
+            self.model = OpenAIProvider().get_model(self.model)
+        return self.model
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> ModelResponse:
+        response = await self._inner().get_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        )
+        key = request_key(self.model_name, system_instructions, input, tools, output_schema, handoffs)
+        self.cassette.record(key, response)
+        return response
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> AsyncIterator[Any]:
+        key = request_key(self.model_name, system_instructions, input, tools, output_schema, handoffs)
+        async for event in self._inner().stream_response(
+            system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+        ):
+            if event.type == "response.completed":
+                usage = Usage()
+                if event.response.usage is not None:
+                    u = event.response.usage
+                    usage = Usage(
+                        requests=1, input_tokens=u.input_tokens, output_tokens=u.output_tokens,
+                        total_tokens=u.total_tokens,
+                        input_tokens_details=u.input_tokens_details,
+                        output_tokens_details=u.output_tokens_details,
+                    )
+                self.cassette.record(key, ModelResponse(output=event.response.output, usage=usage, response_id=None))
+            yield event
+
+
+class ReplayModel(Model):
+    """Answers from the cassette only. Never touches the network."""
+
+    def __init__(self, cassette: Cassette, model_name: str):
+        self.cassette = cassette
+        self.model_name = model_name
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> ModelResponse:
+        key = request_key(self.model_name, system_instructions, input, tools, output_schema, handoffs)
+        return self.cassette.play(key)
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> AsyncIterator[Any]:
+        key = request_key(self.model_name, system_instructions, input, tools, output_schema, handoffs)
+        response = self.cassette.play(key)
+        sequence = 0
+        for index, item in enumerate(response.output):
+            if isinstance(item, ResponseOutputMessage):
+                for part in item.content:
+                    yield ResponseTextDeltaEvent.model_construct(
+                        type="response.output_text.delta", delta=getattr(part, "text", ""), item_id=item.id,
+                        output_index=index, content_index=0, sequence_number=sequence, logprobs=[],
+                    )
+                    sequence += 1
+        yield ResponseCompletedEvent.model_construct(
+            type="response.completed",
+            sequence_number=sequence,
+            response=Response.model_construct(
+                id=f"replay_{key}", object="response", created_at=0, model=self.model_name,
+                output=response.output, parallel_tool_calls=False, tool_choice="auto", tools=[],
+                usage=ResponseUsage(
+                    input_tokens=response.usage.input_tokens, output_tokens=response.usage.output_tokens,
+                    total_tokens=response.usage.total_tokens,
+                    input_tokens_details=response.usage.input_tokens_details,
+                    output_tokens_details=response.usage.output_tokens_details,
+                ),
+            ),
+        )
+
+# --- Providers ---
+
+class RecordingModelProvider(ModelProvider):
+    """Use with RunConfig(model_provider=...) to record runs of agents whose model is a name."""
+
+    def __init__(self, cassette: Cassette, provider: Optional[ModelProvider] = None):
+        self.cassette = cassette
+        self.provider = provider or OpenAIProvider()
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return RecordingModel(self.provider.get_model(model_name), self.cassette, model_name or "")
+
+
+class ReplayModelProvider(ModelProvider):
+    """Use with RunConfig(model_provider=...) to replay recorded runs."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return ReplayModel(self.cassette, model_name or "")
+
+# --- Switch from the environment ---
+
+_cassettes: Dict[str, Cassette] = {}
+
+def cassette_model(model: Union[str, Model]) -> Union[str, Model]:
+    """Wrap an agent's model for recording or replay when CASSETTE_MODE is set."""
+    if CASSETTE_MODE not in ("record", "replay"):
+        return model
+    cassette = _cassettes.setdefault(CASSETTE_PATH, Cassette(CASSETTE_PATH))
+    model_name = model if isinstance(model, str) else getattr(model, "model_name", type(model).__name__)
+    if CASSETTE_MODE == "replay":
+        # Replays should measure the agents, not the trace uploads
+        from tracing_export import disable_trace_upload
+        disable_trace_upload()
+        return ReplayModel(cassette, model_name)
+    return RecordingModel(model, cassette, model_name)
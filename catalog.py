@@ -0,0 +1,422 @@
+
+# ==============================================================================
+# Catalog: book and movie data for the tools, loaded once and indexed
+# The tools used to rebuild a dictionary and call json.dumps on every call.
+# Here each record's answer is serialized ONE time when the catalog is built,
+# and a genre is read a page at a time (GENRE_PAGE_SIZE records), so a tool
+# call costs the same with 100 or 100,000s of titles in the genre.
+#
+# Three backends, all with the same methods:
+#   Catalog        -> everything in memory (from a list, .json or the defaults)
+#   SQLiteCatalog  -> a .sqlite3/.db file built with build_sqlite_catalog()
+#   MmapCatalog    -> a memory-mapped file built with build_mmap_catalog()
+# ==============================================================================
+
+import json
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables (the catalog paths can be set in .env)
+load_dotenv()
+
+# --- Settings ---
+GENRE_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', '10')) # records per genre_payload() call
+
+# --- Default data (the same titles the tutorial started with, plus a rating to rank them by) ---
+
+DEFAULT_BOOKS = [
+    {"genre": "mystery", "title": "The Girl with the Dragon Tattoo", "author": "Stieg Larsson", "hours": 15, "rating": 4.1},
+    {"genre": "mystery", "title": "Gone Girl", "author": "Gillian Flynn", "hours": 12, "rating": 4.1},
+    {"genre": "romance", "title": "Pride and Prejudice", "author": "Jane Austen", "hours": 10, "rating": 4.3},
+    {"genre": "romance", "title": "The Notebook", "author": "Nicholas Sparks", "hours": 8, "rating": 4.1},
+    {"genre": "fantasy", "title": "Harry Potter and the Sorcerer's Stone", "author": "J.K. Rowling", "hours": 9, "rating": 4.5},
+    {"genre": "fantasy", "title": "The Hobbit", "author": "J.R.R. Tolkien", "hours": 11, "rating": 4.3},
+]
+
+DEFAULT_MOVIES = [
+    {"genre": "comedy", "title": "The Grand Budapest Hotel", "director": "Wes Anderson", "minutes": 99, "rating": 8.1},
+    {"genre": "comedy", "title": "Superbad", "director": "Greg Mottola", "minutes": 113, "rating": 7.6},
+    {"genre": "action", "title": "Mad Max: Fury Road", "director": "George Miller", "minutes": 120, "rating": 8.1},
+    {"genre": "action", "title": "John Wick", "director": "Chad Stahelski", "minutes": 101, "rating": 7.4},
+    {"genre": "drama", "title": "The Shawshank Redemption", "director": "Frank Darabont", "minutes": 142, "rating": 9.3},
+    {"genre": "drama", "title": "Forrest Gump", "director": "Robert Zemeckis", "minutes": 142, "rating": 8.8},
+]
+
+# Which field holds the person (author/director) for each kind of catalog
+PERSON_FIELDS = {"book": "author", "movie": "director"}
+# ...and which one holds the length (reading hours, running minutes), by person field
+LENGTH_FIELDS = {"author": "hours", "director": "minutes"}
+DEFAULT_RECORDS = {"book": DEFAULT_BOOKS, "movie": DEFAULT_MOVIES}
+
+# Words we don't index in titles because almost every title has them
+TITLE_STOPWORDS = {"the", "a", "an", "of", "and", "in", "on", "to", "with"}
+
+# --- Helpers ---
+
+def tool_view(record: Dict) -> Dict:
+    """The fields the model sees (everything except the genre, which it already asked for)."""
+    return {k: v for k, v in record.items() if k != "genre"}
+
+
+def serialize(records: Iterable[Dict]) -> str:
+    """Same JSON the tools always returned."""
+    return json.dumps([tool_view(r) for r in records])
+
+
+def join_views(views: Iterable[str]) -> str:
+    """A JSON list from records that were serialized one by one (same text as serialize())."""
+    return "[" + ", ".join(views) + "]"
+
+
+def title_words(title: str) -> List[str]:
+    """Lowercase words of a title, without the very common ones."""
+    return [w for w in re.findall(r"[a-z0-9]+", title.lower()) if w not in TITLE_STOPWORDS]
+
+
+def rank_key(record: Dict) -> tuple:
+    """Best rated first (records without a rating last), then by title."""
+    return (-(record.get("rating") or 0), record["title"])
+
+
+def in_range(value, min_length: Optional[float], max_length: Optional[float]) -> bool:
+    """Whether a length is within the (optional) bounds; a record without a length never is when filtering."""
+    if min_length is None and max_length is None:
+        return True
+    if value is None:
+        return False
+    return (min_length is None or value >= min_length) and (max_length is None or value <= max_length)
+
+
+def group_by_genre(records: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Records per genre, ranked with rank_key: every backend stores and pages genres in this order."""
+    groups = defaultdict(list)
+    for record in records:
+        groups[record["genre"].lower()].append(record)
+    for items in groups.values():
+        items.sort(key=rank_key)
+    return groups
+
+# --- In-memory backend ---
+
+class Catalog:
+    """All records in memory with genre/person indexes and pre-serialized records."""
+
+    def __init__(self, records: List[Dict], person_field: str):
+        self.person_field = person_field
+        self.length_field = LENGTH_FIELDS.get(person_field)
+        self.records = records
+        self._by_genre = group_by_genre(records)
+        self._by_person = defaultdict(list)
+        self._by_title_word = defaultdict(list)
+        for record in records:
+            self._by_person[record[person_field].lower()].append(record)
+            for word in set(title_words(record["title"])):
+                self._by_title_word[word].append(record)
+        self._views = {genre: [json.dumps(tool_view(r)) for r in items] for genre, items in self._by_genre.items()}
+
+    @classmethod
+    def from_json_file(cls, path: str, person_field: str) -> "Catalog":
+        with open(path) as f:
+            return cls(json.load(f), person_field)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def genres(self) -> List[str]:
+        return list(self._by_genre)
+
+    def genre_size(self, genre: str) -> int:
+        return len(self._by_genre.get(genre.lower(), []))
+
+    def genre_payload(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> Optional[str]:
+        """Tool-ready JSON for one page of a genre, or None if the genre isn't in the catalog."""
+        views = self._views.get(genre.lower())
+        if views is None:
+            return None
+        return join_views(views[offset:offset + limit])
+
+    def genre_page(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> List[Dict]:
+        return self._by_genre.get(genre.lower(), [])[offset:offset + limit]
+
+    def by_genre(self, genre: str) -> List[Dict]:
+        return self._by_genre.get(genre.lower(), [])
+
+    def genre_page_by_length(
+        self,
+        genre: str,
+        min_length: Optional[float],
+        max_length: Optional[float],
+        offset: int = 0,
+        limit: int = GENRE_PAGE_SIZE,
+    ) -> Tuple[int, List[Dict]]:
+        """(how many records of the genre are within the lengths, one page of them in genre order)."""
+        items = self._by_genre.get(genre.lower(), [])
+        matches = [r for r in items if in_range(r.get(self.length_field), min_length, max_length)]
+        return len(matches), matches[offset:offset + limit]
+
+    def by_person(self, name: str) -> List[Dict]:
+        return self._by_person.get(name.lower(), [])
+
+    def title_vocabulary(self) -> List[str]:
+        return list(self._by_title_word)
+
+    def by_title_words(self, words: List[str]) -> List[Dict]:
+        """Records whose title contains at least one of the words."""
+        found = {}
+        for word in words:
+            for record in self._by_title_word.get(word, []):
+                found[id(record)] = record
+        return list(found.values())
+
+# --- SQLite backend ---
+
+def build_sqlite_catalog(records: Iterable[Dict], path: str, person_field: str):
+    """Write records to SQLite with indexes, each with its position in its genre and its tool JSON."""
+    records = list(records)
+    groups = group_by_genre(records)
+    length_field = LENGTH_FIELDS.get(person_field)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS records")
+        conn.execute("DROP TABLE IF EXISTS genre_payloads")
+        conn.execute("DROP TABLE IF EXISTS genres")
+        conn.execute("DROP TABLE IF EXISTS title_words")
+        conn.execute(
+            "CREATE TABLE records "
+            "(id INTEGER PRIMARY KEY, genre TEXT, position INTEGER, person TEXT, length REAL, data TEXT, view TEXT)"
+        )
+        conn.execute("CREATE TABLE genres (genre TEXT PRIMARY KEY, size INTEGER)")
+        conn.execute("CREATE TABLE title_words (word TEXT, record_id INTEGER)")
+        # position = place in the genre's order; a page is one range of the (genre, position) index
+        ordered = [(genre, position, r) for genre, items in groups.items() for position, r in enumerate(items)]
+        conn.executemany(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (i, genre, position, r[person_field].lower(), r.get(length_field), json.dumps(r), json.dumps(tool_view(r)))
+                for i, (genre, position, r) in enumerate(ordered)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO title_words VALUES (?, ?)",
+            ((word, i) for i, (_, _, r) in enumerate(ordered) for word in set(title_words(r["title"]))),
+        )
+        conn.executemany("INSERT INTO genres VALUES (?, ?)", ((genre, len(items)) for genre, items in groups.items()))
+        conn.execute("CREATE INDEX records_genre ON records (genre, position)")
+        conn.execute("CREATE INDEX records_person ON records (person)")
+        conn.execute("CREATE INDEX records_length ON records (genre, length)")
+        conn.execute("CREATE INDEX title_words_word ON title_words (word)")
+    conn.close()
+
+
+class SQLiteCatalog:
+    """Catalog stored in SQLite. Every genre page is read from the file (nothing is kept in memory)."""
+
+    def __init__(self, path: str, person_field: str):
+        self.person_field = person_field
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def genres(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT genre FROM genres")]
+
+    def genre_size(self, genre: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM genres WHERE genre = ?", (genre.lower(),)).fetchone()
+        return row[0] if row else 0
+
+    def _page(self, column: str, genre: str, offset: int, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {column} FROM records WHERE genre = ? AND position >= ? ORDER BY position LIMIT ?",
+                (genre.lower(), offset, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def genre_payload(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> Optional[str]:
+        views = self._page("view", genre, offset, limit)
+        if not views and not self.genre_size(genre):
+            return None
+        return join_views(views)
+
+    def genre_page(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> List[Dict]:
+        return [json.loads(data) for data in self._page("data", genre, offset, limit)]
+
+    def _query(self, column: str, value: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT data FROM records WHERE {column} = ?", (value.lower(),)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def by_genre(self, genre: str) -> List[Dict]:
+        return self.genre_page(genre, 0, -1)
+
+    def genre_page_by_length(
+        self,
+        genre: str,
+        min_length: Optional[float],
+        max_length: Optional[float],
+        offset: int = 0,
+        limit: int = GENRE_PAGE_SIZE,
+    ) -> Tuple[int, List[Dict]]:
+        # The count is a range of the (genre, length) index; the page stops after `limit` rows
+        where, params = "genre = ?", [genre.lower()]
+        if min_length is not None:
+            where, params = where + " AND length >= ?", params + [min_length]
+        if max_length is not None:
+            where, params = where + " AND length <= ?", params + [max_length]
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM records WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM records WHERE {where} ORDER BY position LIMIT ? OFFSET ?", params + [limit, offset],
+            ).fetchall()
+        return total, [json.loads(row[0]) for row in rows]
+
+    def by_person(self, name: str) -> List[Dict]:
+        return self._query("person", name)
+
+    def title_vocabulary(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT word FROM title_words")]
+
+    def by_title_words(self, words: List[str]) -> List[Dict]:
+        if not words:
+            return []
+        marks = ", ".join("?" for _ in words)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM records WHERE id IN (SELECT record_id FROM title_words WHERE word IN ({marks}))",
+                words,
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+# --- Memory-mapped backend ---
+
+def build_mmap_catalog(records: Iterable[Dict], path: str, person_field: str):
+    """Write tool JSON lines by genre + one JSON line per record to `path`, and the offsets to `path.index.json`."""
+    records = list(records)
+    length_field = LENGTH_FIELDS.get(person_field)
+    index = {
+        "person_field": person_field, "count": len(records), "genres": {}, "lengths": {},
+        "people": defaultdict(list), "title_words": defaultdict(list),
+    }
+    with open(path, "wb") as f:
+        # Each genre: its records' tool JSON, one per line; the index keeps where every line starts
+        # (plus where the last one ends), so any page is one slice of the file
+        for genre, items in group_by_genre(records).items():
+            starts = []
+            for record in items:
+                starts.append(f.tell())
+                f.write(json.dumps(tool_view(record)).encode() + b"\n")
+            index["genres"][genre] = starts + [f.tell()]
+            # Lengths in the same order, so a length filter never has to decode a line
+            index["lengths"][genre] = [record.get(length_field) for record in items]
+        for record in records:
+            line = json.dumps(record).encode() + b"\n"
+            location = [f.tell(), len(line)]
+            index["people"][record[person_field].lower()].append(location)
+            for word in set(title_words(record["title"])):
+                index["title_words"][word].append(location)
+            f.write(line)
+    with open(path + ".index.json", "w") as f:
+        json.dump(index, f)
+
+
+class MmapCatalog:
+    """Catalog read straight from a memory-mapped file: the OS pages data in as needed."""
+
+    def __init__(self, path: str, person_field: str):
+        self.person_field = person_field
+        with open(path + ".index.json") as f:
+            index = json.load(f)
+        self._count = index["count"]
+        self._genres = index["genres"]
+        self._lengths = index["lengths"]
+        self._people = index["people"]
+        self._title_words = index["title_words"]
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def genres(self) -> List[str]:
+        return list(self._genres)
+
+    def genre_size(self, genre: str) -> int:
+        starts = self._genres.get(genre.lower())
+        return len(starts) - 1 if starts else 0
+
+    def _views(self, genre: str, offset: int, limit: int) -> Optional[List[str]]:
+        starts = self._genres.get(genre.lower())
+        if starts is None:
+            return None
+        size = len(starts) - 1
+        first, last = min(offset, size), size if limit < 0 else min(offset + limit, size)
+        return self._mm[starts[first]:starts[last]].decode().splitlines()
+
+    def genre_payload(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> Optional[str]:
+        views = self._views(genre, offset, limit)
+        return None if views is None else join_views(views)
+
+    def genre_page(self, genre: str, offset: int = 0, limit: int = GENRE_PAGE_SIZE) -> List[Dict]:
+        return [dict(json.loads(view), genre=genre.lower()) for view in self._views(genre, offset, limit) or []]
+
+    def by_genre(self, genre: str) -> List[Dict]:
+        return self.genre_page(genre, 0, -1)
+
+    def genre_page_by_length(
+        self,
+        genre: str,
+        min_length: Optional[float],
+        max_length: Optional[float],
+        offset: int = 0,
+        limit: int = GENRE_PAGE_SIZE,
+    ) -> Tuple[int, List[Dict]]:
+        starts = self._genres.get(genre.lower())
+        if starts is None:
+            return 0, []
+        matches = [i for i, length in enumerate(self._lengths[genre.lower()]) if in_range(length, min_length, max_length)]
+        page = [json.loads(self._mm[starts[i]:starts[i + 1]]) for i in matches[offset:offset + limit]]
+        return len(matches), [dict(view, genre=genre.lower()) for view in page]
+
+    def _read(self, locations) -> List[Dict]:
+        return [json.loads(self._mm[offset:offset + length]) for offset, length in locations]
+
+    def by_person(self, name: str) -> List[Dict]:
+        return self._read(self._people.get(name.lower(), []))
+
+    def title_vocabulary(self) -> List[str]:
+        return list(self._title_words)
+
+    def by_title_words(self, words: List[str]) -> List[Dict]:
+        locations = {tuple(loc) for word in words for loc in self._title_words.get(word, [])}
+        return self._read(sorted(locations))
+
+# --- Loading ---
+
+def load_catalog(kind: str, path: Optional[str] = None):
+    """Load the 'book' or 'movie' catalog from `path` (or the built-in titles if no path)."""
+    person_field = PERSON_FIELDS[kind]
+    if not path:
+        return Catalog(DEFAULT_RECORDS[kind], person_field)
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".sqlite3", ".sqlite", ".db"):
+        return SQLiteCatalog(path, person_field)
+    if extension == ".json":
+        return Catalog.from_json_file(path, person_field)
+    return MmapCatalog(path, person_field)
+
+
+BOOK_CATALOG = load_catalog("book", os.getenv('BOOK_CATALOG_PATH'))
+MOVIE_CATALOG = load_catalog("movie", os.getenv('MOVIE_CATALOG_PATH'))
@@ -0,0 +1,212 @@
+
+# ==============================================================================
+# Catalog Search: a small, ranked, paginated search tool for the specialists
+# The old get_book_info returned EVERY book in a genre. With a big catalog that
+# is thousands of titles sent back to the model. These tools (the specialists'
+# only catalog tools) return just the best few matches (top-k) plus a cursor
+# the model can use to ask for more. Title searches are ranked by how well the
+# title matches; genre-only searches by rating (see catalog.rank_key).
+# ==============================================================================
+
+import difflib
+import heapq
+import json
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from agents import function_tool
+
+from catalog import BOOK_CATALOG, MOVIE_CATALOG, in_range, title_words
+from tool_cache import cached_tool
+from tool_executor import nonblocking_tool
+
+# --- Settings ---
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 10
+# Only the best candidates by word overlap get the slower fuzzy title score
+RERANK_CANDIDATES = 50
+
+# --- Search ---
+
+# Title words of each catalog by trigram, loaded the first time a misspelled word shows up
+_vocabularies: Dict[int, Tuple[Set[str], Dict[str, List[str]]]] = {}
+
+def _simplify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", text.lower())
+
+
+def resolve_genre(catalog, genre: str) -> Optional[str]:
+    """Find the catalog genre closest to what the model asked for ("Sci Fi" -> "sci-fi")."""
+    if not genre:
+        return None
+    genres = catalog.genres()
+    simple = {_simplify(g): g for g in genres}
+    wanted = _simplify(genre)
+    if wanted in simple:
+        return simple[wanted]
+    close = difflib.get_close_matches(wanted, list(simple), n=1, cutoff=0.6)
+    return simple[close[0]] if close else None
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _vocabulary(catalog) -> Tuple[Set[str], Dict[str, List[str]]]:
+    vocabulary = _vocabularies.get(id(catalog))
+    if vocabulary is None:
+        known = set(catalog.title_vocabulary())
+        buckets = defaultdict(list)
+        for word in known:
+            for gram in _trigrams(word):
+                buckets[gram].append(word)
+        vocabulary = _vocabularies[id(catalog)] = (known, dict(buckets))
+    return vocabulary
+
+
+def expand_words(catalog, words: List[str]) -> List[str]:
+    """Add the closest known title words for misspelled ones ("hobit" -> "hobbit")."""
+    known, buckets = _vocabulary(catalog)
+    expanded = list(words)
+    for word in words:
+        if word in known:
+            continue
+        # Only words sharing a trigram and of a similar length can reach the cutoff,
+        # so difflib never scans the whole vocabulary
+        shortest, longest = len(word) * 0.6, len(word) / 0.6
+        candidates = {
+            w for gram in _trigrams(word) for w in buckets.get(gram, ()) if shortest <= len(w) <= longest
+        }
+        expanded.extend(difflib.get_close_matches(word, sorted(candidates), n=2, cutoff=0.75))
+    return expanded
+
+
+def _word_overlap(words: List[str], title: str) -> float:
+    """Share of the searched words that appear in the title (0.0 to 1.0)."""
+    title_set = set(title_words(title))
+    return sum(1 for w in words if w in title_set) / len(words)
+
+
+def search_catalog(
+    catalog,
+    length_field: str,
+    query: str = "",
+    genre: str = "",
+    min_length: Optional[int] = None,
+    max_length: Optional[int] = None,
+    limit: int = DEFAULT_LIMIT,
+    cursor: str = "",
+) -> Dict:
+    """Filter, rank and paginate catalog records. Returns a small JSON-friendly dict."""
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    resolved_genre = resolve_genre(catalog, genre)
+    if genre and resolved_genre is None:
+        return {"error": "Genre not found in our database.", "genres": sorted(catalog.genres())}
+    words = title_words(query or "")
+    search_words = expand_words(catalog, words) if words else []
+
+    # 1. Genre only: the catalog keeps each genre ranked, so this is just one page of it
+    # (the backend applies the length filter and the limit, so only that page is ever decoded)
+    if resolved_genre and not words:
+        if min_length is None and max_length is None:
+            total = catalog.genre_size(resolved_genre)
+            return _page(resolved_genre, total, catalog.genre_page(resolved_genre, offset, limit), offset, limit)
+        total, page = catalog.genre_page_by_length(resolved_genre, min_length, max_length, offset, limit)
+        return _page(resolved_genre, total, page, offset, limit)
+
+    # 2. Title words: candidates from the word index (never a full scan of the catalog)
+    if not words:
+        return {"error": "Give a genre or some title words to search for."}
+    candidates = [
+        r for r in catalog.by_title_words(search_words)
+        if (not resolved_genre or r["genre"].lower() == resolved_genre)
+        # Length filter (hours for books, minutes for movies)
+        and in_range(r.get(length_field), min_length, max_length)
+    ]
+
+    # 3. Ranking: word overlap first, then a fuzzy title score for the best candidates
+    scored: List[Tuple[float, Dict]] = heapq.nlargest(
+        max(RERANK_CANDIDATES, offset + limit),
+        ((_word_overlap(search_words, r["title"]), r) for r in candidates),
+        key=lambda pair: pair[0],
+    )
+    ranked = sorted(
+        scored,
+        key=lambda pair: (
+            -(pair[0] + difflib.SequenceMatcher(None, query.lower(), pair[1]["title"].lower()).ratio()),
+            pair[1]["title"],
+        ),
+    )
+    ordered = [r for _, r in ranked]
+
+    return _page(resolved_genre, len(candidates), ordered[offset:offset + limit], offset, limit)
+
+
+def _page(genre: Optional[str], total: int, page: List[Dict], offset: int, limit: int) -> Dict:
+    return {
+        "genre": genre,
+        "total": total,
+        "results": [{k: v for k, v in r.items() if k != "genre"} for r in page],
+        "next_cursor": str(offset + limit) if offset + limit < total else None,
+    }
+
+
+def _compact(result: Dict) -> str:
+    # No spaces: every byte here ends up in the model's context
+    return json.dumps(result, separators=(",", ":"))
+
+# --- Tools ---
+
+@cached_tool(case_insensitive=("query", "genre"))
+@function_tool
+@nonblocking_tool
+def search_books(
+    query: Optional[str] = None,
+    genre: Optional[str] = None,
+    min_hours: Optional[int] = None,
+    max_hours: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> str:
+    """Search the book catalog and return the best few matches (best rated first for a genre).
+
+    Args:
+        query: Words from the book title (optional).
+        genre: Book genre, e.g. mystery, romance, fantasy (optional, spelling can be approximate).
+        min_hours: Shortest reading time in hours (optional).
+        max_hours: Longest reading time in hours (optional).
+        limit: How many books to return, at most 10 (optional, default 5).
+        cursor: The next_cursor from a previous search to get more results (optional).
+    """
+    return _compact(search_catalog(
+        BOOK_CATALOG, "hours", query or "", genre or "", min_hours, max_hours, limit or DEFAULT_LIMIT, cursor or "",
+    ))
+
+
+@cached_tool(case_insensitive=("query", "genre"))
+@function_tool
+@nonblocking_tool
+def search_movies(
+    query: Optional[str] = None,
+    genre: Optional[str] = None,
+    min_minutes: Optional[int] = None,
+    max_minutes: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> str:
+    """Search the movie catalog and return the best few matches (best rated first for a genre).
+
+    Args:
+        query: Words from the movie title (optional).
+        genre: Movie genre, e.g. comedy, action, drama (optional, spelling can be approximate).
+        min_minutes: Shortest running time in minutes (optional).
+        max_minutes: Longest running time in minutes (optional).
+        limit: How many movies to return, at most 10 (optional, default 5).
+        cursor: The next_cursor from a previous search to get more results (optional).
+    """
+    return _compact(search_catalog(
+        MOVIE_CATALOG, "minutes", query or "", genre or "", min_minutes, max_minutes, limit or DEFAULT_LIMIT, cursor or "",
+    ))
@@ -0,0 +1,207 @@
+# ==============================================================================
+# Common: small building blocks several modules share
+# Key/value stores with expiry and LRU eviction (in memory, or in a SQLite file
+# shared by processes), walking an agent graph, and a rough token count. They
+# live here so feature modules don't import each other just for these.
+# ==============================================================================
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from agents import Agent
+
+# --- Key/value stores with TTL + LRU eviction ---
+
+class SQLiteLRUStore:
+    """A small key/value store in SQLite with expiry and least-recently-used eviction."""
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, table: str = "entries"):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        self.path = path
+        self._connect()
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+        self._size = self._count()
+        self._new_keys = 0 # since the last recount
+        _open_stores.add(self)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # WAL lets several processes read and write the same file safely
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._size -= 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            existed = self._conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            if existed:
+                return
+            self._size += 1
+            self._new_keys += 1
+            # Other processes may share the file, so our count is only an estimate:
+            # count in SQL before evicting, and now and then anyway
+            if self._size > self.max_entries or self._new_keys >= max(1, self.max_entries // 10):
+                self._new_keys = 0
+                self._size = self._count()
+                if self._size > self.max_entries:
+                    self._evict(now)
+
+    def _evict(self, now: float):
+        # Expired entries go first, then the least recently used ones
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        self._size = self._count()
+        overflow = self._size - self.max_entries
+        if overflow > 0:
+            # Remove a few extra entries so we don't evict on every single insert
+            overflow += max(1, self.max_entries // 10)
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self._size = self._count()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._size = self._count()
+
+    def purge_expired(self):
+        """Remove expired entries now instead of at the next eviction."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            self._size = self._count()
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+            self._size = self._count()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._size = self._count()
+            return self._size
+
+
+# A SQLite connection must not be used on both sides of a fork: stores made
+# before it (service.py --preload) get their own connection in the child
+_open_stores: "weakref.WeakSet[SQLiteLRUStore]" = weakref.WeakSet()
+
+def _reconnect_stores():
+    for store in list(_open_stores):
+        store._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_stores)
+
+
+class MemoryLRUStore:
+    """Same interface as SQLiteLRUStore, kept in a dict (one per process)."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict() # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires_at) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# --- Agents ---
+
+def iter_agents(agent: Agent) -> List[Agent]:
+    """Return the agent and every agent reachable through its handoffs."""
+    found, todo = [], [agent]
+    while todo:
+        current = todo.pop(0)
+        if any(current is a for a in found):
+            continue
+        found.append(current)
+        todo.extend(h for h in current.handoffs if isinstance(h, Agent))
+    return found
+
+# --- Tokens ---
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text and JSON
+    return (len(text) + 3) // 4
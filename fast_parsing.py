@@ -0,0 +1,194 @@
+
+# ==============================================================================
+# Fast Parsing: turn the model's JSON into our output models quickly
+# Final answers: validate the JSON text straight into the pydantic model with
+# a validator that is built once (no json.loads dict in between, no new
+# TypeAdapter per turn). Streaming: the answer arrives 10-20 characters at a
+# time; instead of re-parsing everything received so far on every piece, the
+# IncrementalJSONParser only parses each finished field (and each finished
+# list item) once. See benchmarks/parsing.py for the numbers.
+# ==============================================================================
+
+import functools
+import json
+import re
+from typing import Any, Dict, List, Optional, Union
+
+import pydantic_core
+from pydantic import BaseModel, TypeAdapter
+
+# --- Final answers ---
+
+@functools.lru_cache(maxsize=None)
+def validator_for(output_type: Any) -> TypeAdapter:
+    """One TypeAdapter per output type (for types that aren't pydantic models)."""
+    return TypeAdapter(output_type)
+
+
+def validate_json(output_type: Any, data: Union[str, bytes]) -> Any:
+    """Validate JSON text or bytes directly into `output_type`."""
+    if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+        # Pydantic models carry their compiled validator already
+        return output_type.__pydantic_validator__.validate_json(data)
+    return validator_for(output_type).validate_json(data)
+
+# --- Streaming (partial JSON) ---
+
+_INCOMPLETE = object() # not enough text yet to parse a value (a JSON null parses to None)
+
+def _parse_partial(text: str) -> Any:
+    try:
+        return pydantic_core.from_json(text, allow_partial="trailing-strings")
+    except ValueError:
+        return _INCOMPLETE
+
+
+# Characters that change the parser state; everything else is skipped by the regex
+_STRUCTURAL = re.compile(r'[{}\[\]",:\\]')
+
+
+class IncrementalJSONParser:
+    """Partial view of a streamed JSON object, doing work proportional to each new piece.
+
+    Finished top-level fields are parsed once and kept. While a list field is
+    streaming (like TravelPlan.activities) its finished items are parsed once
+    too, so only the item being written is re-parsed on every piece. Text
+    before the field (or list item) being written is dropped.
+    """
+
+    def __init__(self):
+        self._text = "" # from the start of the field (or list item) being written
+        self._scanned = 0 # positions are relative to _text
+        self._depth = 0
+        self._in_string = False
+        self._skip_at = -1 # the character after a backslash inside a string
+        self._member_start: Optional[int] = None # where the current top-level field starts
+        self._key: Optional[str] = None # its key, once the ':' arrived
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None # where the current list item starts, if the value is a list
+        self._items: Optional[List[Any]] = None # that list: finished items (+ the partial one at the end)
+        self._partial_item = False
+        self._fields: Dict[str, Any] = {} # finished fields
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Add the next piece of text and return the fields parsed so far.
+
+        The returned dict is new each time, but a list that is still being
+        written is the same object across calls (copying it every piece would
+        make long lists quadratic again); copy it if you keep old results.
+        """
+        self._text += chunk
+        self._scan()
+        self._trim()
+        return self.fields()
+
+    def _scan(self):
+        text = self._text
+        for match in _STRUCTURAL.finditer(text, self._scanned):
+            i = match.start()
+            if i == self._skip_at:
+                continue
+            char = text[i]
+            if self._in_string:
+                if char == "\\":
+                    self._skip_at = i + 1
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = i + 1
+                elif self._depth == 2 and char == "[" and self._key is not None:
+                    self._item_start = i + 1
+                    self._items, self._partial_item = [], False
+            elif char in "}]":
+                if self._depth == 2 and self._item_start is not None:
+                    self._finish_item(i)
+                    self._item_start = None
+                if self._depth == 1:
+                    self._finish_member(i)
+                self._depth -= 1
+            elif char == ":" and self._depth == 1:
+                self._key = json.loads(text[self._member_start:i])
+                self._value_start = i + 1
+            elif char == ",":
+                if self._depth == 1:
+                    self._finish_member(i)
+                    self._member_start = i + 1
+                elif self._depth == 2 and self._item_start is not None:
+                    self._finish_item(i)
+                    self._item_start = i + 1
+        self._scanned = len(text)
+
+    def _trim(self):
+        # Keep only the text that may still be parsed
+        if self._item_start is not None:
+            cut = self._item_start
+        elif self._value_start is not None:
+            cut = self._value_start
+        elif self._member_start is not None:
+            cut = self._member_start
+        else:
+            cut = self._scanned
+        if cut == 0:
+            return
+        self._text = self._text[cut:]
+        self._scanned -= cut
+        self._skip_at -= cut
+        for name in ("_member_start", "_value_start", "_item_start"):
+            position = getattr(self, name)
+            if position is not None:
+                setattr(self, name, max(0, position - cut))
+
+    def _finish_item(self, end: int):
+        if self._partial_item:
+            self._items.pop()
+            self._partial_item = False
+        item = self._text[self._item_start:end]
+        if item.strip():
+            self._items.append(json.loads(item))
+
+    def _finish_member(self, end: int):
+        if self._key is not None:
+            if self._items is not None and self._item_start is None and not self._partial_item:
+                value = self._items # the list we have been filling; same content as the parsed text
+            else:
+                value = json.loads(self._text[self._value_start:end])
+            self._fields[self._key] = value
+        self._member_start, self._key, self._value_start = None, None, None
+        self._items, self._partial_item = None, False
+
+    def _partial_text(self, start: int) -> str:
+        # An escape cut in half (a lone backslash, or half of \u00e9) doesn't parse yet: leave it out for now
+        end = len(self._text)
+        escape = self._skip_at - 1 # the backslash of the last escape
+        if self._in_string and escape >= start:
+            length = 6 if self._text[self._skip_at:self._skip_at + 1] == "u" else 2
+            if escape + length > end:
+                end = escape
+        return self._text[start:end]
+
+    def fields(self) -> Dict[str, Any]:
+        fields = dict(self._fields)
+        if self._key is None:
+            return fields
+        if self._items is not None:
+            # A list: finished items + the one being written, partially parsed
+            if self._partial_item:
+                self._items.pop()
+                self._partial_item = False
+            if self._item_start is not None:
+                current = self._partial_text(self._item_start)
+                partial = _parse_partial(current) if current.strip() else _INCOMPLETE
+                if partial is not _INCOMPLETE:
+                    self._items.append(partial)
+                    self._partial_item = True
+            fields[self._key] = self._items
+        else:
+            partial = _parse_partial(self._partial_text(self._value_start))
+            if partial is not _INCOMPLETE:
+                fields[self._key] = partial
+        return fields
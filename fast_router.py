@@ -0,0 +1,264 @@
+
+# ==============================================================================
+# Fast Router: skip the triage turn when the answer is obvious
+# "I want to read a mystery book" clearly belongs to the Book Specialist, so
+# asking the Entertainment Helper first costs a whole model round trip for
+# nothing. This router decides locally (keywords + a tiny Naive Bayes model)
+# and only falls back to the triage agent when it isn't sure, or when the query
+# turns away from what it mentions ("too tired to read, what else?").
+#
+# Decisions are only logged when ROUTER_LOG_PATH is set. Then a small share of
+# fast-path queries (ROUTER_AUDIT_RATE) still go through triage, so the report
+# can tell how often the fast path itself picks the right specialist.
+# ==============================================================================
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+from agents import Agent, Runner
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+ROUTER_THRESHOLD = float(os.getenv('ROUTER_THRESHOLD', '0.9'))
+ROUTER_KEYWORD_THRESHOLD = float(os.getenv('ROUTER_KEYWORD_THRESHOLD', '0.5')) # the model must agree with a keyword
+ROUTER_LOG_PATH = os.getenv('ROUTER_LOG_PATH', '') # e.g. router_decisions.jsonl; empty = no log
+ROUTER_AUDIT_RATE = float(os.getenv('ROUTER_AUDIT_RATE', '0.05')) # fast-path queries sent to triage anyway (with a log)
+
+# Which specialist (by agent name) handles each route
+ROUTE_AGENTS = {"book": "Book Specialist", "movie": "Movie Specialist"}
+
+BOOK_KEYWORDS = {"book", "books", "read", "reading", "novel", "novels", "author", "paperback", "audiobook", "kindle"}
+MOVIE_KEYWORDS = {"movie", "movies", "film", "films", "watch", "cinema", "director", "netflix", "flick", "popcorn"}
+# Words that turn a query away from what it mentions: these always go to triage
+NEGATION_WORDS = {"not", "no", "don't", "dont", "never", "without", "instead", "rather", "tired", "sick", "bored",
+                  "hate", "can't", "cant", "won't", "besides", "except"}
+
+# Small labelled set the Naive Bayes model learns from ("general" -> triage agent)
+TRAINING_EXAMPLES = [
+    ("I want to read a good mystery book", "book"),
+    ("I need a good fantasy book", "book"),
+    ("recommend a romance novel", "book"),
+    ("what should I read on my vacation", "book"),
+    ("suggest a thriller to read on the plane", "book"),
+    ("any good books by Jane Austen", "book"),
+    ("something to read before bed", "book"),
+    ("a page turner for the weekend", "book"),
+    ("I loved The Hobbit, what else should I read", "book"),
+    ("a short story collection for my commute", "book"),
+    ("a classic novel for my book club", "book"),
+    ("recommend an audiobook for a road trip", "book"),
+    ("Recommend a funny movie", "movie"),
+    ("What should I watch tonight?", "movie"),
+    ("a good action film for the weekend", "movie"),
+    ("recommend me a comedy to watch with friends", "movie"),
+    ("I want to see a drama film", "movie"),
+    ("something to watch on netflix", "movie"),
+    ("best movies directed by Wes Anderson", "movie"),
+    ("a scary film for halloween night", "movie"),
+    ("what film should we see at the cinema", "movie"),
+    ("a feel good movie for movie night", "movie"),
+    ("I loved John Wick, what should I watch next", "movie"),
+    ("a family movie for the kids", "movie"),
+    ("I'm bored, what should I do this weekend?", "general"),
+    ("what can I do on a rainy day", "general"),
+    ("give me ideas for a fun evening", "general"),
+    ("I have two hours free, any ideas?", "general"),
+    ("what's a good hobby to start", "general"),
+    ("help me plan a relaxing sunday", "general"),
+    ("should I read or watch something tonight", "general"),
+    ("what are fun things to do with friends", "general"),
+    ("suggest an activity for a quiet night in", "general"),
+    ("I can't decide between a book and a movie", "general"),
+]
+
+# --- Models for routing decisions ---
+
+class Route(BaseModel):
+    target: str # "book", "movie" or "triage"
+    confidence: float
+    method: str # "keywords", "model", "negation", "fallback" or "audit"
+    predicted: str # the model's best guess, even when we fall back (used to measure accuracy)
+
+# --- Tiny Naive Bayes classifier ---
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z']+", text.lower())
+
+
+def last_user_text(input: Union[str, List[Dict[str, Any]]]) -> str:
+    """The newest user message of a Runner input (a plain query or a conversation)."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if item.get("role") == "user" and isinstance(item.get("content"), str):
+            return item["content"]
+    return ""
+
+
+class NaiveBayes:
+    """Multinomial Naive Bayes over words, with add-one smoothing."""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        self.word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.label_counts = Counter(label for _, label in examples)
+        for text, label in examples:
+            self.word_counts[label].update(_words(text))
+        self.vocabulary = {w for counts in self.word_counts.values() for w in counts}
+        self.totals = {label: sum(counts.values()) for label, counts in self.word_counts.items()}
+
+    def predict(self, text: str) -> Dict[str, float]:
+        words = [w for w in _words(text) if w in self.vocabulary]
+        total_examples = sum(self.label_counts.values())
+        log_scores = {}
+        for label, count in self.label_counts.items():
+            score = math.log(count / total_examples)
+            denominator = self.totals[label] + len(self.vocabulary)
+            for w in words:
+                score += math.log((self.word_counts[label][w] + 1) / denominator)
+            log_scores[label] = score
+        # Softmax back to probabilities
+        top = max(log_scores.values())
+        exp = {label: math.exp(s - top) for label, s in log_scores.items()}
+        norm = sum(exp.values())
+        return {label: v / norm for label, v in exp.items()}
+
+# --- Router ---
+
+class FastRouter:
+    """Sends clear book/movie queries straight to the specialist, everything else to triage."""
+
+    def __init__(
+        self,
+        threshold: float = ROUTER_THRESHOLD,
+        log_path: Optional[str] = ROUTER_LOG_PATH,
+        examples: List[Tuple[str, str]] = TRAINING_EXAMPLES,
+        keyword_threshold: float = ROUTER_KEYWORD_THRESHOLD,
+        audit_rate: float = ROUTER_AUDIT_RATE,
+        seed: Optional[int] = None,
+    ):
+        self.threshold = threshold
+        self.keyword_threshold = keyword_threshold
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.model = NaiveBayes(examples)
+        self.rng = random.Random(seed)
+        self._log_lock = threading.Lock()
+
+    def classify(self, query: str) -> Route:
+        words = set(_words(query))
+        probabilities = self.model.predict(query)
+        predicted = max(probabilities, key=probabilities.get)
+        is_book, is_movie = bool(words & BOOK_KEYWORDS), bool(words & MOVIE_KEYWORDS)
+        # 1. "not a book", "too tired to read": the keywords can't be trusted
+        if words & NEGATION_WORDS:
+            return Route(target="triage", confidence=probabilities[predicted], method="negation", predicted=predicted)
+        # 2. Keywords: exactly one kind of entertainment is mentioned and the model agrees enough
+        if is_book != is_movie:
+            target = "book" if is_book else "movie"
+            if probabilities.get(target, 0.0) >= self.keyword_threshold:
+                return Route(target=target, confidence=probabilities[target], method="keywords", predicted=target)
+        # 3. The trained model, only when it's confident
+        if predicted in ROUTE_AGENTS and probabilities[predicted] >= self.threshold:
+            return Route(target=predicted, confidence=probabilities[predicted], method="model", predicted=predicted)
+        # 4. Not sure: let the triage agent decide
+        return Route(target="triage", confidence=probabilities[predicted], method="fallback", predicted=predicted)
+
+    def pick_agent(self, triage_agent: Agent, query: str) -> Tuple[Agent, Route]:
+        """Return the agent that should answer the query, and why."""
+        route = self.classify(query)
+        # Sample some fast-path decisions through triage: its pick shows in the log whether ours was right
+        if route.target != "triage" and self.log_path and self.rng.random() < self.audit_rate:
+            return triage_agent, route.model_copy(update={"target": "triage", "method": "audit"})
+        if route.target != "triage":
+            wanted = ROUTE_AGENTS[route.target]
+            for handoff in triage_agent.handoffs:
+                if isinstance(handoff, Agent) and handoff.name == wanted:
+                    return handoff, route
+        return triage_agent, route.model_copy(update={"target": "triage"})
+
+    async def run(
+        self,
+        triage_agent: Agent,
+        query: Union[str, List[Dict[str, Any]]],
+        run: Callable[..., Awaitable[Any]] = Runner.run,
+        **run_kwargs,
+    ):
+        """Drop-in replacement for Runner.run(triage_agent, query) that may skip the triage turn.
+
+        `query` may also be a conversation (see sessions.py); it is routed on its newest question.
+        """
+        start = time.perf_counter()
+        text = last_user_text(query)
+        agent, route = self.pick_agent(triage_agent, text)
+        route_ms = (time.perf_counter() - start) * 1000
+        result = await run(agent, query, **run_kwargs)
+        self.log(text, route, route_ms, result.last_agent.name, time.perf_counter() - start)
+        return result
+
+    def log(self, query: str, route: Route, route_ms: float, final_agent: str, run_seconds: float):
+        if not self.log_path:
+            return
+        entry = {
+            "time": time.time(),
+            "query": query,
+            **route.model_dump(),
+            "route_ms": round(route_ms, 3),
+            "final_agent": final_agent,
+            "run_seconds": round(run_seconds, 3),
+        }
+        with self._log_lock, open(self.log_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+# --- Report ---
+
+def report(log_path: str = ROUTER_LOG_PATH or "router_decisions.jsonl") -> Dict[str, Any]:
+    """Summarize the decision log: fast-path share, accuracy and latency saved.
+
+    Queries that went through triage tell us the right answer (the agent triage
+    picked), so we can check how often the router's guess would have been right.
+    Audited queries are fast-path decisions sent to triage, so their accuracy is
+    the accuracy of the fast path itself.
+    """
+    entries = []
+    with open(log_path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    fast = [e for e in entries if e["target"] != "triage"]
+    triaged = [e for e in entries if e["target"] == "triage"]
+    labelled = [e for e in triaged if e["final_agent"] in ROUTE_AGENTS.values()]
+    correct = sum(1 for e in labelled if ROUTE_AGENTS.get(e["predicted"]) == e["final_agent"])
+    # Every audited query would have skipped triage: right only if triage picked the same specialist
+    audited = [e for e in triaged if e["method"] == "audit"]
+    audit_correct = sum(1 for e in audited if ROUTE_AGENTS.get(e["predicted"]) == e["final_agent"])
+
+    def mean(values):
+        return sum(values) / len(values) if values else 0.0
+
+    # Compare with triaged runs that ended at a specialist (same work + the triage turn)
+    fast_latency = mean([e["run_seconds"] for e in fast])
+    triaged_latency = mean([e["run_seconds"] for e in labelled])
+    return {
+        "queries": len(entries),
+        "fast_path_share": len(fast) / len(entries) if entries else 0.0,
+        "guess_accuracy_on_triaged": correct / len(labelled) if labelled else None,
+        "audited": len(audited),
+        "fast_path_accuracy": audit_correct / len(audited) if audited else None,
+        "avg_fast_path_seconds": fast_latency,
+        "avg_triaged_seconds": triaged_latency,
+        "estimated_seconds_saved": (triaged_latency - fast_latency) * len(fast) if fast and labelled else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(report(*sys.argv[1:2]), indent=2))
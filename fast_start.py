@@ -0,0 +1,258 @@
+
+# ==============================================================================
+# Fast Start: get a fresh process to its first answer quickly
+# A new worker pays for imports, for turning every output type into a strict
+# JSON schema (again on every model turn) and for the first-call setup inside
+# the agents library. Here we:
+#   - save the output schemas to a file once and load them from there,
+#   - pre-warm the agent graph with one offline run on the mock model,
+#   - measure where the startup time goes (python fast_start.py --profile).
+#
+# Usage:
+#   python fast_start.py --build                  # write output_schemas.json
+#   python fast_start.py --profile v4_handoffs    # import times + time to first answer
+# ==============================================================================
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from agents import Agent, AgentOutputSchema, AgentOutputSchemaBase, ModelBehaviorError
+from dotenv import load_dotenv
+
+from fast_parsing import validate_json
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+SCHEMA_CACHE_PATH = os.getenv('SCHEMA_CACHE_PATH', 'output_schemas.json')
+FAST_START = os.getenv('FAST_START', '1').lower() in ('1', 'true', 'yes') # pre-warm agents at startup
+
+# Modules whose output types --build saves (v4_handoffs uses the agents of recommendation)
+SCHEMA_MODULES = ["recommendation", "v2_structured_output", "v3_tool_calls"]
+
+# --- Saved output schemas ---
+
+@functools.lru_cache(maxsize=None)
+def model_fingerprint(model: Type[BaseModel]) -> str:
+    """Hash of a model's JSON schema (nested models included), so a changed model never uses an old schema.
+
+    Computed once per model and process.
+    """
+    schema = json.dumps(model.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+
+class SchemaStore:
+    """Strict JSON schemas by model name + fingerprint, kept in a JSON file."""
+
+    def __init__(self, path: str = SCHEMA_CACHE_PATH):
+        self.path = path
+        self._schemas: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        if self._schemas is None:
+            try:
+                with open(self.path) as f:
+                    self._schemas = json.load(f)
+            except (OSError, ValueError):
+                self._schemas = {}
+        return self._schemas
+
+    @staticmethod
+    def key(model: Type[BaseModel]) -> str:
+        return f"{model.__name__}:{model_fingerprint(model)}"
+
+    def get(self, model: Type[BaseModel]) -> Dict[str, Any]:
+        """The saved schema, or a freshly generated one (remembered for save())."""
+        key = self.key(model)
+        with self._lock:
+            schemas = self._load()
+            if key not in schemas:
+                schemas[key] = AgentOutputSchema(model).json_schema()
+            return schemas[key]
+
+    def rebuild(self, models: List[Type[BaseModel]]):
+        """Keep exactly these models' schemas (old fingerprints are dropped), generated now."""
+        with self._lock:
+            self._schemas = {self.key(m): AgentOutputSchema(m).json_schema() for m in models}
+
+    def save(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._load(), f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+schema_store = SchemaStore()
+
+
+class PersistedOutputSchema(AgentOutputSchemaBase):
+    """Output schema for a pydantic model, loaded from the schema file instead of rebuilt each turn."""
+
+    def __init__(self, output_type: Type[BaseModel], store: SchemaStore = schema_store):
+        self.output_type = output_type
+        self._store = store
+        self._schema: Optional[Dict[str, Any]] = None
+
+    def is_plain_text(self) -> bool:
+        return False
+
+    def name(self) -> str:
+        return self.output_type.__name__
+
+    def json_schema(self) -> Dict[str, Any]:
+        if self._schema is None:
+            self._schema = self._store.get(self.output_type)
+        return self._schema
+
+    def is_strict_json_schema(self) -> bool:
+        return True
+
+    def validate_json(self, json_str: str) -> Any:
+        try:
+            return validate_json(self.output_type, json_str)
+        except ValidationError as e:
+            raise ModelBehaviorError(f"Invalid JSON when parsing {json_str} for {self.name()}; {e}") from e
+
+
+@functools.lru_cache(maxsize=None)
+def persisted_output(output_type: Type[BaseModel]) -> PersistedOutputSchema:
+    """Use as Agent(output_type=persisted_output(TravelPlan)). One schema object per model."""
+    return PersistedOutputSchema(output_type)
+
+# --- Pre-warming ---
+
+async def prewarm(agent: Agent) -> float:
+    """Run every agent of the graph once on a zero-latency mock model. Returns seconds taken.
+
+    This does the first-call work (library setup, schemas, validators, tool
+    thread pool) before a real user is waiting. Tools really run, with mock
+    arguments, past the tool cache (their results must not be served later).
+    """
+    from agents import RunConfig, Runner
+    from mock_model import LatencyProfile, MockModel
+    from model_factory import with_model
+    from common import iter_agents
+    from tool_cache import bypass_tool_cache
+
+    start = time.perf_counter()
+    mock = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), model_name="prewarm")
+    with bypass_tool_cache():
+        for a in iter_agents(with_model(agent, mock)):
+            await Runner.run(a, "warm up: a good book or movie", run_config=RunConfig(tracing_disabled=True))
+    return time.perf_counter() - start
+
+# --- Profiling ---
+
+def import_times(module: str, top: int = 15) -> List[Dict[str, Any]]:
+    """Import a module in a fresh interpreter with -X importtime; slowest top-level imports first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "MOCK_MODEL": "1"},
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "depth": depth, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    # Only the modules we (or the script) import directly
+    direct = [r for r in rows if r["depth"] <= 1]
+    return sorted(direct, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def measure_startup(module: str, attribute: Optional[str] = None) -> Dict[str, float]:
+    """Time the startup phases in a fresh interpreter, on the mock model."""
+    code = f"""
+import asyncio, json, time
+start = time.perf_counter()
+import agents
+t_agents = time.perf_counter()
+import {module} as m
+t_module = time.perf_counter()
+from fast_start import prewarm
+agent = getattr(m, {attribute!r}) if {attribute!r} else m.build_agents()
+t_build = time.perf_counter()
+loop = asyncio.new_event_loop()
+if {FAST_START!r}:
+    loop.run_until_complete(prewarm(agent))
+t_warm = time.perf_counter()
+async def first():
+    return await agents.Runner.run(agent, "I want to read a mystery book")
+loop.run_until_complete(first())
+t_first = time.perf_counter()
+print(json.dumps({{
+    "import_agents": t_agents - start, "import_module": t_module - t_agents, "build_agents": t_build - t_module,
+    "prewarm": t_warm - t_build, "first_answer": t_first - t_warm, "total": t_first - start,
+}}))
+"""
+    env = {**os.environ, "MOCK_MODEL": "1", "MOCK_LATENCY_MS": "0", "MOCK_LATENCY_DISTRIBUTION": "fixed", "TRACE_EXPORT_PATH": ""}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+ENTRY_AGENTS = {
+    "recommendation": None, # build_agents()
+    "v2_structured_output": "travel_agent",
+    "v3_tool_calls": "recipe_agent",
+    "v4_handoffs": "entertainment_agent",
+}
+
+
+def schema_output_types() -> List[Type[BaseModel]]:
+    """The output models of every agent in SCHEMA_MODULES (plain or persisted_output)."""
+    import importlib
+    from common import iter_agents
+
+    types: List[Type[BaseModel]] = []
+    for name in SCHEMA_MODULES:
+        module = importlib.import_module(name)
+        agent = module.build_agents() if hasattr(module, "build_agents") else getattr(module, ENTRY_AGENTS[name])
+        for a in iter_agents(agent):
+            output_type = getattr(a.output_type, "output_type", a.output_type)
+            if isinstance(output_type, type) and issubclass(output_type, BaseModel) and output_type not in types:
+                types.append(output_type)
+    return types
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Save output schemas and profile startup time")
+    parser.add_argument("--build", action="store_true", help=f"Write every output schema to {SCHEMA_CACHE_PATH}")
+    parser.add_argument("--profile", metavar="MODULE", choices=list(ENTRY_AGENTS), help="Profile the startup of this module")
+    args = parser.parse_args()
+
+    if args.build:
+        import fast_start # the module the agents use (this file runs as __main__)
+
+        fast_start.schema_store.rebuild(schema_output_types())
+        fast_start.schema_store.save()
+        print(f"Saved {len(fast_start.schema_store._load())} output schemas to {SCHEMA_CACHE_PATH}")
+
+    if args.profile:
+        print(f"Slowest imports of {args.profile} (fresh interpreter):")
+        for row in import_times(args.profile):
+            print(f"  {row['module']:<30} {row['cumulative_ms']:>8.1f} ms")
+        phases = measure_startup(args.profile, ENTRY_AGENTS[args.profile])
+        print(f"\nStartup phases (mock model, FAST_START={'1' if FAST_START else '0'}):")
+        for phase, seconds in phases.items():
+            print(f"  {phase:<16} {seconds * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+
+# ==============================================================================
+# Hedging: cut the slow tail of model calls
+# Most model calls are quick, but now and then one takes many times longer and
+# the whole entertainment agent -> specialist chain misses its latency target.
+# A HedgedModel watches how long calls to each model take. When a call is
+# still running after the usual p95, it sends the same request again and
+# uses whichever answer comes first (the other one is cancelled). Transient
+# errors (timeouts, connection errors, 429, 5xx) are retried with jittered
+# exponential backoff. A hedge budget caps the extra requests to a share of
+# all calls, so hedging can't double the bill when everything is slow.
+#
+# Turn it on for every model from resolve_model():  HEDGE_REQUESTS=1 python v4_handoffs.py
+# ==============================================================================
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, Union
+
+import openai
+from agents import Model, ModelProvider, ModelResponse, OpenAIProvider
+from dotenv import load_dotenv
+
+from latency_stats import percentile
+from model_client import get_pooled_client
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95')) # hedge calls slower than this percentile
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20')) # no hedging until we know the model's latency
+HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', '0.1')) # at most this many extra requests per call
+RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', '3')) # tries per call, the first one included
+RETRY_BASE_SECONDS = float(os.getenv('RETRY_BASE_SECONDS', '0.5'))
+RETRY_MAX_SECONDS = float(os.getenv('RETRY_MAX_SECONDS', '8'))
+LATENCY_WINDOW = 500 # recent calls per model used for the percentile
+HEDGE_BURST = 5 # hedges allowed at once when the budget is full
+
+# Errors worth trying again (the request itself was fine)
+TRANSIENT_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+# --- Latency tracking ---
+
+class RollingLatency:
+    """The last `window` latencies of one model and the hedge delay they give."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, pct: float = HEDGE_PERCENTILE, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.pct = pct
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._new = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._new += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds after which a call counts as slow, or None while there are too few samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            # Sorting 500 numbers on every call is wasteful; refresh every 10 new samples
+            if self._delay is None or self._new >= 10:
+                self._delay = percentile(self._samples, self.pct)
+                self._new = 0
+            return self._delay
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = list(self._samples)
+        return {"samples": len(samples), "p50": percentile(samples, 50), "p95": percentile(samples, 95)}
+
+
+class HedgeBudget:
+    """Token bucket: each call adds `ratio` tokens (up to `burst`), each hedge takes one."""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def on_call(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            # (a little slack: ten calls at ratio 0.1 add up to 0.999... in floats)
+            if self._tokens >= 1 - 1e-9:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgeStats:
+    """Counters per model: calls, hedges sent, hedges that won, retries, errors, hedges refused by the budget."""
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, model: str, counter: str, amount: int = 1):
+        with self._lock:
+            entry = self._models.setdefault(
+                model, {"calls": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0, "retries": 0, "errors": 0}
+            )
+            entry[counter] += amount
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._models.items()}
+
+
+hedge_stats = HedgeStats()
+
+# --- Racing and retrying ---
+
+async def race(
+    call: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    may_hedge: Callable[[], bool],
+    discard: Callable[[Any], Any] = lambda _result: None,
+) -> Tuple[Any, bool]:
+    """Run `call`; if it takes longer than `delay`, start a second one and keep the first to succeed.
+
+    Returns (result, hedged_won). The slower call is cancelled, or handed to
+    `discard` when it finished too. If one call fails, the other still counts.
+    """
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and may_hedge():
+                tasks.add(asyncio.ensure_future(call()))
+        while True:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in done if t.exception() is None), None)
+            if winner is not None or not pending:
+                break
+            # The finished one failed: wait for the other
+            tasks = pending
+        if winner is None:
+            raise next(iter(done)).exception()
+        for task in done:
+            if task is not winner and task.exception() is None:
+                discard(task.result())
+        return winner.result(), winner is not primary
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def backoff_seconds(attempt: int, error: Exception, rng: random.Random,
+                    base: float = RETRY_BASE_SECONDS, cap: float = RETRY_MAX_SECONDS) -> float:
+    """Full jitter: random between 0 and base * 2^attempt (capped), or the server's Retry-After."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+# --- Model ---
+
+class HedgedModel(Model):
+    """Wraps a model (or a model name) with hedged requests and retries."""
+
+    def __init__(
+        self,
+        model: Union[str, Model],
+        model_name: Optional[str] = None,
+        budget: Optional[HedgeBudget] = None,
+        stats: HedgeStats = hedge_stats,
+        attempts: int = RETRY_ATTEMPTS,
+        seed: Optional[int] = None,
+    ):
+        self.model = model
+        self.model_name = model_name or (model if isinstance(model, str) else getattr(model, "model_name", type(model).__name__))
+        self.budget = budget or HedgeBudget()
+        self.stats = stats
+        self.attempts = attempts
+        self.latency = RollingLatency() # whole responses
+        self.first_event = RollingLatency() # streams: time to the first event
+        self.rng = random.Random(seed)
+
+    def _inner(self) -> Model:
+        # Model names get the pooled client: its own retries are off, we retry here
+        if isinstance(self.model, str):
+            self.model = OpenAIProvider(openai_client=get_pooled_client()).get_model(self.model)
+        return self.model
+
+    async def _call(self, attempt: Callable[[], Awaitable[Any]], latency: RollingLatency,
+                    discard: Callable[[Any], Any] = lambda _result: None) -> Any:
+        self.stats.add(self.model_name, "calls")
+        self.budget.on_call()
+
+        def may_hedge() -> bool:
+            if self.budget.try_spend():
+                self.stats.add(self.model_name, "hedges")
+                return True
+            self.stats.add(self.model_name, "over_budget")
+            return False
+
+        for number in range(self.attempts):
+            start = time.perf_counter()
+            try:
+                result, hedge_won = await race(attempt, latency.hedge_delay(), may_hedge, discard)
+                # The latency the caller saw: for a hedged call at least the delay, so winning
+                # hedges don't pull the percentile down (and trigger ever more hedges)
+                latency.record(time.perf_counter() - start)
+                if hedge_won:
+                    self.stats.add(self.model_name, "hedge_wins")
+                return result
+            except TRANSIENT_ERRORS as e:
+                if number == self.attempts - 1:
+                    self.stats.add(self.model_name, "errors")
+                    raise
+                self.stats.add(self.model_name, "retries")
+                await asyncio.sleep(backoff_seconds(number, e, self.rng))
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> ModelResponse:
+        return await self._call(
+            lambda: self._inner().get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+            ),
+            self.latency,
+        )
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> AsyncIterator[Any]:
+        # A stream can only be hedged (and retried) until its first event arrives.
+        # Each attempt runs in its own task from start to end, as the model's tracing
+        # span must be closed in the context it was opened in; events come through a queue.
+        async def pump(queue: asyncio.Queue):
+            try:
+                async for event in self._inner().stream_response(
+                    system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+                ):
+                    queue.put_nowait(("event", event))
+                queue.put_nowait(("done", None))
+            except Exception as e:
+                queue.put_nowait(("error", e))
+
+        async def first_event():
+            queue: asyncio.Queue = asyncio.Queue()
+            task = asyncio.ensure_future(pump(queue))
+            try:
+                kind, value = await queue.get()
+            except BaseException:
+                task.cancel()
+                raise
+            if kind == "error":
+                raise value
+            return task, queue, (kind, value)
+
+        task, queue, (kind, value) = await self._call(first_event, self.first_event, lambda started: started[0].cancel())
+        try:
+            while kind == "event":
+                yield value
+                kind, value = await queue.get()
+            if kind == "error":
+                raise value
+        finally:
+            task.cancel()
+
+
+class HedgedModelProvider(ModelProvider):
+    """Use with RunConfig(model_provider=...) to hedge agents whose model is a name."""
+
+    def __init__(self, provider: Optional[ModelProvider] = None, budget: Optional[HedgeBudget] = None):
+        self.provider = provider or OpenAIProvider(openai_client=get_pooled_client())
+        self.budget = budget or HedgeBudget() # shared by all models of this provider
+        self._models: Dict[str, HedgedModel] = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        name = model_name or ""
+        if name not in self._models:
+            self._models[name] = HedgedModel(self.provider.get_model(model_name), name, self.budget)
+        return self._models[name]
+
+# --- Switch from the environment ---
+
+_shared_budget: Optional[HedgeBudget] = None
+
+def hedged_model(model: Union[str, Model]) -> Union[str, Model]:
+    """Wrap an agent's model with hedging and retries when HEDGE_REQUESTS is set (one budget for all)."""
+    global _shared_budget
+    if not HEDGE_REQUESTS:
+        return model
+    if _shared_budget is None:
+        _shared_budget = HedgeBudget()
+    return HedgedModel(model, budget=_shared_budget)
+
+
+def print_hedge_stats(stats: HedgeStats = hedge_stats):
+    print("\n" + "="*50)
+    print(f"{'model':<24} {'calls':>6} {'hedges':>7} {'won':>5} {'over budget':>12} {'retries':>8} {'errors':>7}")
+    for name, s in stats.summary().items():
+        print(f"{name:<24} {s['calls']:>6} {s['hedges']:>7} {s['hedge_wins']:>5} {s['over_budget']:>12} "
+              f"{s['retries']:>8} {s['errors']:>7}")
@@ -0,0 +1,31 @@
+
+# ==============================================================================
+# Small helpers to summarize latencies (p50, p95, p99...)
+# Used by the batch runner and the other performance tools in this repo
+# ==============================================================================
+
+import math
+from typing import Dict, Iterable, List
+
+
+def percentile(values: Iterable[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of the values, 0.0 if there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Nearest-rank method: simple and good enough for latency reports
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """Summarize a list of latencies (in seconds) into count, mean and percentiles."""
+    count = len(latencies)
+    return {
+        "count": count,
+        "mean": sum(latencies) / count if count else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if count else 0.0,
+    }
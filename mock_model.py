@@ -0,0 +1,330 @@
+
+# ==============================================================================
+# Mock Model: a fake LLM for load tests and benchmarks (no API key, no cost)
+# It behaves like a real model from the runner's point of view: it calls
+# tools, hands off to specialists and returns JSON that matches the agent's
+# output_type (TravelPlan, RecipeRecommendation, BookRecommendation...).
+# Each call waits for a configurable, random amount of time like a real API.
+#
+# Use it in any script:  MOCK_MODEL=1 python v4_handoffs.py  (see model_factory.py)
+# ==============================================================================
+
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+import openai
+from pydantic import BaseModel
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+from agents import FunctionTool, Model, ModelProvider, ModelResponse, Usage
+from agents.tracing import generation_span
+
+# --- Latency ---
+
+class LatencyProfile(BaseModel):
+    """How long each fake model call takes."""
+    distribution: str = "lognormal" # "fixed", "uniform" or "lognormal"
+    median_ms: float = 400 # fixed value / lognormal median
+    sigma: float = 0.5 # lognormal spread (bigger = longer tail)
+    low_ms: float = 200 # uniform range
+    high_ms: float = 800
+    first_token_fraction: float = 0.3 # when streaming, share of the time spent before the first token
+
+    def sample(self, rng: random.Random) -> float:
+        """Return one latency in seconds."""
+        if self.distribution == "fixed":
+            ms = self.median_ms
+        elif self.distribution == "uniform":
+            ms = rng.uniform(self.low_ms, self.high_ms)
+        else:
+            ms = rng.lognormvariate(0, self.sigma) * self.median_ms
+        return ms / 1000
+
+# --- Schema-valid fake data ---
+
+WORDS = ["sunny", "classic", "cozy", "epic", "quick", "famous", "local", "hidden", "fresh", "gentle"]
+STOPWORDS = {"i", "want", "to", "a", "an", "the", "me", "my", "for", "some", "good", "great", "need",
+             "recommend", "what", "should", "can", "you", "have", "and", "at", "home", "something", "tonight",
+             "bored", "suggest", "book", "books", "read", "movie", "movies", "watch", "recipe", "make"}
+TOPIC_WORDS = {"book", "books", "read", "movie", "movies", "film", "watch", "recipe", "travel"}
+
+
+def _choices_from_description(description: str) -> Optional[List[str]]:
+    # "Easy, Medium, or Hard" -> ["Easy", "Medium", "Hard"]
+    match = re.fullmatch(r"\s*([A-Z]\w*(?:, [A-Z]\w*)*),? or ([A-Z]\w*)\.?\s*", description or "")
+    if not match:
+        return None
+    return match.group(1).split(", ") + [match.group(2)]
+
+
+def fake_value(schema: Dict[str, Any], rng: random.Random, defs: Dict[str, Any], name: str = "") -> Any:
+    """Generate a random value that matches a JSON schema."""
+    if "$ref" in schema:
+        return fake_value(defs[schema["$ref"].split("/")[-1]], rng, defs, name)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"] or schema["anyOf"]
+        return fake_value(options[0], rng, defs, name)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    lowered = name.lower()
+    if kind == "object":
+        return {
+            key: fake_value(prop, rng, defs, key)
+            for key, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [fake_value(schema.get("items", {}), rng, defs, name) for _ in range(rng.randint(2, 5))]
+    if kind == "integer":
+        if "minutes" in lowered:
+            return rng.randint(15, 150)
+        if "hours" in lowered:
+            return rng.randint(2, 20)
+        return rng.randint(1, 10)
+    if kind == "number":
+        return round(rng.uniform(100, 5000), 2) if "budget" in lowered or "price" in lowered else round(rng.uniform(1, 10), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    choices = _choices_from_description(schema.get("description", ""))
+    if choices:
+        return rng.choice(choices)
+    return f"{rng.choice(WORDS).title()} {name.replace('_', ' ') or 'text'} {rng.randint(1, 999)}"
+
+def spoil_answer(answer: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Break one field the way a weak model might: zero/negative numbers, empty or vague text, empty lists."""
+    key = rng.choice(list(answer))
+    value = answer[key]
+    if isinstance(value, bool):
+        pass
+    elif isinstance(value, (int, float)):
+        answer[key] = rng.choice([0, -abs(value)])
+    elif isinstance(value, str):
+        answer[key] = rng.choice(["", "unknown"])
+    elif isinstance(value, list):
+        answer[key] = []
+    return answer
+
+# --- Helpers to read the conversation ---
+
+def _item_get(item: Any, key: str) -> Any:
+    return item.get(key) if isinstance(item, dict) else getattr(item, key, None)
+
+
+def _user_text(input: Any) -> str:
+    """Text of the last user message."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if _item_get(item, "role") == "user":
+            content = _item_get(item, "content")
+            if isinstance(content, str):
+                return content
+            return " ".join(str(_item_get(part, "text") or "") for part in content or [])
+    return ""
+
+
+def _calls_since_user(input: Any, names: set) -> int:
+    """How many of these tools (or handoffs) were already called for the current question."""
+    if isinstance(input, str):
+        return 0
+    count = 0
+    for item in reversed(input):
+        if _item_get(item, "role") == "user":
+            break
+        if _item_get(item, "type") == "function_call" and _item_get(item, "name") in names:
+            count += 1
+    return count
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+# --- Mock model ---
+
+class MockModel(Model):
+    """A local stand-in for a real model. Plug it into Agent(model=...) or use MockModelProvider."""
+
+    def __init__(
+        self,
+        latency: Optional[LatencyProfile] = None,
+        seed: Optional[int] = None,
+        tool_call_probability: float = 1.0,
+        script: Optional[Dict[str, Any]] = None,
+        model_name: str = "mock",
+        bad_answer_rate: float = 0.0,
+        error_rate: float = 0.0,
+    ):
+        """`script` maps an output type name (e.g. "TravelPlan") to the exact answer to return.
+
+        `bad_answer_rate` is the share of answers with one broken field (still schema-valid).
+        `error_rate` is the share of calls failing with a connection error (to try retries).
+        """
+        self.latency = latency or LatencyProfile()
+        self.rng = random.Random(seed)
+        self.tool_call_probability = tool_call_probability
+        self.script = script or {}
+        self.model_name = model_name
+        self.bad_answer_rate = bad_answer_rate
+        self.error_rate = error_rate
+        self.calls = 0
+
+    # --- Deciding what to answer ---
+
+    def _pick_handoff(self, handoffs, text: str):
+        words = set(re.findall(r"[a-z]+", text.lower()))
+        for handoff in handoffs:
+            about = f"{handoff.agent_name} {handoff.tool_description}".lower()
+            if words & set(re.findall(r"[a-z]+", about)) & TOPIC_WORDS:
+                return handoff
+        return None
+
+    def _tool_arguments(self, tool: FunctionTool, text: str) -> str:
+        words = [w for w in re.findall(r"[a-z]+", text.lower()) if w not in STOPWORDS and len(w) > 2]
+        schema = tool.params_json_schema
+        arguments = {}
+        for key, prop in schema.get("properties", {}).items():
+            if prop.get("type") == "string" and words:
+                arguments[key] = words[0]
+            else:
+                arguments[key] = fake_value(prop, self.rng, schema.get("$defs", {}), key)
+        return json.dumps(arguments)
+
+    def _final_text(self, output_schema) -> str:
+        if output_schema is None or output_schema.is_plain_text():
+            return f"This is a mock answer #{self.calls}."
+        name = output_schema.name()
+        if name in self.script:
+            return json.dumps(self.script[name])
+        schema = output_schema.json_schema()
+        answer = fake_value(schema, self.rng, schema.get("$defs", {}))
+        # (no random draw when off, so seeded runs give the same answers as before)
+        if self.bad_answer_rate > 0 and isinstance(answer, dict) and answer and self.rng.random() < self.bad_answer_rate:
+            answer = spoil_answer(answer, self.rng)
+        return json.dumps(answer)
+
+    def _build_output(self, input, tools, output_schema, handoffs, parallel_tool_calls=False) -> List[Any]:
+        text = _user_text(input)
+        if handoffs and _calls_since_user(input, {h.tool_name for h in handoffs}) == 0:
+            handoff = self._pick_handoff(handoffs, text)
+            if handoff is not None:
+                return [self._function_call(handoff.tool_name, "{}")]
+        function_tools = [t for t in tools if isinstance(t, FunctionTool)]
+        if (
+            function_tools
+            and _calls_since_user(input, {t.name for t in function_tools}) == 0
+            and self.rng.random() < self.tool_call_probability
+        ):
+            # With parallel tool calls the model asks for every tool in one turn
+            chosen = function_tools if parallel_tool_calls else function_tools[:1]
+            return [self._function_call(tool.name, self._tool_arguments(tool, text)) for tool in chosen]
+        return [self._message(self._final_text(output_schema))]
+
+    def _function_call(self, name: str, arguments: str) -> ResponseFunctionToolCall:
+        return ResponseFunctionToolCall(
+            id=f"fc_{uuid.uuid4().hex}", call_id=f"call_{uuid.uuid4().hex}",
+            type="function_call", name=name, arguments=arguments, status="completed",
+        )
+
+    def _message(self, text: str) -> ResponseOutputMessage:
+        return ResponseOutputMessage(
+            id=f"msg_{uuid.uuid4().hex}", type="message", role="assistant", status="completed",
+            content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+        )
+
+    def _usage(self, system_instructions, input, output) -> Usage:
+        input_tokens = _estimate_tokens((system_instructions or "") + json.dumps(input, default=str))
+        output_tokens = _estimate_tokens(json.dumps([o.model_dump() for o in output]))
+        return Usage(requests=1, input_tokens=input_tokens, output_tokens=output_tokens,
+                     total_tokens=input_tokens + output_tokens)
+
+    def _maybe_fail(self):
+        # (no random draw when off, like bad_answer_rate)
+        if self.error_rate > 0 and self.rng.random() < self.error_rate:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://mock.invalid/v1/responses"))
+
+    # --- Model interface ---
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> ModelResponse:
+        self.calls += 1
+        self._maybe_fail()
+        with generation_span(model=self.model_name, disabled=tracing.is_disabled()) as span:
+            await asyncio.sleep(self.latency.sample(self.rng))
+            output = self._build_output(input, tools, output_schema, handoffs, model_settings.parallel_tool_calls)
+            usage = self._usage(system_instructions, input, output)
+            span.span_data.usage = {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+            span.span_data.output = [item.model_dump() for item in output]
+        return ModelResponse(output=output, usage=usage, response_id=None)
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> AsyncIterator[Any]:
+        self.calls += 1
+        self._maybe_fail()
+        with generation_span(model=self.model_name, disabled=tracing.is_disabled()) as span:
+            total = self.latency.sample(self.rng)
+            await asyncio.sleep(total * self.latency.first_token_fraction)
+            output = self._build_output(input, tools, output_schema, handoffs, model_settings.parallel_tool_calls)
+            usage = self._usage(system_instructions, input, output)
+            span.span_data.usage = {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+            span.span_data.output = [item.model_dump() for item in output]
+            sequence = 0
+            message = output[0] if isinstance(output[0], ResponseOutputMessage) else None
+            if message is not None:
+                # Send the answer in small chunks, spread over the rest of the latency
+                text = message.content[0].text
+                chunks = [text[i:i + 16] for i in range(0, len(text), 16)] or [""]
+                pause = total * (1 - self.latency.first_token_fraction) / len(chunks)
+                for chunk in chunks:
+                    yield ResponseTextDeltaEvent.model_construct(
+                        type="response.output_text.delta", delta=chunk, item_id=message.id,
+                        output_index=0, content_index=0, sequence_number=sequence, logprobs=[],
+                    )
+                    sequence += 1
+                    await asyncio.sleep(pause)
+            else:
+                await asyncio.sleep(total * (1 - self.latency.first_token_fraction))
+            response = Response.model_construct(
+                id=f"resp_{uuid.uuid4().hex}", object="response", created_at=time.time(), model=self.model_name,
+                output=output, parallel_tool_calls=False, tool_choice="auto", tools=[],
+                usage=ResponseUsage(
+                    input_tokens=usage.input_tokens, output_tokens=usage.output_tokens,
+                    total_tokens=usage.total_tokens,
+                    input_tokens_details=InputTokensDetails(cached_tokens=0),
+                    output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+                ),
+            )
+            yield ResponseCompletedEvent.model_construct(type="response.completed", response=response, sequence_number=sequence)
+
+
+class MockModelProvider(ModelProvider):
+    """Returns a MockModel for every model name (use with RunConfig(model_provider=...))."""
+
+    def __init__(self, **mock_kwargs):
+        self.mock_kwargs = mock_kwargs
+        self._models: Dict[str, MockModel] = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        name = model_name or "mock"
+        if name not in self._models:
+            self._models[name] = MockModel(model_name=name, **self.mock_kwargs)
+        return self._models[name]
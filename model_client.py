@@ -0,0 +1,135 @@
+
+# ==============================================================================
+# One long-lived event loop + one shared HTTP client for the whole process
+# asyncio.run() creates a new loop every time, which throws away the open
+# connections to OpenAI. Here we keep the loop (and its connections) alive.
+# ==============================================================================
+
+import asyncio
+import os
+import queue
+import threading
+from typing import Any, AsyncIterable, Coroutine, Dict, Iterator, Optional
+
+from agents import set_default_openai_client
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+MAX_CONNECTIONS = int(os.getenv('MODEL_MAX_CONNECTIONS', '20'))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('MODEL_MAX_KEEPALIVE_CONNECTIONS', '10'))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('MODEL_KEEPALIVE_EXPIRY_SECONDS', '60'))
+# Retries inside the openai library. They are off with HEDGE_REQUESTS=1 (it retries with its own
+# backoff, otherwise each of its tries could be three requests) and with RATE_LIMIT=1 (the
+# library's retries would skip the rate limiter's buckets)
+_OWN_RETRIES = any(os.getenv(name, '').lower() in ('1', 'true', 'yes') for name in ('HEDGE_REQUESTS', 'RATE_LIMIT'))
+MODEL_MAX_RETRIES = int(os.getenv('MODEL_MAX_RETRIES', '0' if _OWN_RETRIES else '2'))
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client = None
+
+# Counters for connection reuse (updated from the background loop)
+_stats = {"requests": 0, "new_connections": 0, "tls_handshakes": 0}
+
+# --- Background event loop ---
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop, starting its thread the first time."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="agents-event-loop", daemon=True)
+            thread.start()
+        return _loop
+
+
+def run_in_background(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop and wait for its result (use instead of asyncio.run)."""
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    return future.result(timeout)
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iterate_in_background(items: AsyncIterable[Any]) -> Iterator[Any]:
+    """Consume an async iterator on the shared loop and hand its items to this (sync) thread."""
+    inbox: "queue.Queue" = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in items:
+                inbox.put(item)
+        except BaseException as e:
+            inbox.put(_Failure(e))
+        finally:
+            inbox.put(done)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_background_loop())
+    try:
+        while True:
+            item = inbox.get()
+            if item is done:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # If the caller stops early, stop the producer too
+        future.cancel()
+
+# --- Pooled OpenAI client ---
+
+async def _trace(event_name: str, info: Dict[str, Any]):
+    # httpcore calls this for every low-level network step of a request
+    if event_name == "connection.connect_tcp.started":
+        _stats["new_connections"] += 1
+    elif event_name == "connection.start_tls.started":
+        _stats["tls_handshakes"] += 1
+
+
+async def _on_request(request):
+    _stats["requests"] += 1
+    request.extensions["trace"] = _trace
+
+
+def get_pooled_client():
+    """Return the shared AsyncOpenAI client with a keep-alive connection pool (MODEL_MAX_RETRIES retries)."""
+    global _client
+    with _lock:
+        if _client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                event_hooks={"request": [_on_request]},
+            )
+            _client = AsyncOpenAI(http_client=http_client, max_retries=MODEL_MAX_RETRIES)
+        return _client
+
+
+def install_pooled_client():
+    """Make every agent in this process use the shared pooled client."""
+    set_default_openai_client(get_pooled_client())
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    """How many requests reused an open connection instead of opening a new one."""
+    requests = _stats["requests"]
+    reused = max(0, requests - _stats["new_connections"])
+    return {
+        **_stats,
+        "reused_connections": reused,
+        "reuse_ratio": reused / requests if requests else 0.0,
+    }
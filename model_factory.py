@@ -0,0 +1,61 @@
+
+# ==============================================================================
+# Model Factory: which model object each agent gets
+# Scripts, the app and the service ask resolve_model() for a model by name. It
+# returns the name unchanged (the SDK then uses OpenAI), or the offline
+# MockModel, wrapped with the record/replay, rate-limit and hedging layers
+# that are switched on in the environment. with_model() gives a copy of an
+# agent graph that runs on another model (cascade tiers, cheaper budget tiers).
+# ==============================================================================
+
+import os
+from typing import Dict, Optional
+
+from agents import Agent
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# --- Models ---
+
+def with_model(agent: Agent, model, _copies: Optional[Dict[int, Agent]] = None) -> Agent:
+    """Return a copy of the agent graph (handoffs included) where every agent uses `model`."""
+    copies = {} if _copies is None else _copies
+    if id(agent) not in copies:
+        copy = copies[id(agent)] = agent.clone(model=model)
+        copy.handoffs = [
+            with_model(h, model, copies) if isinstance(h, Agent) else h for h in agent.handoffs
+        ]
+    return copies[id(agent)]
+
+
+def resolve_model(model_name: str):
+    """Return a MockModel when MOCK_MODEL=1 is set, otherwise the model name unchanged.
+
+    With CASSETTE_MODE=record/replay the model is also wrapped by cassette.py,
+    with RATE_LIMIT=1 by rate_limiter.py (shared RPM/TPM buckets, priorities)
+    and with HEDGE_REQUESTS=1 by hedging.py (hedged requests and retries).
+    """
+    model = model_name
+    if os.getenv('MOCK_MODEL', '').lower() in ('1', 'true', 'yes'):
+        from mock_model import LatencyProfile, MockModel
+        latency = LatencyProfile(
+            distribution=os.getenv('MOCK_LATENCY_DISTRIBUTION', 'lognormal'),
+            median_ms=float(os.getenv('MOCK_LATENCY_MS', '400')),
+        )
+        bad_answer_rate = float(os.getenv('MOCK_BAD_ANSWER_RATE', '0'))
+        error_rate = float(os.getenv('MOCK_ERROR_RATE', '0'))
+        model = MockModel(latency=latency, model_name=f"mock-{model_name}", bad_answer_rate=bad_answer_rate,
+                          error_rate=error_rate)
+    if os.getenv('CASSETTE_MODE'):
+        from cassette import cassette_model
+        model = cassette_model(model)
+    if os.getenv('RATE_LIMIT', '').lower() in ('1', 'true', 'yes'):
+        # Inside the hedging, so hedges and retries wait for the rate limit too
+        from rate_limiter import rate_limited_model
+        model = rate_limited_model(model)
+    if os.getenv('HEDGE_REQUESTS', '').lower() in ('1', 'true', 'yes'):
+        from hedging import hedged_model
+        model = hedged_model(model)
+    return model
@@ -0,0 +1,144 @@
+
+# ==============================================================================
+# Prompt Registry: the same agent should send the same bytes, every time
+# OpenAI reuses (caches) the start of a prompt it has seen recently, which is
+# cheaper and faster, but only when that start is byte-for-byte identical.
+# Our instructions are indented triple-quoted strings, so the "same" agent in
+# app.py and v4_handoffs.py sends different whitespace. Here we clean up the
+# instructions, put tools and handoffs in a fixed order, hash the result and
+# estimate how much of each request the provider can serve from its cache.
+# ==============================================================================
+
+import hashlib
+import json
+import re
+import textwrap
+import threading
+from typing import Any, Dict, List
+
+from agents import Agent, AgentOutputSchema, AgentOutputSchemaBase, Handoff
+
+from common import estimate_tokens, iter_agents
+
+# --- Settings ---
+# OpenAI only caches prompts of at least 1024 tokens, in steps of 128 tokens
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+TYPICAL_QUERY_TOKENS = 30 # the part of each request that changes (the user's message)
+
+# --- Normalizing ---
+
+def normalize_instructions(text: str) -> str:
+    """Dedent, strip trailing spaces and collapse runs of blank lines."""
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def _handoff_key(handoff) -> str:
+    return handoff.agent_name if isinstance(handoff, Handoff) else handoff.name
+
+
+def prefix_parts(agent: Agent) -> Dict[str, Any]:
+    """The parts of every request that don't depend on the user's message, in a fixed order."""
+    output_schema = None
+    if isinstance(agent.output_type, AgentOutputSchemaBase):
+        output_schema = agent.output_type.json_schema()
+    elif agent.output_type is not None and agent.output_type is not str:
+        output_schema = AgentOutputSchema(agent.output_type).json_schema()
+    handoffs = []
+    for h in agent.handoffs:
+        if isinstance(h, Handoff):
+            handoffs.append({"name": h.tool_name, "description": h.tool_description})
+        else:
+            handoffs.append({"name": Handoff.default_tool_name(h), "description": Handoff.default_tool_description(h)})
+    return {
+        "instructions": agent.instructions if isinstance(agent.instructions, str) else None,
+        "tools": [
+            {"name": t.name, "description": getattr(t, "description", ""), "parameters": getattr(t, "params_json_schema", None)}
+            for t in agent.tools
+        ],
+        "handoffs": handoffs,
+        "output_schema": output_schema,
+    }
+
+
+def prefix_text(agent: Agent) -> str:
+    return json.dumps(prefix_parts(agent), sort_keys=True, separators=(",", ":"))
+
+
+def prefix_hash(agent: Agent) -> str:
+    return hashlib.sha256(prefix_text(agent).encode("utf-8")).hexdigest()[:16]
+
+
+def cached_prefix_ratio(prefix_tokens: int, query_tokens: int = TYPICAL_QUERY_TOKENS) -> float:
+    """Share of a request's input tokens the provider can serve from its prompt cache."""
+    total = prefix_tokens + query_tokens
+    if total < CACHE_MIN_TOKENS:
+        return 0.0
+    cached = (prefix_tokens // CACHE_STEP_TOKENS) * CACHE_STEP_TOKENS
+    return cached / total
+
+# --- Registry ---
+
+class PromptRegistry:
+    """Normalizes agents in place and remembers their prefix hashes."""
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, agent: Agent) -> Agent:
+        """Normalize the agent and every agent it hands off to. Returns the same agent."""
+        for a in iter_agents(agent):
+            saved_tokens = 0
+            if isinstance(a.instructions, str):
+                normalized = normalize_instructions(a.instructions)
+                saved_tokens = estimate_tokens(a.instructions) - estimate_tokens(normalized)
+                a.instructions = normalized
+            # Same tools and handoffs in a different order would be a different prefix
+            a.tools = sorted(a.tools, key=lambda t: t.name)
+            a.handoffs = sorted(a.handoffs, key=_handoff_key)
+            prefix_tokens = estimate_tokens(prefix_text(a))
+            with self._lock:
+                # One entry per distinct prefix: the same agent defined twice shows up once
+                self._agents[f"{a.name}:{prefix_hash(a)}"] = {
+                    "agent": a.name,
+                    "prefix_hash": prefix_hash(a),
+                    "prefix_tokens": prefix_tokens,
+                    "tokens_saved_by_normalizing": saved_tokens,
+                    "estimated_cached_ratio": round(cached_prefix_ratio(prefix_tokens), 3),
+                }
+        return agent
+
+    def report(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._agents.values()]
+
+
+registry = PromptRegistry()
+
+def register_agents(*agents: Agent):
+    """Normalize these agents (and their handoffs) with the shared registry."""
+    for agent in agents:
+        registry.register(agent)
+
+
+def print_prefix_report(entries: List[Dict[str, Any]]):
+    print(f"{'agent':<22} {'prefix hash':<17} {'tokens':>7} {'saved':>6} {'cached':>7}")
+    for e in entries:
+        print(f"{e['agent']:<22} {e['prefix_hash']:<17} {e['prefix_tokens']:>7} "
+              f"{e['tokens_saved_by_normalizing']:>6} {e['estimated_cached_ratio']:>7.0%}")
+
+
+if __name__ == "__main__":
+    # Importing the scripts registers their agents; the same agent should have one hash everywhere
+    import prompt_registry  # the module the scripts register with (this file runs as __main__)
+    import v2_structured_output, v3_tool_calls, v4_handoffs
+    from recommendation import build_agents
+
+    build_agents()
+    entries = prompt_registry.registry.report()
+    print_prefix_report(entries)
+    names = [e["agent"] for e in entries]
+    different = sorted({name for name in names if names.count(name) > 1})
+    print("\nSame agent, different prefix:", ", ".join(different) if different else "none")
@@ -0,0 +1,442 @@
+
+# ==============================================================================
+# Rate limiter: share one API key's quota between the app and batch jobs
+# OpenAI limits each key to so many requests (RPM) and tokens (TPM) per
+# minute. When v2/v3 batches run next to the app, they used the whole quota
+# and app users got 429 errors. Every model call now takes from two token
+# buckets first (one request, and the estimated tokens of the request), kept in
+# a small SQLite file so all processes on this machine share them:
+#   - interactive requests (the app, service.py) go first: batch work never
+#     uses the last BATCH_RESERVE_SHARE of either bucket, and holds back while
+#     an interactive request in any process is waiting,
+#   - within a priority, sessions take turns (fair queueing), so one user or
+#     one batch job with many requests can't starve the others,
+#   - after a 429 every process pauses for the server's Retry-After.
+# The priority and session of a call come from contextvars: use
+# rate_limit_scope() / limited_run(), or nothing for batch work (the default).
+#
+# Turn it on for every model from resolve_model():  RATE_LIMIT=1 RATE_LIMIT_RPM=500 python v3_tool_calls.py
+# ==============================================================================
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+import openai
+from agents import Model, ModelProvider, ModelResponse, OpenAIProvider, Runner
+from dotenv import load_dotenv
+
+from latency_stats import latency_summary
+from common import estimate_tokens
+from model_client import get_pooled_client
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+RATE_LIMIT = os.getenv('RATE_LIMIT', '').lower() in ('1', 'true', 'yes')
+RATE_LIMIT_RPM = float(os.getenv('RATE_LIMIT_RPM', '500')) # requests per minute for the key
+RATE_LIMIT_TPM = float(os.getenv('RATE_LIMIT_TPM', '200000')) # tokens per minute for the key
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', 'rate_limits.sqlite3')
+RATE_LIMIT_KEY = os.getenv('RATE_LIMIT_KEY', 'default') # processes with the same key share the buckets
+BATCH_RESERVE_SHARE = float(os.getenv('BATCH_RESERVE_SHARE', '0.2')) # kept free for interactive requests
+EXPECTED_OUTPUT_TOKENS = int(os.getenv('EXPECTED_OUTPUT_TOKENS', '400')) # when max_tokens isn't set
+MAX_POLL_SECONDS = 0.5 # other processes may free or take tokens meanwhile: look again at least this often
+URGENT_SECONDS = 1.0 # how long an interactive request waiting keeps batch work back
+
+# Priority classes, most urgent first
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = [INTERACTIVE, BATCH]
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_priority", default=BATCH)
+_session: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_session", default="default")
+
+
+@contextmanager
+def rate_limit_scope(priority: str = INTERACTIVE, session: Optional[str] = None) -> Iterator[None]:
+    """Model calls made inside (and in tasks started inside) use this priority and session."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+    priority_token = _priority.set(priority)
+    session_token = _session.set(session or "default")
+    try:
+        yield
+    finally:
+        _session.reset(session_token)
+        _priority.reset(priority_token)
+
+
+async def limited_run(
+    agent: Any,
+    input: Any,
+    priority: str = INTERACTIVE,
+    session: Optional[str] = None,
+    run: Callable[..., Awaitable[Any]] = Runner.run,
+    **run_kwargs,
+):
+    """Drop-in replacement for Runner.run(agent, input, ...) with a priority and session."""
+    with rate_limit_scope(priority, session):
+        return await run(agent, input, **run_kwargs)
+
+
+async def limited_stream(items: AsyncIterable[Any], priority: str = INTERACTIVE, session: Optional[str] = None) -> AsyncIterator[Any]:
+    """Iterate a stream (e.g. streaming.stream_run) with a priority and session."""
+    # The run (and the task Runner.run_streamed starts) begins with the first item, so
+    # the scope only needs to cover that; a generator closed later may be in another context
+    iterator = items.__aiter__()
+    with rate_limit_scope(priority, session):
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+    yield first
+    async for item in iterator:
+        yield item
+
+# --- Shared buckets ---
+
+class SharedBuckets:
+    """Request and token buckets for one key in SQLite, shared by every process using the file."""
+
+    def __init__(self, path: str = RATE_LIMIT_DB_PATH, key: str = RATE_LIMIT_KEY,
+                 rpm: float = RATE_LIMIT_RPM, tpm: float = RATE_LIMIT_TPM, reserve_share: float = BATCH_RESERVE_SHARE):
+        self.key = key
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reserve_share = reserve_share
+        self.path = path
+        self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, "
+            "blocked_until REAL NOT NULL, urgent_until REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, 0, 0)", (key, rpm, tpm, time.time())
+        )
+        _open_buckets.add(self)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        # WAL lets several processes read and write the same file safely
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _update(self, change: Callable[[Dict[str, float], float], Any]) -> Any:
+        """Refill the buckets, apply `change` to the row and save it, in one write transaction."""
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock first, so two processes can't both take the last tokens
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT requests, tokens, updated, blocked_until, urgent_until FROM buckets WHERE key = ?", (self.key,)
+                ).fetchone()
+                state = dict(zip(("requests", "tokens", "updated", "blocked_until", "urgent_until"), row))
+                now = time.time()
+                elapsed = max(0.0, now - state["updated"])
+                state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+                state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+                state["updated"] = now
+                result = change(state, now)
+                self._conn.execute(
+                    "UPDATE buckets SET requests = ?, tokens = ?, updated = ?, blocked_until = ?, urgent_until = ? WHERE key = ?",
+                    (state["requests"], state["tokens"], now, state["blocked_until"], state["urgent_until"], self.key),
+                )
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def take(self, tokens: float, priority: str) -> float:
+        """Take one request and `tokens` tokens. Returns 0 when taken, else the seconds to wait first."""
+        interactive = priority == PRIORITIES[0]
+        reserve = 0.0 if interactive else self.reserve_share
+
+        def change(state: Dict[str, float], now: float) -> float:
+            if now < state["blocked_until"]:
+                return state["blocked_until"] - now
+            if not interactive and now < state["urgent_until"]:
+                return state["urgent_until"] - now
+            # A request bigger than the bucket could never fit: let it through once the bucket is full
+            cost = min(tokens, self.tpm * (1 - reserve))
+            need_requests = 1 + reserve * self.rpm
+            need_tokens = cost + reserve * self.tpm
+            if state["requests"] >= need_requests and state["tokens"] >= need_tokens:
+                state["requests"] -= 1
+                state["tokens"] -= cost
+                return 0.0
+            wait = max((need_requests - state["requests"]) * 60 / self.rpm, (need_tokens - state["tokens"]) * 60 / self.tpm)
+            if interactive:
+                # Tell batch work in every process to hold back until we're through
+                state["urgent_until"] = max(state["urgent_until"], now + min(wait, URGENT_SECONDS) + URGENT_SECONDS)
+            return max(wait, 0.001)
+
+        return self._update(change)
+
+    def refund(self, tokens: float):
+        """Give back (or, negative, take more) tokens once a call's real usage is known."""
+        def change(state: Dict[str, float], _now: float):
+            state["tokens"] = min(self.tpm, state["tokens"] + tokens)
+        self._update(change)
+
+    def block(self, seconds: float):
+        """After a 429: nobody sends anything for `seconds`, and the buckets start empty."""
+        def change(state: Dict[str, float], now: float):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            state["requests"] = min(state["requests"], 0.0)
+            state["tokens"] = min(state["tokens"], 0.0)
+        self._update(change)
+
+    def levels(self) -> Dict[str, float]:
+        return self._update(lambda state, _now: {"requests": state["requests"], "tokens": state["tokens"]})
+
+# --- Scheduler ---
+
+# Buckets opened before a fork (service.py --preload) get their own connection in the child
+_open_buckets: "weakref.WeakSet[SharedBuckets]" = weakref.WeakSet()
+
+def _reconnect_buckets():
+    for buckets in list(_open_buckets):
+        buckets._connect()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reconnect_buckets)
+
+
+class _Waiter:
+    def __init__(self, key: tuple, tokens: float, priority: str):
+        self.key = key
+        self.tokens = tokens
+        self.priority = priority
+        self.event = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.key < other.key
+
+
+class RateLimiter:
+    """Hands out the shared buckets to this process's model calls, by priority and then fairly by session.
+
+    Fair queueing: each session's requests get increasing start tags, so a
+    session with 50 queued requests doesn't delay a new session's first one.
+    Only the first waiter in line asks the buckets (a little SQLite write);
+    the others sleep until it is their turn.
+    """
+
+    def __init__(self, buckets: Optional[SharedBuckets] = None):
+        self.buckets = buckets or SharedBuckets()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = {p: 0.0 for p in PRIORITIES} # start tag of the last request let through
+        self._session_tags: Dict[tuple, float] = {} # (priority, session) -> next start tag
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._waits: Dict[str, Deque[float]] = {p: deque(maxlen=1000) for p in PRIORITIES}
+        self._counts = {"granted": {p: 0 for p in PRIORITIES}, "rate_limited": 0, "tokens_estimated": 0, "tokens_used": 0}
+
+    def _wake_first(self):
+        if self._queue:
+            self._queue[0].event.set()
+
+    def _enqueue(self, tokens: float, priority: str, session: str) -> _Waiter:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new event loop (e.g. another asyncio.run): waiters of the old one are gone
+            self._loop, self._queue = loop, []
+        start = max(self._virtual_time[priority], self._session_tags.get((priority, session), 0.0))
+        self._session_tags[(priority, session)] = start + 1
+        waiter = _Waiter((PRIORITIES.index(priority), start, next(self._seq)), tokens, priority)
+        previous_first = self._queue[0] if self._queue else None
+        heapq.heappush(self._queue, waiter)
+        if previous_first is not None and self._queue[0] is waiter:
+            previous_first.event.set() # it is no longer first: let it notice
+        return waiter
+
+    def _let_through(self, waiter: _Waiter):
+        heapq.heappop(self._queue)
+        priority, start, _ = waiter.key
+        name = PRIORITIES[priority]
+        self._virtual_time[name] = max(self._virtual_time[name], start)
+        if len(self._session_tags) > 10_000:
+            # Forget sessions that are no longer ahead of the queue
+            self._session_tags = {k: v for k, v in self._session_tags.items() if v > self._virtual_time[k[0]]}
+        self._wake_first()
+
+    async def acquire(self, tokens: float, priority: Optional[str] = None, session: Optional[str] = None) -> float:
+        """Wait until this call may be sent. Returns the seconds waited."""
+        priority = priority or _priority.get()
+        waiter = self._enqueue(tokens, priority, session or _session.get())
+        start = time.perf_counter()
+        try:
+            while True:
+                if self._queue[0] is not waiter:
+                    waiter.event.clear()
+                    await waiter.event.wait()
+                    continue
+                # In a thread: the write may wait for another process's lock (up to the SQLite timeout)
+                wait = await asyncio.to_thread(self.buckets.take, tokens, priority)
+                if wait == 0:
+                    self._let_through(waiter)
+                    break
+                # Sleep, but wake up early if a more urgent request gets in line
+                waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), min(wait, MAX_POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._wake_first()
+            raise
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits[priority].append(waited)
+            self._counts["granted"][priority] += 1
+        return waited
+
+    async def settle(self, estimated: float, used: Optional[int]):
+        """Correct the token bucket with the real usage of a call."""
+        if used is None:
+            return
+        with self._lock:
+            self._counts["tokens_estimated"] += int(estimated)
+            self._counts["tokens_used"] += used
+        if used != estimated:
+            # In a thread, like take(): the write may wait for another process's lock
+            await asyncio.to_thread(self.buckets.refund, estimated - used)
+
+    async def rate_limited(self, error: Exception):
+        """A 429 got through anyway (another client on the key?): pause everyone."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            seconds = float(retry_after) if retry_after else 1.0
+        except ValueError:
+            seconds = 1.0
+        with self._lock:
+            self._counts["rate_limited"] += 1
+        await asyncio.to_thread(self.buckets.block, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = {p: latency_summary(list(w)) for p, w in self._waits.items()}
+            counts = {**self._counts, "granted": dict(self._counts["granted"])}
+        return {"queued": len(self._queue), "waits": waits, **counts}
+
+# --- Model ---
+
+def estimate_request_tokens(system_instructions: Optional[str], input: Any, model_settings: Any) -> float:
+    """Tokens a call will count against TPM: the prompt plus the answer we expect."""
+    text = (system_instructions or "") + (input if isinstance(input, str) else json.dumps(input, default=str))
+    return estimate_tokens(text) + (getattr(model_settings, "max_tokens", None) or EXPECTED_OUTPUT_TOKENS)
+
+
+class RateLimitedModel(Model):
+    """Waits for the rate limiter before each call to the wrapped model (or model name)."""
+
+    def __init__(self, model: Union[str, Model], limiter: "RateLimiter", model_name: Optional[str] = None):
+        self.model = model
+        self.limiter = limiter
+        self.model_name = model_name or (model if isinstance(model, str) else getattr(model, "model_name", type(model).__name__))
+
+    def _inner(self) -> Model:
+        # Model names get the pooled client: its own retries are off, they would skip the buckets
+        if isinstance(self.model, str):
+            self.model = OpenAIProvider(openai_client=get_pooled_client()).get_model(self.model)
+        return self.model
+
+    async def get_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> ModelResponse:
+        tokens = estimate_request_tokens(system_instructions, input, model_settings)
+        await self.limiter.acquire(tokens)
+        try:
+            response = await self._inner().get_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+            )
+        except openai.RateLimitError as e:
+            await self.limiter.rate_limited(e)
+            raise
+        await self.limiter.settle(tokens, response.usage.total_tokens if response.usage else None)
+        return response
+
+    async def stream_response(
+        self, system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+    ) -> AsyncIterator[Any]:
+        tokens = estimate_request_tokens(system_instructions, input, model_settings)
+        await self.limiter.acquire(tokens)
+        used = None
+        try:
+            async for event in self._inner().stream_response(
+                system_instructions, input, model_settings, tools, output_schema, handoffs, tracing, **kwargs
+            ):
+                if getattr(event, "type", None) == "response.completed" and event.response.usage is not None:
+                    used = event.response.usage.total_tokens
+                yield event
+        except openai.RateLimitError as e:
+            await self.limiter.rate_limited(e)
+            raise
+        finally:
+            # Also when the caller stops reading early
+            await self.limiter.settle(tokens, used)
+
+
+class RateLimitedModelProvider(ModelProvider):
+    """Use with RunConfig(model_provider=...) to rate limit agents whose model is a name."""
+
+    def __init__(self, provider: Optional[ModelProvider] = None, limiter: Optional[RateLimiter] = None):
+        self.provider = provider or OpenAIProvider(openai_client=get_pooled_client())
+        self.limiter = limiter or shared_limiter()
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return RateLimitedModel(self.provider.get_model(model_name), self.limiter, model_name or "")
+
+# --- Switch from the environment ---
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+def shared_limiter() -> RateLimiter:
+    """The process's rate limiter (on RATE_LIMIT_DB_PATH, shared with other processes)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
+
+
+def rate_limited_model(model: Union[str, Model]) -> Union[str, Model]:
+    """Wrap an agent's model with the shared rate limiter when RATE_LIMIT is set."""
+    if not RATE_LIMIT:
+        return model
+    return RateLimitedModel(model, shared_limiter())
+
+
+def print_rate_limit_stats(limiter: Optional[RateLimiter] = None):
+    limiter = limiter or shared_limiter()
+    s = limiter.stats()
+    print("\n" + "="*50)
+    levels = limiter.buckets.levels()
+    print(f"Rate limit ({limiter.buckets.rpm:g} RPM, {limiter.buckets.tpm:g} TPM): "
+          f"{levels['requests']:.0f} requests and {levels['tokens']:.0f} tokens left, {s['rate_limited']} x 429")
+    for priority in PRIORITIES:
+        w = s["waits"][priority]
+        print(f"  {priority:<12} {s['granted'][priority]:>6} calls | wait p50 {w['p50']*1000:>7.1f} ms  "
+              f"p95 {w['p95']*1000:>7.1f} ms  max {w['max']*1000:>7.1f} ms")
+    if s["tokens_used"]:
+        print(f"  tokens estimated {s['tokens_estimated']:,} vs used {s['tokens_used']:,}")
@@ -0,0 +1,259 @@
+
+# ==============================================================================
+# Recommendation: the app's agents and answer path, without the Streamlit UI
+# app.py draws the page; everything that decides the answer lives here, so
+# benchmarks and other front ends can run exactly what the app runs.
+# ==============================================================================
+
+import functools
+import os
+import time
+from typing import AsyncIterator, List, Optional
+
+from pydantic import BaseModel, Field
+from agents import Agent, ModelBehaviorError
+from dotenv import load_dotenv
+
+from response_cache import CachedResponse, ResponseCache, agent_fingerprint
+from sessions import Session
+from similarity_cache import SimilarityCache
+from catalog_search import search_books, search_movies
+from fast_router import FastRouter
+from model_factory import resolve_model
+from usage_tracking import BudgetController
+from prompt_registry import register_agents
+from fast_start import persisted_output
+from tool_executor import PARALLEL_TOOLS
+from cascade import CASCADE, ModelCascade, output_check
+from rate_limiter import INTERACTIVE, limited_stream, rate_limit_scope
+from streaming import StreamUpdate, stream_run
+
+# Load environment variables
+load_dotenv()
+
+model = resolve_model(os.getenv('MODEL_CHOICE', 'gpt-4.1-nano'))
+
+# --- Models for structured outputs ---
+
+class BookRecommendation(BaseModel):
+    title: str
+    author: str
+    genre: str
+    reading_time_hours: int
+    reason: str = Field(description="Why this book is recommended")
+
+class MovieRecommendation(BaseModel):
+    title: str
+    director: str
+    genre: str
+    duration_minutes: int
+    reason: str = Field(description="Why this movie is recommended")
+
+class EntertainmentPlan(BaseModel):
+    activity_type: str
+    recommendation: str
+    time_needed: str
+    why_chosen: str
+
+# Rules the answers must follow (checked by the model cascade, see cascade.py)
+@output_check(BookRecommendation)
+def check_book(book: BookRecommendation) -> List[str]:
+    return ["reading_time_hours must be positive"] if book.reading_time_hours <= 0 else []
+
+@output_check(MovieRecommendation)
+def check_movie(movie: MovieRecommendation) -> List[str]:
+    return ["duration_minutes must be positive"] if movie.duration_minutes <= 0 else []
+
+# --- Agents ---
+
+def build_agents(model=model) -> Agent:
+    """Create the entertainment agent and its two specialists."""
+
+    book_agent = Agent(
+        name="Book Specialist",
+        handoff_description="Expert who recommends books based on your preferences",
+        instructions="""
+        You are a friendly book specialist who loves helping people find their next great read!
+
+        Use the search_books tool to find books: give it the genre the user wants, and title words
+        or a reading time when they mention one. It returns the best few matches; pass next_cursor for more.
+        Pick the best option and explain why it's perfect for them.
+
+        Be enthusiastic about reading and make the person excited to start their book!
+        """,
+        model=model,
+        tools=[search_books],
+        model_settings=PARALLEL_TOOLS, # several searches can run in the same turn
+        output_type=persisted_output(BookRecommendation)
+    )
+
+    movie_agent = Agent(
+        name="Movie Specialist",
+        handoff_description="Expert who recommends movies based on your preferences",
+        instructions="""
+        You are a movie buff who loves helping people find the perfect film to watch!
+
+        Use the search_movies tool to find movies: give it the genre the user wants, and title words
+        or a running time when they mention one. It returns the best few matches; pass next_cursor for more.
+        Pick the best option and explain why they'll love it.
+
+        Be exciting about movies and make them want to grab popcorn and start watching!
+        """,
+        model=model,
+        tools=[search_movies],
+        model_settings=PARALLEL_TOOLS, # several searches can run in the same turn
+        output_type=persisted_output(MovieRecommendation)
+    )
+
+    entertainment_agent = Agent(
+        name="Entertainment Helper",
+        instructions="""
+        You are a friendly entertainment assistant who helps people decide what to do in their free time!
+
+        You can help with:
+        1. General entertainment advice
+        2. Hand off to book specialist for book recommendations
+        3. Hand off to movie specialist for movie recommendations
+
+        Be enthusiastic and helpful! When someone asks specifically about books or movies,
+        hand them off to the right specialist.
+
+        For general questions, give friendly advice about entertainment options.
+        """,
+        model=model,
+        tools=[],
+        handoffs=[book_agent, movie_agent],
+        output_type=persisted_output(EntertainmentPlan)
+    )
+
+    # Clean up the instructions and fix the tool order so every request starts with the same bytes
+    register_agents(entertainment_agent)
+    return entertainment_agent
+
+# --- Recommendation path ---
+
+class Recommender:
+    """Caches first, then the fast router, then the agents (within budget). One per process."""
+
+    def __init__(
+        self,
+        agent: Optional[Agent] = None,
+        response_cache: Optional[ResponseCache] = None,
+        similarity_cache: Optional[SimilarityCache] = None,
+        router: Optional[FastRouter] = None,
+        budget: Optional[BudgetController] = None,
+        cascade: Optional[ModelCascade] = None,
+    ):
+        # "is None" checks: an empty cache has len() == 0 and would look falsy
+        self.agent = build_agents() if agent is None else agent
+        self.response_cache = ResponseCache() if response_cache is None else response_cache
+        self.similarity_cache = similarity_cache
+        if similarity_cache is None:
+            # Same size and lifetime limits as the on-disk cache
+            self.similarity_cache = SimilarityCache(
+                threshold=float(os.getenv('SIMILARITY_CACHE_THRESHOLD', '0.75')),
+                max_entries=self.response_cache.store.max_entries,
+                ttl_seconds=self.response_cache.store.ttl_seconds,
+            )
+        self.router = FastRouter() if router is None else router
+        self.budget = BudgetController([self.agent], resolve=resolve_model) if budget is None else budget
+        # CASCADE=1: the cascade picks the model per request (the budget then only counts usage)
+        self.cascade = cascade
+        if cascade is None and CASCADE:
+            self.cascade = ModelCascade(self.agent)
+        self._run = functools.partial(self.budget.run, run=self.cascade.run) if self.cascade else self.budget.run
+
+    def cached(self, query: str) -> Optional[CachedResponse]:
+        """Look for an answer in the similarity cache, then in the on-disk cache."""
+        # Answers of an older version of the agents must not come back
+        namespace = agent_fingerprint(self.agent)
+        similar = self.similarity_cache.lookup(query, namespace)
+        if similar is not None:
+            response, _score, _matched_query = similar
+            return response.model_copy(update={"cached": True})
+        hit = self.response_cache.get(self.agent, query)
+        if hit is not None:
+            self.similarity_cache.add(query, hit, namespace)
+        return hit
+
+    def save(self, query: str, response: CachedResponse):
+        """Remember an answer in both caches."""
+        self.response_cache.put(self.agent, query, response.final_output, response.last_agent_name)
+        self.similarity_cache.add(query, response, agent_fingerprint(self.agent))
+
+    async def recommend(self, query: str, session: Optional[Session] = None, **run_kwargs) -> CachedResponse:
+        """Answer from the cache, or run the agents and cache the answer.
+
+        With a session that already has history, the earlier turns go along with
+        the question and the caches are skipped (the answer depends on them).
+        """
+        # Someone is waiting for this answer: go ahead of batch work (RATE_LIMIT=1)
+        with rate_limit_scope(INTERACTIVE, session.session_id if session is not None else None):
+            if session is not None and session.has_history:
+                result = await self.router.run(self.agent, session.input_items(query), run=self._run, **run_kwargs)
+                return CachedResponse(final_output=result.final_output, last_agent_name=result.last_agent.name)
+            cached = self.cached(query)
+            if cached is not None:
+                return cached
+            result = await self.router.run(self.agent, query, run=self._run, **run_kwargs)
+            response = CachedResponse(final_output=result.final_output, last_agent_name=result.last_agent.name)
+            self.save(query, response)
+            return response
+
+    async def recommend_stream(self, query: str, session: Optional[Session] = None, **run_kwargs) -> AsyncIterator[StreamUpdate]:
+        """Like recommend(), but yields StreamUpdates while the agents work. The last one is "final".
+
+        With CASCADE=1 the smallest model's answer is streamed and checked when it's
+        done; if it fails, the bigger models run (without streaming) and give the answer.
+        """
+        history = session is not None and session.has_history
+        session_id = session.session_id if session is not None else None
+        if not history:
+            cached = self.cached(query)
+            if cached is not None:
+                yield StreamUpdate(kind="final", agent=cached.last_agent_name, final_output=cached.final_output, cached=True)
+                return
+
+        start = time.perf_counter()
+        agent, route = self.router.pick_agent(self.agent, query)
+        route_ms = (time.perf_counter() - start) * 1000
+        yield StreamUpdate(kind="route", agent=agent.name, text=route.target)
+        run_input = session.input_items(query) if history else query
+
+        result, problem = None, None
+        # The cascade picks the model per request, otherwise the budget's current tier does
+        tier = self.cascade.start_tier() if self.cascade else 0
+        first = self.cascade.agent_for(tier, agent) if self.cascade else self.budget.agent_for(agent)
+        tool_results = {} # so an escalation doesn't run the same tool calls again
+        updates = limited_stream(stream_run(first, run_input, **run_kwargs), INTERACTIVE, session_id)
+        if self.cascade:
+            updates = self.cascade.share_tool_results(updates, tool_results)
+        try:
+            async for update in updates:
+                if update.kind == "final":
+                    result = update.result
+                else:
+                    yield update
+        except ModelBehaviorError:
+            if not self.cascade or len(self.cascade.models) == 1 or tier != 0:
+                raise
+            problem = "the answer didn't match the expected format"
+        if result is None and problem is None:
+            raise RuntimeError(f"The run of {agent.name} ended without an answer")
+
+        if self.cascade:
+            if problem is None:
+                problem = self.cascade.first_problem(result.final_output)
+            if problem is not None and len(self.cascade.models) > 1 and tier == 0:
+                yield StreamUpdate(kind="escalate", agent=agent.name, text=f"{problem}, asking {self.cascade.models[1]}")
+            with rate_limit_scope(INTERACTIVE, session_id):
+                result = await self.cascade.finish(agent, run_input, result, time.perf_counter() - start, problem,
+                                                   tier=tier, tool_results=tool_results, **run_kwargs)
+
+        # The same bookkeeping recommend() gets from router.run and budget.run
+        seconds = time.perf_counter() - start
+        self.router.log(query, route, route_ms, result.last_agent.name, seconds)
+        self.budget.record(first, result, seconds)
+        if not history:
+            self.save(query, CachedResponse(final_output=result.final_output, last_agent_name=result.last_agent.name))
+        yield StreamUpdate(kind="final", agent=result.last_agent.name, final_output=result.final_output, result=result)
@@ -0,0 +1,155 @@
+
+# ==============================================================================
+# Response Cache: remember answers so repeated questions skip the model calls
+# Stored in SQLite so the cache survives restarts. Old entries expire (TTL) and
+# the least recently used ones are removed when the cache gets too big (LRU).
+# ==============================================================================
+
+import functools
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel
+from agents import Agent, Runner
+from dotenv import load_dotenv
+
+from common import SQLiteLRUStore, iter_agents
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+DEFAULT_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'response_cache.sqlite3')
+DEFAULT_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+DEFAULT_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+
+# --- Agent graph fingerprint ---
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip(".!?")
+
+
+def output_model(output_type: Any) -> Any:
+    """The model class behind an output_type, which may also be a schema object (see fast_start.py)."""
+    return getattr(output_type, "output_type", output_type)
+
+
+@functools.lru_cache(maxsize=None)
+def _output_schema(output_type) -> Any:
+    if isinstance(output_type, type) and issubclass(output_type, BaseModel):
+        return output_type.model_json_schema()
+    return repr(output_type)
+
+
+def agent_fingerprint(agent: Agent) -> str:
+    """Hash of everything that changes the answer: instructions, model, tools, handoffs, output schema."""
+    parts = []
+    for a in iter_agents(agent):
+        parts.append({
+            "name": a.name,
+            "instructions": a.instructions if isinstance(a.instructions, str) else repr(a.instructions),
+            "model": a.model if isinstance(a.model, str) else type(a.model).__name__,
+            "tools": [
+                {"name": t.name, "description": getattr(t, "description", ""), "params": getattr(t, "params_json_schema", None)}
+                for t in a.tools
+            ],
+            "handoffs": [getattr(h, "name", None) or getattr(h, "agent_name", "") for h in a.handoffs],
+            "output_type": _output_schema(output_model(a.output_type)),
+        })
+    blob = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+# --- Typed response cache ---
+
+class CachedResponse(BaseModel):
+    final_output: Any # same typed object that Runner.run returned (BookRecommendation, ...)
+    last_agent_name: str
+    cached: bool = False
+
+
+def dump_output(output: Any) -> Dict[str, Any]:
+    """Turn a final_output into JSON-friendly data (remembering its type name)."""
+    if isinstance(output, BaseModel):
+        return {"type": type(output).__name__, "data": output.model_dump(mode="json")}
+    return {"type": None, "data": output}
+
+
+def load_output(payload: Dict[str, Any], output_types: Dict[str, Type[BaseModel]]) -> Any:
+    """Rebuild the typed final_output saved by dump_output."""
+    type_name = payload["type"]
+    if type_name is None:
+        return payload["data"]
+    return output_types[type_name].model_validate(payload["data"])
+
+
+def graph_output_types(agent: Agent) -> Dict[str, Type[BaseModel]]:
+    """Map output type names to classes for every agent in the graph."""
+    models = [output_model(a.output_type) for a in iter_agents(agent)]
+    return {m.__name__: m for m in models if isinstance(m, type) and issubclass(m, BaseModel)}
+
+
+class ResponseCache:
+    """Caches final outputs keyed on the normalized query + the agent graph fingerprint."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.store = SQLiteLRUStore(path, ttl_seconds, max_entries, table="responses")
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, agent: Agent, query: str) -> str:
+        return f"{agent_fingerprint(agent)}:{hashlib.sha256(normalize_query(query).encode()).hexdigest()}"
+
+    def get(self, agent: Agent, query: str) -> Optional[CachedResponse]:
+        raw = self.store.get(self.key(agent, query))
+        if raw is None:
+            self.misses += 1
+            return None
+        payload = json.loads(raw)
+        try:
+            output = load_output(payload["output"], graph_output_types(agent))
+        except Exception:
+            # The saved data no longer matches the models, treat it as a miss
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse(final_output=output, last_agent_name=payload["last_agent"], cached=True)
+
+    def put(self, agent: Agent, query: str, final_output: Any, last_agent_name: str):
+        payload = {"output": dump_output(final_output), "last_agent": last_agent_name}
+        self.store.set(self.key(agent, query), json.dumps(payload))
+
+    def clear(self):
+        self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.store),
+        }
+
+
+async def cached_run(
+    cache: ResponseCache,
+    agent: Agent,
+    query: str,
+    run: Callable[..., Awaitable[Any]] = Runner.run,
+    **run_kwargs,
+) -> CachedResponse:
+    """Return the cached answer if we have one, otherwise run the agent and save the answer."""
+    hit = cache.get(agent, query)
+    if hit is not None:
+        return hit
+    result = await run(agent, query, **run_kwargs)
+    cache.put(agent, query, result.final_output, result.last_agent.name)
+    return CachedResponse(final_output=result.final_output, last_agent_name=result.last_agent.name)
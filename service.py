@@ -0,0 +1,327 @@
+
+# ==============================================================================
+# Service: the entertainment agent as an HTTP API
+# The same answer path as the Streamlit app (caches, fast router, budget),
+# served by uvicorn with several worker processes. Identical questions that
+# arrive while one is already being answered wait for that answer instead of
+# starting their own run (single-flight), so a burst of 200 "Recommend a funny
+# movie" costs one agent run. /recommend/stream sends the app's progress updates
+# as they happen, one JSON object per line (no single-flight there).
+# With --preload the agents are built and warmed up once in the parent, and
+# the forked workers all use that Recommender (SQLite connections reopen in
+# each worker).
+#
+# Usage:
+#   python service.py --workers 4 --port 8000
+#   curl -X POST localhost:8000/recommend -d '{"query": "Recommend a funny movie"}'
+#   curl -N -X POST localhost:8000/recommend/stream -d '{"query": "Recommend a funny movie"}'
+#   curl localhost:8000/health
+#   curl localhost:8000/metrics
+# ==============================================================================
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from fast_start import FAST_START, prewarm
+from response_cache import dump_output, normalize_query
+from tracing_export import format_prometheus, install_tracing
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8000'))
+SERVICE_WORKERS = int(os.getenv('SERVICE_WORKERS', '1'))
+MAX_QUERY_CHARS = 2000
+MAX_BODY_BYTES = 64 * 1024
+
+# Path -> the one method it answers (others get 405)
+ROUTES = {"/recommend": "POST", "/recommend/stream": "POST", "/health": "GET", "/metrics": "GET"}
+
+# --- Single-flight ---
+
+class SingleFlight:
+    """Runs one call per key at a time; callers with the same key share its result.
+
+    Only calls that overlap are merged. Once the call finishes the key is free
+    again (repeat questions after that are the caches' job).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared): shared is True when we waited for someone else's call."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t: self._calls.pop(key, None))
+        # shield: one caller going away must not cancel the run the others wait for
+        return await asyncio.shield(task), shared
+
+# --- Service ---
+
+METRIC_HELP = {
+    "service_requests_total": "HTTP requests, by path and status code",
+    "service_recommendations_total": "Answers to /recommend, by where they came from",
+    "service_in_flight_runs": "Answers being worked on right now",
+}
+
+
+class RecommendationService:
+    """One per worker process: the Recommender, the single-flight group and request counters."""
+
+    def __init__(self, recommender=None):
+        self._recommender = recommender
+        self.flight = SingleFlight()
+        self.counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self.started_at = time.time()
+        self.prewarmed = False # set once the agents did their first-run work (here or before a fork)
+
+    @property
+    def recommender(self):
+        if self._recommender is None:
+            # Imported here so the agents are built in each worker, not in the parent process
+            from recommendation import Recommender
+            self._recommender = Recommender()
+        return self._recommender
+
+    async def recommend(self, query: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response, shared = await self.flight.do(normalize_query(query), lambda: self.recommender.recommend(query))
+        source = "coalesced" if shared else "cache" if response.cached else "agent"
+        self.counters[("service_recommendations_total", (("source", source),))] += 1
+        return {
+            "query": query,
+            "agent": response.last_agent_name,
+            "output": dump_output(response.final_output),
+            "cached": response.cached,
+            "coalesced": shared,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    async def recommend_stream(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """The Recommender's stream updates as JSON-friendly dicts; the last one has the answer."""
+        start = time.perf_counter()
+        async for update in self.recommender.recommend_stream(query):
+            line = update.model_dump(exclude={"final_output", "result", "cached"}, exclude_defaults=True)
+            if update.kind == "final":
+                source = "cache" if update.cached else "agent"
+                self.counters[("service_recommendations_total", (("source", source),))] += 1
+                line.update(output=dump_output(update.final_output), cached=update.cached,
+                            seconds=round(time.perf_counter() - start, 3))
+            yield line
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "in_flight": self.flight.in_flight,
+            "runs_started": self.flight.started,
+            "coalesced": self.flight.coalesced,
+        }
+
+    def metrics(self) -> str:
+        # Numbers are for the worker process that answers this request
+        gauges = {("service_in_flight_runs", ()): self.flight.in_flight}
+        return format_prometheus(dict(self.counters), {}, METRIC_HELP, gauges) + install_tracing().prometheus_text()
+
+# --- ASGI app ---
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send(send, status: int, payload: Any, content_type: str = "application/json",
+                headers: Optional[Dict[str, str]] = None):
+    body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+    extra = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())] + extra,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_lines(send, lines: AsyncIterator[Dict[str, Any]]):
+    """Stream newline-delimited JSON. The status is already sent, so a failure becomes an "error" line."""
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+    try:
+        async for line in lines:
+            await send({"type": "http.response.body", "body": json.dumps(line).encode("utf-8") + b"\n", "more_body": True})
+    except Exception as e:
+        error = {"kind": "error", "error": f"{type(e).__name__}: {e}"}
+        await send({"type": "http.response.body", "body": json.dumps(error).encode("utf-8") + b"\n", "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _parse_query(body: bytes) -> str:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError("Body must be JSON like {\"query\": \"...\"}")
+    query = data.get("query") if isinstance(data, dict) else None
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Missing 'query'")
+    if len(query) > MAX_QUERY_CHARS:
+        raise ValueError(f"Query longer than {MAX_QUERY_CHARS} characters")
+    return query
+
+
+def create_app(service: Optional[RecommendationService] = None):
+    """Build the ASGI app (a plain function, no web framework needed)."""
+    service = service or RecommendationService()
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    try:
+                        install_tracing()
+                        # Build the agents (and do the first-run work) before the first request
+                        if FAST_START and not service.prewarmed:
+                            await prewarm(service.recommender.agent)
+                            service.prewarmed = True
+                        else:
+                            _ = service.recommender
+                    except Exception as e:
+                        # The server reports this and exits instead of serving without agents
+                        await send({"type": "lifespan.startup.failed", "message": f"{type(e).__name__}: {e}"})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"], scope["method"]
+        if path == "/recommend" and method == "POST":
+            try:
+                query = _parse_query(await _read_body(receive))
+            except ValueError as e:
+                status, payload = 400, {"error": str(e)}
+            else:
+                try:
+                    status, payload = 200, await service.recommend(query)
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            await _send(send, status, payload)
+        elif path == "/recommend/stream" and method == "POST":
+            try:
+                query = _parse_query(await _read_body(receive))
+            except ValueError as e:
+                status = 400
+                await _send(send, status, {"error": str(e)})
+            else:
+                status = 200
+                await _send_lines(send, service.recommend_stream(query))
+        elif path == "/health" and method == "GET":
+            status = 200
+            await _send(send, status, service.health())
+        elif path == "/metrics" and method == "GET":
+            status = 200
+            await _send(send, status, service.metrics(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path in ROUTES:
+            status = 405
+            await _send(send, status, {"error": f"Use {ROUTES[path]} for {path}"}, headers={"Allow": ROUTES[path]})
+        else:
+            status, path = 404, "other" # unknown paths share one label
+            await _send(send, status, {"error": "Not found"})
+        service.counters[("service_requests_total", (("path", path), ("status", str(status))))] += 1
+
+    app.service = service
+    return app
+
+
+app = create_app()
+
+
+def serve_preforked(host: str, port: int, workers: int):
+    """Build and warm the Recommender once, then fork the workers, so each one is ready in milliseconds.
+
+    Unix only. Workers share the parent's Recommender and imported modules
+    (copy-on-write) and its listening socket.
+    """
+    import signal
+    import socket
+    import uvicorn
+    from recommendation import Recommender
+
+    service = RecommendationService(Recommender())
+    asyncio.run(prewarm(service.recommender.agent))
+    service.prewarmed = True
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: the parent's agents and caches; its own SQLite connections and event loop
+            config = uvicorn.Config(create_app(service), log_level="warning")
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the entertainment agent over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Worker processes")
+    parser.add_argument("--preload", action="store_true", help="Warm up once and fork the workers (Unix)")
+    args = parser.parse_args()
+
+    if args.preload:
+        serve_preforked(args.host, args.port, args.workers)
+        return
+
+    import uvicorn
+
+    # Each worker imports this module and gets its own agents, caches and single-flight group;
+    # the SQLite response cache is shared, so workers also reuse each other's answers
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+
+# ==============================================================================
+# Sessions: multi-turn conversations with a bounded history
+# The app used to answer every question from scratch, so "something like the
+# last one but shorter" meant nothing to the agents. A Session keeps the
+# recent turns and sends them with the next question. To keep every request
+# small (and fast, and cheap), the history has a fixed token budget: when it
+# is over, the oldest turns are folded into a short summary (one line per
+# turn, no model call) and the oldest summary lines are dropped.
+# Sessions live in an in-memory LRU in front of a SQLite table, and are
+# forgotten after SESSION_IDLE_SECONDS without a new turn.
+# ==============================================================================
+
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+from common import MemoryLRUStore, SQLiteLRUStore, estimate_tokens
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.sqlite3')
+SESSION_TOKEN_BUDGET = int(os.getenv('SESSION_TOKEN_BUDGET', '1500')) # history sent with each question
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', str(30 * 60)))
+SESSION_MEMORY_MAX = int(os.getenv('SESSION_MEMORY_MAX', '256')) # sessions kept in memory
+SESSION_MAX_STORED = int(os.getenv('SESSION_MAX_STORED', '10000')) # sessions kept in SQLite
+SUMMARY_SHARE = 0.25 # at most this part of the budget is summary
+SUMMARY_LINE_CHARS = 160
+PURGE_EVERY = 100 # saves between removals of idle sessions from SQLite
+
+# --- Models ---
+
+class Turn(BaseModel):
+    user: str
+    answer: str # short text version of the final output
+    agent: str
+
+
+class Session(BaseModel):
+    session_id: str
+    summary: List[str] = [] # one line per turn that no longer fits in full
+    turns: List[Turn] = []
+
+    @property
+    def has_history(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def input_items(self, query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The history (and the new question) as Runner input messages."""
+        items = []
+        if self.summary:
+            items.append({"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(self.summary)})
+        for turn in self.turns:
+            items.append({"role": "user", "content": turn.user})
+            items.append({"role": "assistant", "content": turn.answer})
+        if query is not None:
+            items.append({"role": "user", "content": query})
+        return items
+
+    def tokens(self) -> int:
+        """Estimated tokens of the history sent with each question."""
+        return estimate_tokens(json.dumps(self.input_items()))
+
+    def add_turn(self, query: str, final_output: Any, agent: str, budget: int = SESSION_TOKEN_BUDGET):
+        self.turns.append(Turn(user=query, answer=describe_output(final_output), agent=agent))
+        fit_budget(self, budget)
+
+# --- Trimming ---
+
+def describe_output(output: Any) -> str:
+    """A final output as compact text, its first fields (title, author, ...) first."""
+    if isinstance(output, BaseModel):
+        return "; ".join(f"{name}: {value}" for name, value in output.model_dump(mode="json").items())
+    return str(output)
+
+
+def summarize_turn(turn: Turn) -> str:
+    """One line for an old turn: the question and the start of the answer."""
+    line = f"- User asked: {turn.user.strip()} -> {turn.agent}: {turn.answer}"
+    return line if len(line) <= SUMMARY_LINE_CHARS else line[:SUMMARY_LINE_CHARS - 3] + "..."
+
+
+def fit_budget(session: Session, budget: int = SESSION_TOKEN_BUDGET):
+    """Fold the oldest turns into the summary until the history fits the token budget.
+
+    The last turn is always kept in full unless it alone is over budget, in
+    which case its texts are cut.
+    """
+    summary_budget = int(budget * SUMMARY_SHARE)
+    while session.tokens() > budget and len(session.turns) > 1:
+        session.summary.append(summarize_turn(session.turns.pop(0)))
+        while session.summary and estimate_tokens("\n".join(session.summary)) > summary_budget:
+            session.summary.pop(0)
+    if session.tokens() > budget and session.turns:
+        session.summary.clear()
+        last = session.turns[-1]
+        half = max(1, budget * 2 - 50) # ~4 characters per token: half the budget each for question and answer
+        session.turns[-1] = Turn(user=last.user[:half], answer=last.answer[:half], agent=last.agent)
+
+# --- Store ---
+
+class SessionStore:
+    """Sessions by id: an in-memory LRU in front of SQLite, both forgetting idle sessions."""
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        memory_max: int = SESSION_MEMORY_MAX,
+        max_stored: int = SESSION_MAX_STORED,
+        token_budget: int = SESSION_TOKEN_BUDGET,
+    ):
+        self.token_budget = token_budget
+        self.memory = MemoryLRUStore(idle_seconds, memory_max)
+        self.disk = SQLiteLRUStore(path, idle_seconds, max_stored, table="sessions")
+        self._saves = 0
+        self._lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "new": 0}
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> Session:
+        """The session with this id, or a new empty one (unknown or idle for too long)."""
+        raw = self.memory.get(session_id)
+        source = "memory"
+        if raw is None:
+            raw = self.disk.get(session_id)
+            source = "disk"
+            if raw is not None:
+                self.memory.set(session_id, raw)
+        with self._lock:
+            self.hits[source if raw is not None else "new"] += 1
+        if raw is None:
+            return Session(session_id=session_id)
+        return Session.model_validate_json(raw)
+
+    def save(self, session: Session):
+        """Write a session through to SQLite; the idle timer starts again."""
+        raw = session.model_dump_json()
+        self.memory.set(session.session_id, raw)
+        self.disk.set(session.session_id, raw)
+        with self._lock:
+            self._saves += 1
+            purge = self._saves % PURGE_EVERY == 0
+        if purge:
+            self.memory.purge_expired()
+            self.disk.purge_expired()
+
+    def add_turn(self, session: Session, query: str, final_output: Any, agent: str):
+        """Append a turn, trim the history to the token budget and save."""
+        session.add_turn(query, final_output, agent, self.token_budget)
+        self.save(session)
+
+    def delete(self, session_id: str):
+        self.memory.delete(session_id)
+        self.disk.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_memory": len(self.memory), "stored": len(self.disk), **{f"{k}_loads": v for k, v in self.hits.items()}}
@@ -0,0 +1,321 @@
+
+# ==============================================================================
+# Similarity Cache: reuse answers for questions that *mean* the same thing
+# "funny film for tonight" and "recommend me a comedy movie" are different
+# strings, so an exact cache misses them. Here each query becomes a vector
+# (offline, no API calls) and we look for the closest cached query.
+# Like the response cache, entries expire (TTL), the least recently used ones
+# are dropped when the cache is full, and answers are kept apart per agent
+# graph (namespace). Close vectors aren't always the same question ("a mystery
+# book" vs "not a mystery book"), so a match must also agree on negation, on
+# the key terms (book/movie, genre) and on names ("... by Agatha Christie")
+# before it is used.
+# ==============================================================================
+
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# --- Settings ---
+DEFAULT_MAX_ENTRIES = int(os.getenv('SIMILARITY_CACHE_MAX_ENTRIES', '10000'))
+DEFAULT_TTL_SECONDS = float(os.getenv('SIMILARITY_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+
+# Words that don't change what the user wants
+STOPWORDS = {
+    "a", "an", "the", "me", "i", "i'm", "my", "to", "for", "of", "and", "or", "some", "something",
+    "please", "can", "you", "could", "would", "want", "need", "like", "recommend", "suggest",
+    "give", "find", "show", "get", "what", "should", "good", "great", "nice", "one", "is", "it",
+}
+
+# Words that mean the same thing are mapped to one word before vectorizing
+SYNONYMS = {
+    "film": "movie", "films": "movie", "movies": "movie", "flick": "movie", "cinema": "movie",
+    "watch": "movie", "funny": "comedy", "hilarious": "comedy", "comedic": "comedy", "laugh": "comedy",
+    "novel": "book", "novels": "book", "books": "book", "read": "book", "reading": "book",
+    "scary": "horror", "spooky": "horror", "detective": "mystery", "whodunit": "mystery",
+    "romantic": "romance", "love": "romance", "magic": "fantasy", "magical": "fantasy",
+    "exciting": "action", "thriller": "action",
+}
+
+# Words that turn a request around ("not a mystery book")
+NEGATIONS = {"not", "no", "never", "without", "except", "nothing", "avoid", "hate", "dont", "don't", "instead"}
+
+# Capitalized words (names, titles) and "by ..." / "starring ..." phrases pin a request to one author or actor
+NAME = re.compile(r"\b[A-Z][A-Za-z'-]+(?:\s+[A-Z][A-Za-z'-]+)*")
+CONSTRAINT = re.compile(r"\b(?:by|starring|directed by|written by)\s+([^,.!?;]+)")
+
+# Words that must match exactly: what kind of thing and which genre
+KEY_TERMS = set(SYNONYMS.values()) | {
+    "book", "movie", "show", "series", "recipe", "trip", "comedy", "horror", "mystery", "romance", "fantasy",
+    "action", "drama", "documentary", "scifi", "sci-fi", "science", "fiction", "nonfiction", "biography",
+    "history", "animated", "animation", "kids", "family", "war", "western", "crime", "adventure", "musical",
+}
+
+# --- Local vectorizer ---
+
+class HashingVectorizer:
+    """Turns text into a fixed-size vector using hashed words and character n-grams."""
+
+    def __init__(self, dims: int = 256, ngram_range: Tuple[int, int] = (3, 5), word_weight: float = 2.0):
+        self.dims = dims
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    def tokens(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9']+", text.lower())
+        return [SYNONYMS.get(w, w) for w in words if w not in STOPWORDS]
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        words = self.tokens(text)
+        features = [(f"w:{w}", self.word_weight) for w in words]
+        joined = f" {' '.join(words)} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.extend((joined[i:i + n], 1.0) for i in range(len(joined) - n + 1))
+        for feature, weight in features:
+            h = zlib.crc32(feature.encode())
+            # The top bit picks the sign so hash collisions cancel out instead of piling up
+            vector[h % self.dims] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+# --- Nearest-neighbour cache ---
+
+class SimilarityCache:
+    """Stores query vectors in one contiguous float32 matrix with an inverted-file (IVF) index.
+
+    Below `index_threshold` entries every lookup is a brute-force dot product.
+    Above it, vectors are grouped around k-means centroids and a lookup only
+    scores the `nprobe` closest groups.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.75,
+        dims: int = 256,
+        nprobe: int = 8,
+        index_threshold: int = 4096,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.threshold = threshold
+        self.nprobe = nprobe
+        self.index_threshold = index_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.vectorizer = HashingVectorizer(dims=dims)
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((1024, dims), dtype=np.float32)
+        self._added = np.zeros(1024, dtype=np.float64) # for the TTL
+        self._used = np.zeros(1024, dtype=np.float64) # last add or hit, for LRU eviction
+        self._spaces = np.zeros(1024, dtype=np.int32) # namespace id of each row
+        self._space_ids: Dict[str, int] = {}
+        self._size = 0
+        self._queries: List[str] = []
+        self._values: List[Any] = []
+        # IVF index (None until there are enough entries)
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._indexed_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0 # close enough, but negation, key terms or names differ
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- Adding entries ---
+
+    def add(self, query: str, value: Any, namespace: str = ""):
+        self.add_vectors(self.vectorizer.transform(query)[None, :], [query], [value], namespace)
+
+    def add_many(self, queries: List[str], values: List[Any], namespace: str = ""):
+        vectors = np.stack([self.vectorizer.transform(q) for q in queries])
+        self.add_vectors(vectors, queries, values, namespace)
+
+    def add_vectors(self, vectors: np.ndarray, queries: List[str], values: List[Any], namespace: str = ""):
+        """Add already-vectorized entries (rows must be L2-normalized)."""
+        now = time.time()
+        with self._lock:
+            start, count = self._size, len(vectors)
+            self._grow(start + count)
+            self._matrix[start:start + count] = vectors
+            self._added[start:start + count] = now
+            self._used[start:start + count] = now
+            self._spaces[start:start + count] = self._space_ids.setdefault(namespace, len(self._space_ids))
+            self._size += count
+            self._queries.extend(queries)
+            self._values.extend(values)
+            if self._size > self.max_entries:
+                self._evict(now)
+                return
+            if self._centroids is not None:
+                self._assign(start, self._size)
+            if self._size >= self.index_threshold and self._size >= 8 * max(self._indexed_size, 1):
+                self._build_index()
+
+    def _grow(self, needed: int):
+        if needed > len(self._matrix):
+            capacity = max(needed, 2 * len(self._matrix))
+            bigger = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+            bigger[:self._size] = self._matrix[:self._size]
+            self._matrix = bigger
+            for name in ("_added", "_used", "_spaces"):
+                old = getattr(self, name)
+                grown = np.zeros(capacity, dtype=old.dtype)
+                grown[:self._size] = old[:self._size]
+                setattr(self, name, grown)
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used ones, and rebuild the index."""
+        n = self._size
+        alive = np.flatnonzero(self._added[:n] > now - self.ttl_seconds)
+        # Remove a few extra entries so we don't evict on every single insert
+        target = max(1, self.max_entries - max(1, self.max_entries // 10))
+        if len(alive) > target:
+            newest = np.argpartition(-self._used[alive], target - 1)[:target]
+            alive = alive[newest]
+        keep = np.sort(alive)
+        self.evicted += n - len(keep)
+        self._matrix[:len(keep)] = self._matrix[keep]
+        for array in (self._added, self._used, self._spaces):
+            array[:len(keep)] = array[keep]
+        self._queries = [self._queries[i] for i in keep]
+        self._values = [self._values[i] for i in keep]
+        self._size = len(keep)
+        self._centroids, self._lists, self._indexed_size = None, [], 0
+        if self._size >= self.index_threshold:
+            self._build_index()
+
+    # --- IVF index ---
+
+    def build_index(self):
+        """Train the centroids now (normally this happens automatically as the cache grows)."""
+        with self._lock:
+            self._build_index()
+
+    def _build_index(self, iterations: int = 8):
+        n = self._size
+        nlist = int(min(2048, max(16, 2 * np.sqrt(n))))
+        rng = np.random.default_rng(0)
+        sample = self._matrix[rng.choice(n, size=min(n, 16 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        # Spherical k-means on a sample: assign to the closest centroid, then re-average
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            groups, starts = np.unique(labels[order], return_index=True)
+            sums = centroids.copy()
+            sums[groups] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        self._centroids = centroids
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._assign(0, n)
+        self._indexed_size = n
+
+    def _assign(self, start: int, end: int, chunk: int = 65536):
+        buckets: List[List[np.ndarray]] = [[] for _ in range(len(self._centroids))]
+        for lo in range(start, end, chunk):
+            hi = min(end, lo + chunk)
+            labels = np.argmax(self._matrix[lo:hi] @ self._centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            ids = np.arange(lo, hi)[order]
+            groups, cuts = np.unique(labels[order], return_index=True)
+            for group, part in zip(groups, np.split(ids, cuts[1:])):
+                buckets[group].append(part)
+        for group, parts in enumerate(buckets):
+            if parts:
+                self._lists[group] = np.concatenate([self._lists[group], *parts])
+
+    # --- Lookups ---
+
+    def nearest(self, query: str, namespace: str = "") -> Optional[Tuple[int, float]]:
+        """Return (row, cosine similarity) of the closest live cached query in this namespace.
+
+        The row is only valid until the next add (an eviction moves rows); lookup() keeps the lock.
+        """
+        vector = self.vectorizer.transform(query)
+        with self._lock:
+            return self._nearest(vector, namespace)
+
+    def _nearest(self, vector: np.ndarray, namespace: str) -> Optional[Tuple[int, float]]:
+        if self._size == 0 or namespace not in self._space_ids:
+            return None
+        space = self._space_ids[namespace]
+        oldest = time.time() - self.ttl_seconds
+        if self._centroids is None:
+            candidates = np.arange(self._size)
+        else:
+            probe = np.argpartition(-(self._centroids @ vector), min(self.nprobe, len(self._centroids) - 1))
+            candidates = np.concatenate([self._lists[g] for g in probe[:self.nprobe]])
+        if len(candidates) == 0:
+            return None
+        scores = self._matrix[candidates] @ vector
+        # Other agent graphs and expired entries never match
+        scores[(self._spaces[candidates] != space) | (self._added[candidates] <= oldest)] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] == -np.inf:
+            return None
+        return int(candidates[best]), float(scores[best])
+
+    def constraints(self, query: str) -> Set[str]:
+        """Names and "by ..." / "starring ..." words: things only this exact question asks for."""
+        names = set()
+        for m in NAME.finditer(query):
+            words = m.group(0).lower().split()
+            # One capital at the start of a sentence is just grammar; "Agatha Christie ..." is still a name
+            if len(words) == 1 and re.search(r"(^|[.!?]\s*)$", query[:m.start()]):
+                continue
+            names.update(w for w in words if w not in STOPWORDS)
+        for phrase in CONSTRAINT.findall(query.lower()):
+            names.update(w for w in re.findall(r"[a-z0-9']+", phrase) if w not in STOPWORDS)
+        return {SYNONYMS.get(w, w) for w in names} - KEY_TERMS
+
+    def same_request(self, query: str, cached_query: str) -> bool:
+        """Both negated or neither, the same key terms (kind of thing, genre) and the same names."""
+        a, b = self.vectorizer.tokens(query), self.vectorizer.tokens(cached_query)
+        negated = lambda words: any(w in NEGATIONS or w.endswith("n't") for w in words)
+        return (
+            negated(a) == negated(b)
+            and {w for w in a if w in KEY_TERMS} == {w for w in b if w in KEY_TERMS}
+            and self.constraints(query) == self.constraints(cached_query)
+        )
+
+    def lookup(self, query: str, namespace: str = "") -> Optional[Tuple[Any, float, str]]:
+        """Return (value, similarity, matched query) if a cached query is similar enough."""
+        vector = self.vectorizer.transform(query)
+        # One lock from the search to reading the value: an eviction in between would move the rows
+        with self._lock:
+            match = self._nearest(vector, namespace)
+            if match is None or match[1] < self.threshold:
+                self.misses += 1
+                return None
+            row, score = match
+            cached_query = self._queries[row]
+            if not self.same_request(query, cached_query):
+                self.rejected += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[row] = time.time()
+            return self._values[row], score, cached_query
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._size,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "indexed": self._centroids is not None,
+            "memory_mb": self._matrix.nbytes / 1e6,
+        }
@@ -0,0 +1,71 @@
+
+# ==============================================================================
+# Streaming: show what the agents are doing while they work
+# Runner.run_streamed() gives us events as they happen: which agent is
+# running, handoffs, tool calls, and the answer's JSON token by token.
+# Here those events become simple updates a UI can draw right away.
+# ==============================================================================
+
+from typing import Any, AsyncIterator, Dict, Optional
+
+import pydantic_core
+from pydantic import BaseModel
+from agents import Agent, Runner
+
+from fast_parsing import IncrementalJSONParser
+
+# --- Models for stream updates ---
+
+class StreamUpdate(BaseModel):
+    kind: str # "route", "agent", "handoff", "tool_call", "tool_output", "partial", "escalate" or "final"
+    agent: str # name of the agent that is running
+    tool_name: Optional[str] = None
+    text: Optional[str] = None # tool arguments / output preview
+    fields: Dict[str, Any] = {} # partially parsed answer (for "partial")
+    final_output: Any = None # the typed answer (for "final")
+    result: Any = None # the finished run, with token usage in raw_responses (for "final")
+    cached: bool = False # the "final" answer came from a cache (no run, result is None)
+
+# --- Partial JSON ---
+
+def parse_partial_json(text: str) -> Dict[str, Any]:
+    """Parse the JSON received so far, keeping half-finished strings ('The Hob' -> "The Hob").
+
+    Re-parses the whole text; stream_run uses IncrementalJSONParser, which gives the same result.
+    """
+    try:
+        parsed = pydantic_core.from_json(text, allow_partial="trailing-strings")
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+# --- Streaming run ---
+
+async def stream_run(agent: Agent, query: str, **run_kwargs) -> AsyncIterator[StreamUpdate]:
+    """Run the agent in streaming mode and yield UI-friendly updates."""
+    result = Runner.run_streamed(agent, query, **run_kwargs)
+    current = agent.name
+    parser = IncrementalJSONParser()
+    async for event in result.stream_events():
+        if event.type == "agent_updated_stream_event":
+            current = event.new_agent.name
+            parser = IncrementalJSONParser()
+            yield StreamUpdate(kind="agent", agent=current)
+        elif event.type == "run_item_stream_event":
+            item = event.item
+            if event.name == "handoff_occured":
+                yield StreamUpdate(kind="handoff", agent=current, text=item.target_agent.name)
+            elif event.name == "tool_called":
+                raw = item.raw_item
+                yield StreamUpdate(
+                    kind="tool_call", agent=current,
+                    tool_name=getattr(raw, "name", None), text=getattr(raw, "arguments", None),
+                )
+            elif event.name == "tool_output":
+                yield StreamUpdate(kind="tool_output", agent=current, text=str(item.output)[:200])
+        elif event.type == "raw_response_event" and event.data.type == "response.output_text.delta":
+            # Only the new piece is scanned; finished fields aren't parsed again
+            fields = parser.feed(event.data.delta)
+            if fields:
+                yield StreamUpdate(kind="partial", agent=current, fields=fields)
+    yield StreamUpdate(kind="final", agent=result.last_agent.name, final_output=result.final_output, result=result)
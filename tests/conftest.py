@@ -0,0 +1,21 @@
+# ==============================================================================
+# Shared test setup: run from the repo root with  python -m pytest
+# Everything runs offline: no API key, no trace upload, no files outside tmp_path.
+# ==============================================================================
+
+import os
+import sys
+
+# The modules live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time, so set them before any test imports a module
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["TRACE_EXPORT_PATH"] = ""
+os.environ.pop("CASSETTE_MODE", None)
+for name in ("MOCK_MODEL", "RATE_LIMIT", "HEDGE_REQUESTS", "CASCADE"):
+    os.environ[name] = ""
+
+from agents import set_tracing_disabled
+
+set_tracing_disabled(True)
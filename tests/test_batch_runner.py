@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from agents import Agent
+
+from batch_runner import run_batch, stream_batch
+from mock_model import LatencyProfile, MockModel
+
+
+def make_run(delays, fail=()):
+    """A run function that takes delays[query] seconds and tracks how many run at once."""
+    state = {"running": 0, "peak": 0}
+
+    async def run(agent, query, **kwargs):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            await asyncio.sleep(delays[query])
+            if query in fail:
+                raise RuntimeError(f"{query} failed")
+            return type("Result", (), {"final_output": query.upper(), "last_agent": agent})()
+        finally:
+            state["running"] -= 1
+
+    return run, state
+
+
+def test_results_come_back_in_input_order():
+    agent = Agent(name="Helper")
+    delays = {"slow": 0.05, "medium": 0.02, "quick": 0.0}
+    run, state = make_run(delays)
+    results = asyncio.run(run_batch(agent, list(delays), concurrency=3, run=run))
+    assert [r.query for r in results] == ["slow", "medium", "quick"]
+    assert [r.output for r in results] == ["SLOW", "MEDIUM", "QUICK"]
+    assert [r.index for r in results] == [0, 1, 2]
+    assert state["peak"] == 3
+
+
+def test_concurrency_limit_is_kept():
+    queries = [f"q{i}" for i in range(10)]
+    run, state = make_run({q: 0.01 for q in queries})
+    asyncio.run(run_batch(Agent(name="Helper"), queries, concurrency=2, run=run))
+    assert state["peak"] == 2
+
+
+def test_one_failure_does_not_stop_the_batch():
+    run, _state = make_run({"a": 0, "b": 0, "c": 0}, fail={"b"})
+    results = asyncio.run(run_batch(Agent(name="Helper"), ["a", "b", "c"], run=run))
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].error == "RuntimeError: b failed"
+
+
+def test_concurrency_must_be_positive():
+    with pytest.raises(ValueError):
+        asyncio.run(run_batch(Agent(name="Helper"), ["a"], concurrency=0))
+
+
+def test_stream_batch_yields_every_query():
+    agent = Agent(name="Helper", model=MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0)))
+
+    async def collect():
+        return [r async for r in stream_batch(agent, enumerate(["hi", "hello", "hey"]), concurrency=2)]
+
+    results = asyncio.run(collect())
+    assert sorted(r.index for r in results) == [0, 1, 2]
+    assert all(r.ok for r in results)
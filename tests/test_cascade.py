@@ -0,0 +1,102 @@
+import asyncio
+from typing import List
+
+from pydantic import BaseModel
+from agents import Agent, function_tool
+
+from cascade import ModelCascade, check_output, output_check, placeholder_problems
+from mock_model import LatencyProfile, MockModel
+
+
+class Pick(BaseModel):
+    title: str
+    minutes: int
+    tags: List[str]
+
+
+@output_check(Pick)
+def check_pick(pick: Pick) -> List[str]:
+    return ["minutes must be positive"] if pick.minutes <= 0 else []
+
+
+GOOD = {"title": "Dune", "minutes": 155, "tags": ["sci-fi"]}
+
+lookups = []
+
+@function_tool
+def lookup(topic: str) -> str:
+    """Look up a topic."""
+    lookups.append(topic)
+    return f"{topic}: found it"
+
+
+def test_checks_find_rule_and_placeholder_problems():
+    assert check_output(Pick(**GOOD)) == []
+    assert check_output(Pick(**{**GOOD, "minutes": 0})) == ["minutes must be positive"]
+    assert placeholder_problems(Pick(**{**GOOD, "title": " N/A "})) == ["title is empty or a placeholder (' N/A ')"]
+    assert placeholder_problems(Pick(**{**GOOD, "tags": []})) == ["tags is empty"]
+    assert check_output("") == ["empty answer"]
+
+
+def make_cascade(answers, **kwargs) -> ModelCascade:
+    """A cascade over mock models; answers[name] is what the model of that name answers."""
+    agent = Agent(name="Picker", instructions="Use lookup, then pick.", tools=[lookup], output_type=Pick)
+
+    def resolve(name: str) -> MockModel:
+        return MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), script={"Pick": answers[name]},
+                         model_name=name)
+
+    return ModelCascade(agent, models=list(answers), resolve=resolve, baseline_sample_rate=0, **kwargs)
+
+
+def test_good_answer_from_the_small_model_is_kept():
+    cascade = make_cascade({"small": GOOD, "big": GOOD})
+    result = asyncio.run(cascade.run(cascade.graphs[0], "a film about deserts"))
+    assert result.final_output == Pick(**GOOD)
+    stats = cascade.stats.summary()["Picker"]
+    assert stats["escalation_rate"] == 0 and stats["accepted"] == {"small": 1}
+
+
+def test_bad_answer_escalates_and_reuses_tool_results():
+    lookups.clear()
+    cascade = make_cascade({"small": {**GOOD, "minutes": -1}, "medium": {**GOOD, "title": "unknown"}, "big": GOOD})
+    result = asyncio.run(cascade.run(cascade.graphs[0], "a film about deserts"))
+    assert result.final_output == Pick(**GOOD)
+    stats = cascade.stats.summary()["Picker"]
+    assert stats["accepted"] == {"big": 1}
+    assert stats["reasons"] == {"minutes must be positive": 1, "title is empty or a placeholder": 1}
+    # Every model asked for the same lookup; it ran once
+    assert lookups == ["film"]
+
+
+def test_biggest_model_answer_is_returned_when_every_model_fails():
+    cascade = make_cascade({"small": {**GOOD, "minutes": 0}, "big": {**GOOD, "minutes": 0}})
+    result = asyncio.run(cascade.run(cascade.graphs[0], "a film about deserts"))
+    assert result.final_output.minutes == 0
+    assert cascade.stats.summary()["Picker"]["accepted"] == {"none": 1}
+
+
+def test_baseline_samples_measure_the_biggest_model():
+    cascade = make_cascade({"small": GOOD, "big": GOOD})
+    cascade.baseline_sample_rate = 1
+    asyncio.run(cascade.run(cascade.graphs[0], "a film about deserts"))
+    assert cascade.stats.summary()["Picker"]["baseline_runs"] == 1
+    cascade.baseline_sample_rate = 0
+    asyncio.run(cascade.run(cascade.graphs[0], "a film about deserts"))
+    stats = cascade.stats.summary()["Picker"]
+    assert stats["runs"] == 1 and stats["saved_seconds"] is not None
+
+
+def test_travel_and_recipe_rules_are_registered():
+    from v2_structured_output import TravelPlan
+    from v3_tool_calls import RecipeRecommendation
+
+    plan = {"destination": "Rome", "duration_days": 3, "budget": 900, "activities": ["Colosseum"], "notes": "Book early"}
+    assert check_output(TravelPlan(**plan)) == []
+    assert check_output(TravelPlan(**{**plan, "budget": 0})) == ["budget must be positive"]
+    recipe = {"recipe_name": "Soup", "ingredients": ["leek"], "cooking_time_minutes": 30, "difficulty_level": "Easy",
+              "instructions": "Simmer."}
+    assert check_output(RecipeRecommendation(**recipe)) == []
+    assert check_output(RecipeRecommendation(**{**recipe, "difficulty_level": "Tricky"})) == [
+        "difficulty_level must be Easy, Medium or Hard"
+    ]
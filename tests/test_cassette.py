@@ -0,0 +1,81 @@
+import asyncio
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+from agents import Agent, Runner, function_tool
+
+from cassette import Cassette, CassetteMiss, RecordingModel, ReplayModel
+from mock_model import LatencyProfile, MockModel
+
+
+class Answer(BaseModel):
+    title: str
+    tags: List[str]
+
+
+@function_tool
+def lookup(topic: str) -> str:
+    """Look up a topic."""
+    return f"{topic}: found it"
+
+
+def agent_on(model) -> Agent:
+    return Agent(name="Helper", instructions="Use lookup, then answer.", model=model, tools=[lookup], output_type=Answer)
+
+
+QUESTIONS = ["Tell me about lighthouses", "Tell me about volcanoes"]
+
+
+async def run_all(agent: Agent) -> List[Answer]:
+    return [(await Runner.run(agent, q)).final_output for q in QUESTIONS]
+
+
+@pytest.mark.parametrize("name", ["runs.jsonl", "runs.jsonl.gz"])
+def test_replay_gives_back_the_recorded_answers(tmp_path, name):
+    path = str(tmp_path / name)
+    mock = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), seed=1, model_name="mock")
+    recording = Cassette(path)
+    recorded = asyncio.run(run_all(agent_on(RecordingModel(mock, recording, "mock"))))
+    # Two questions, two model calls each (the tool call, then the answer)
+    assert mock.calls == 4
+    recording.close()
+
+    cassette = Cassette(path) # loaded from the file, like a later process would
+    assert len(cassette) == 4
+    replayed = asyncio.run(run_all(agent_on(ReplayModel(cassette, "mock"))))
+    assert replayed == recorded
+
+
+def test_replay_streams_the_recorded_answer(tmp_path):
+    path = str(tmp_path / "runs.jsonl")
+    mock = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), seed=1, model_name="mock")
+    recording = Cassette(path)
+    recorded = asyncio.run(Runner.run(agent_on(RecordingModel(mock, recording, "mock")), QUESTIONS[0]))
+    recording.close()
+
+    async def stream():
+        result = Runner.run_streamed(agent_on(ReplayModel(Cassette(path), "mock")), QUESTIONS[0])
+        async for _event in result.stream_events():
+            pass
+        return result.final_output
+
+    assert asyncio.run(stream()) == recorded.final_output
+
+
+def test_recording_twice_appends_one_gzip_member_per_open(tmp_path):
+    path = str(tmp_path / "runs.jsonl.gz")
+    mock = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), seed=1, model_name="mock")
+    for _ in range(2):
+        recording = Cassette(path)
+        asyncio.run(run_all(agent_on(RecordingModel(mock, recording, "mock"))))
+        recording.close()
+    with open(path, "rb") as f:
+        assert f.read().count(b"\x1f\x8b\x08") == 2 # gzip member headers
+    assert len(Cassette(path)) == 8
+
+
+def test_unrecorded_request_is_a_miss(tmp_path):
+    replay = agent_on(ReplayModel(Cassette(str(tmp_path / "empty.jsonl")), "mock"))
+    with pytest.raises(CassetteMiss):
+        asyncio.run(Runner.run(replay, "Something nobody asked"))
@@ -0,0 +1,43 @@
+import pytest
+
+from catalog import Catalog, MmapCatalog, SQLiteCatalog, build_mmap_catalog, build_sqlite_catalog
+from catalog_search import expand_words, search_catalog
+
+BOOKS = [
+    {"genre": "fantasy", "title": f"Dragon Tale {i}", "author": f"Author {i}", "hours": i % 20 + 1, "rating": round(5 - i / 100, 2)}
+    for i in range(200)
+] + [
+    {"genre": "fantasy", "title": "The Hobbit", "author": "J.R.R. Tolkien", "hours": 11, "rating": 4.3},
+    {"genre": "mystery", "title": "Gone Girl", "author": "Gillian Flynn", "hours": 12, "rating": 4.1},
+]
+
+
+@pytest.fixture(params=["memory", "sqlite", "mmap"])
+def catalog(request, tmp_path):
+    if request.param == "memory":
+        return Catalog(BOOKS, "author")
+    if request.param == "sqlite":
+        build_sqlite_catalog(BOOKS, str(tmp_path / "books.sqlite3"), "author")
+        return SQLiteCatalog(str(tmp_path / "books.sqlite3"), "author")
+    build_mmap_catalog(BOOKS, str(tmp_path / "books.catalog"), "author")
+    return MmapCatalog(str(tmp_path / "books.catalog"), "author")
+
+
+def test_genre_length_filter_pages_in_rank_order(catalog):
+    expected = [r for r in sorted(BOOKS, key=lambda r: (-r["rating"], r["title"])) if r["genre"] == "fantasy" and 5 <= r["hours"] <= 6]
+    first = search_catalog(catalog, "hours", genre="Fantasy", min_length=5, max_length=6, limit=3)
+    assert first["total"] == len(expected)
+    assert [r["title"] for r in first["results"]] == [r["title"] for r in expected[:3]]
+    second = search_catalog(catalog, "hours", genre="fantasy", min_length=5, max_length=6, limit=3, cursor=first["next_cursor"])
+    assert [r["title"] for r in second["results"]] == [r["title"] for r in expected[3:6]]
+
+
+def test_genre_length_filter_never_reads_the_whole_genre(catalog, monkeypatch):
+    monkeypatch.setattr(catalog, "by_genre", lambda genre: pytest.fail("whole genre loaded"))
+    assert search_catalog(catalog, "hours", genre="fantasy", max_length=1)["total"] == 10
+
+
+def test_misspelled_title_word(catalog):
+    assert "hobbit" in expand_words(catalog, ["hobit"])
+    result = search_catalog(catalog, "hours", query="hobit", max_length=11)
+    assert result["results"][0]["title"] == "The Hobbit"
@@ -0,0 +1,63 @@
+import json
+from typing import List
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from fast_parsing import IncrementalJSONParser, validate_json
+
+
+class Plan(BaseModel):
+    destination: str
+    duration_days: int
+    activities: List[str]
+    notes: str
+
+
+PLAN = {
+    "destination": "Lisbon, \"the\" city",
+    "duration_days": 5,
+    "activities": ["Tram 28", "Pastéis {de} nata", "Sintra, day trip"],
+    "notes": "Bring comfy shoes \\ sunscreen",
+}
+
+
+def feed_in_pieces(text: str, size: int):
+    parser = IncrementalJSONParser()
+    seen = []
+    for i in range(0, len(text), size):
+        fields = parser.feed(text[i:i + size])
+        # Lists still being written are shared between calls, keep a copy
+        seen.append({k: list(v) if isinstance(v, list) else v for k, v in fields.items()})
+    return seen
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_incremental_parser_ends_with_the_whole_object(size):
+    text = json.dumps(PLAN)
+    assert feed_in_pieces(text, size)[-1] == PLAN
+
+
+def test_incremental_parser_shows_finished_fields_and_list_items_early():
+    text = json.dumps(PLAN)
+    cut = text.index("Sintra")
+    fields = IncrementalJSONParser().feed(text[:cut])
+    assert fields["destination"] == PLAN["destination"]
+    assert fields["duration_days"] == 5
+    assert fields["activities"][:2] == PLAN["activities"][:2]
+    assert "notes" not in fields
+
+
+def test_incremental_parser_never_loses_a_field():
+    text = json.dumps(PLAN, indent=2)
+    previous = {}
+    for fields in feed_in_pieces(text, 2):
+        assert set(previous) <= set(fields)
+        previous = fields
+
+
+def test_validate_json_accepts_str_and_bytes():
+    text = json.dumps(PLAN)
+    assert validate_json(Plan, text) == validate_json(Plan, text.encode()) == Plan(**PLAN)
+    with pytest.raises(ValidationError):
+        validate_json(Plan, '{"destination": "Lisbon"}')
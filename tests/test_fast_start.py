@@ -0,0 +1,31 @@
+import asyncio
+import json
+import os
+
+from agents import AgentOutputSchema
+
+import tool_cache
+from fast_start import SchemaStore, prewarm, schema_output_types
+from tool_cache import ToolCache
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output_schemas.json")
+
+
+def test_saved_schemas_are_up_to_date():
+    # Fails after an output model changes: run python fast_start.py --build
+    with open(SCHEMA_FILE) as f:
+        saved = json.load(f)
+    models = schema_output_types()
+    assert {"TravelPlan", "RecipeRecommendation", "BookRecommendation"} <= {m.__name__ for m in models}
+    assert sorted(saved) == sorted(SchemaStore.key(m) for m in models)
+    for model in models:
+        assert saved[SchemaStore.key(model)] == AgentOutputSchema(model).json_schema()
+
+
+def test_prewarm_skips_the_tool_cache(monkeypatch):
+    from recommendation import build_agents
+
+    cache = ToolCache(backend="memory")
+    monkeypatch.setattr(tool_cache, "_default_cache", cache)
+    asyncio.run(prewarm(build_agents()))
+    assert len(cache.store) == 0 and cache.stats() == {}
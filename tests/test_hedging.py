@@ -0,0 +1,107 @@
+import asyncio
+import random
+
+import httpx
+import openai
+import pytest
+from agents import Agent, Runner
+
+import hedging
+from hedging import HedgeBudget, HedgedModel, HedgeStats, backoff_seconds, race
+from mock_model import LatencyProfile, MockModel
+
+
+def make_call(*delays, fail=()):
+    """A call whose n-th start sleeps delays[n] seconds (and raises if n is in `fail`)."""
+    started = []
+
+    async def call():
+        n = len(started)
+        started.append(n)
+        await asyncio.sleep(delays[n])
+        if n in fail:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://test.invalid"))
+        return n
+
+    return call, started
+
+
+def test_race_without_hedge_when_the_call_is_quick():
+    call, started = make_call(0.01)
+    assert asyncio.run(race(call, delay=1.0, may_hedge=lambda: True)) == (0, False)
+    assert started == [0]
+
+
+def test_race_hedge_wins_when_the_first_call_is_slow():
+    call, started = make_call(1.0, 0.01)
+    assert asyncio.run(race(call, delay=0.02, may_hedge=lambda: True)) == (1, True)
+    assert started == [0, 1]
+
+
+def test_race_no_hedge_when_the_budget_says_no():
+    call, started = make_call(0.05, 0.01)
+    assert asyncio.run(race(call, delay=0.01, may_hedge=lambda: False)) == (0, False)
+    assert started == [0]
+
+
+def test_race_keeps_the_other_call_when_one_fails():
+    call, _started = make_call(0.05, 0.01, fail={1})
+    assert asyncio.run(race(call, delay=0.01, may_hedge=lambda: True)) == (0, False)
+
+
+def test_race_raises_when_every_call_fails():
+    call, _started = make_call(0.01, fail={0})
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(race(call, delay=None, may_hedge=lambda: True))
+
+
+def test_backoff_is_jittered_and_capped():
+    rng = random.Random(0)
+    error = ValueError("no response")
+    for attempt in range(6):
+        wait = backoff_seconds(attempt, error, rng, base=0.5, cap=4)
+        assert 0 <= wait <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_backoff_follows_retry_after():
+    response = httpx.Response(429, headers={"retry-after": "2"}, request=httpx.Request("POST", "https://test.invalid"))
+    error = openai.RateLimitError("slow down", response=response, body=None)
+    assert backoff_seconds(0, error, random.Random(0), base=0.5, cap=8) == 2.0
+    assert backoff_seconds(0, error, random.Random(0), base=0.5, cap=1) == 1.0
+
+
+def test_hedge_budget_caps_extra_requests():
+    budget = HedgeBudget(ratio=0.1, burst=2)
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    for _ in range(10):
+        budget.on_call()
+    assert budget.try_spend()
+
+
+class FlakyModel(MockModel):
+    """Fails the first `failures` calls with a connection error."""
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def _maybe_fail(self):
+        if self.calls <= self.failures:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://test.invalid"))
+
+
+@pytest.mark.parametrize("failures, attempts, ok", [(2, 3, True), (3, 3, False)])
+def test_hedged_model_retries_transient_errors(monkeypatch, failures, attempts, ok):
+    monkeypatch.setattr(hedging, "backoff_seconds", lambda *args, **kwargs: 0)
+    stats = HedgeStats()
+    inner = FlakyModel(failures, latency=LatencyProfile(distribution="fixed", median_ms=0), model_name="flaky")
+    agent = Agent(name="Helper", instructions="Help.", model=HedgedModel(inner, stats=stats, attempts=attempts))
+    if ok:
+        assert asyncio.run(Runner.run(agent, "hi")).final_output
+    else:
+        with pytest.raises(openai.APIConnectionError):
+            asyncio.run(Runner.run(agent, "hi"))
+    summary = stats.summary()["flaky"]
+    assert inner.calls == min(failures + 1, attempts)
+    assert summary["retries"] == min(failures, attempts - 1)
+    assert summary["errors"] == (0 if ok else 1)
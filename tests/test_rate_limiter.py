@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import pytest
+from agents import Agent, ModelTracing
+
+from mock_model import LatencyProfile, MockModel
+from rate_limiter import BATCH, INTERACTIVE, RateLimitedModel, RateLimiter, SharedBuckets
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "rate_limits.sqlite3")
+
+
+def test_take_until_the_bucket_is_empty(path):
+    buckets = SharedBuckets(path, rpm=2, tpm=1000, reserve_share=0)
+    assert buckets.take(100, INTERACTIVE) == 0
+    assert buckets.take(100, INTERACTIVE) == 0
+    # No request left: the wait is the time one request takes to refill (60 / rpm)
+    wait = buckets.take(100, INTERACTIVE)
+    assert 29 < wait <= 30
+
+
+def test_take_waits_for_tokens(path):
+    buckets = SharedBuckets(path, rpm=100, tpm=600, reserve_share=0)
+    assert buckets.take(500, INTERACTIVE) == 0
+    # 200 tokens needed, 100 left: 100 more take 10 seconds at 600 per minute
+    assert buckets.take(200, INTERACTIVE) == pytest.approx(10, abs=0.1)
+
+
+def test_batch_work_leaves_the_reserve_to_interactive(path):
+    buckets = SharedBuckets(path, rpm=10, tpm=10_000, reserve_share=0.5)
+    for _ in range(5):
+        assert buckets.take(10, BATCH) == 0
+    assert buckets.take(10, BATCH) > 0
+    assert buckets.take(10, INTERACTIVE) == 0
+
+
+def test_interactive_waiting_holds_batch_back(path):
+    buckets = SharedBuckets(path, rpm=1, tpm=10_000, reserve_share=0)
+    assert buckets.take(10, INTERACTIVE) == 0
+    assert buckets.take(10, INTERACTIVE) > 0 # waiting, and keeps batch work back meanwhile
+    buckets.refund(0)
+    assert buckets.take(10, BATCH) > 0
+
+
+def test_processes_share_the_buckets_through_the_file(path):
+    first = SharedBuckets(path, rpm=1, tpm=10_000, reserve_share=0)
+    second = SharedBuckets(path, rpm=1, tpm=10_000, reserve_share=0)
+    assert first.take(10, INTERACTIVE) == 0
+    assert second.take(10, INTERACTIVE) > 0
+
+
+def test_a_429_blocks_everyone(path):
+    buckets = SharedBuckets(path, rpm=100, tpm=10_000, reserve_share=0)
+    buckets.block(5)
+    assert buckets.take(10, INTERACTIVE) == pytest.approx(5, abs=0.1)
+
+
+def test_interactive_calls_go_first(path):
+    limiter = RateLimiter(SharedBuckets(path, rpm=600, tpm=100_000, reserve_share=0))
+    order = []
+
+    async def call(priority: str, name: str):
+        await limiter.acquire(10, priority, session=name)
+        order.append(name)
+
+    async def main():
+        # Empty buckets (as after a 429), then batch work queues up before the interactive request
+        limiter.buckets.block(0.05)
+        batch = [asyncio.create_task(call(BATCH, f"batch{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(call(INTERACTIVE, "user"))
+        await asyncio.wait_for(asyncio.gather(*batch, interactive), 10)
+
+    asyncio.run(main())
+    assert order[0] == "user"
+
+
+def test_stream_closed_early_still_settles(path):
+    limiter = RateLimiter(SharedBuckets(path, rpm=100, tpm=100_000, reserve_share=0))
+    settled = []
+
+    async def settle(estimated, used):
+        settled.append(used)
+
+    limiter.settle = settle
+    agent = Agent(name="Helper", instructions="Help.")
+    model = RateLimitedModel(MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0)), limiter)
+
+    async def main():
+        events = model.stream_response("Help.", "hi", agent.model_settings, [], None, [], ModelTracing.DISABLED)
+        async for _event in events:
+            break # the caller stops reading after the first event
+        await events.aclose()
+
+    asyncio.run(main())
+    assert settled == [None]
+
+
+def test_bucket_writes_after_a_call_run_off_the_event_loop(path, monkeypatch):
+    limiter = RateLimiter(SharedBuckets(path, rpm=100, tpm=100_000, reserve_share=0))
+    threads = []
+    refund, block = limiter.buckets.refund, limiter.buckets.block
+    monkeypatch.setattr(limiter.buckets, "refund", lambda *a: threads.append(threading.get_ident()) or refund(*a))
+    monkeypatch.setattr(limiter.buckets, "block", lambda *a: threads.append(threading.get_ident()) or block(*a))
+    agent = Agent(name="Helper", instructions="Help.")
+    model = RateLimitedModel(MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0)), limiter)
+
+    async def main():
+        await model.get_response("Help.", "hi", agent.model_settings, [], None, [], ModelTracing.DISABLED)
+        await limiter.rate_limited(RuntimeError("429"))
+
+    asyncio.run(main())
+    assert len(threads) == 2 and threading.get_ident() not in threads
+    assert limiter.stats()["rate_limited"] == 1
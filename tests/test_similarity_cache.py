@@ -0,0 +1,54 @@
+import threading
+
+from similarity_cache import SimilarityCache
+
+
+def test_paraphrase_hits():
+    cache = SimilarityCache()
+    cache.add("I want to read a mystery book", "A")
+    value, score, matched = cache.lookup("I'd like to read a mystery novel")
+    assert value == "A" and score >= cache.threshold and matched == "I want to read a mystery book"
+
+
+def test_added_author_is_a_different_request():
+    cache = SimilarityCache()
+    cache.add("I want to read a mystery book", "A")
+    assert cache.lookup("I want to read a mystery book by Agatha Christie") is None
+    assert cache.lookup("i want to read a mystery book by agatha christie") is None
+    assert cache.rejected == 2
+
+
+def test_same_author_still_hits():
+    cache = SimilarityCache()
+    cache.add("A mystery book by Agatha Christie", "B")
+    assert cache.lookup("I want a mystery book by Agatha Christie")[0] == "B"
+    assert cache.lookup("I want a mystery book by Stephen King") is None
+
+
+def test_negation_and_genre_are_rejected():
+    cache = SimilarityCache()
+    cache.add("I want to read a mystery book", "A")
+    assert cache.lookup("I don't want to read a mystery book") is None
+    assert cache.lookup("I want to read a fantasy book") is None
+
+
+def test_lookup_during_evictions_returns_the_matching_value():
+    # Every value is its own query: a row moved by an eviction would show up as a mismatch
+    cache = SimilarityCache(max_entries=64)
+    queries = [f"recipe number {i} with ingredient {i * 7}" for i in range(400)]
+    stop = threading.Event()
+
+    def writer():
+        for q in queries:
+            cache.add(q, q)
+        stop.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not stop.is_set():
+        for q in queries[::37]:
+            hit = cache.lookup(q)
+            if hit is not None:
+                value, _, matched = hit
+                assert value == matched
+    thread.join()
@@ -0,0 +1,72 @@
+import time
+from typing import List
+
+from pydantic import BaseModel
+from agents import Agent
+
+from common import MemoryLRUStore, SQLiteLRUStore
+from response_cache import ResponseCache
+
+
+class Answer(BaseModel):
+    title: str
+    tags: List[str]
+
+
+def test_memory_store_evicts_the_least_recently_used():
+    store = MemoryLRUStore(ttl_seconds=60, max_entries=2)
+    store.set("a", "1")
+    store.set("b", "2")
+    assert store.get("a") == "1" # "a" is now the most recently used
+    store.set("c", "3")
+    assert store.get("b") is None
+    assert store.get("a") == "1" and store.get("c") == "3"
+    assert len(store) == 2
+
+
+def test_memory_store_expires_entries():
+    store = MemoryLRUStore(ttl_seconds=60, max_entries=10)
+    store.set("old", "1", ttl_seconds=-1)
+    store.set("new", "2")
+    assert store.get("old") is None
+    store.set("gone", "3", ttl_seconds=-1)
+    store.purge_expired()
+    assert len(store) == 1
+
+
+def test_sqlite_store_evicts_the_least_recently_used(tmp_path):
+    store = SQLiteLRUStore(str(tmp_path / "store.sqlite3"), ttl_seconds=60, max_entries=10)
+    for i in range(10):
+        store.set(f"k{i}", str(i))
+        time.sleep(0.001) # distinct last_access times
+    assert store.get("k0") == "0"
+    store.set("k10", "10")
+    # Over the limit: k1 (least recently used) goes first, k0 was just read
+    assert len(store) <= 10
+    assert store.get("k1") is None
+    assert store.get("k0") == "0" and store.get("k10") == "10"
+
+
+def test_sqlite_store_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    SQLiteLRUStore(path, ttl_seconds=60, max_entries=10).set("key", "value")
+    assert SQLiteLRUStore(path, ttl_seconds=60, max_entries=10).get("key") == "value"
+
+
+def test_response_cache_round_trip(tmp_path):
+    agent = Agent(name="Helper", instructions="Help.", output_type=Answer)
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl_seconds=60, max_entries=10)
+    assert cache.get(agent, "A good book?") is None
+    cache.put(agent, "A good book?", Answer(title="Dune", tags=["sci-fi"]), "Helper")
+    hit = cache.get(agent, "  a GOOD book?  ")
+    assert hit.cached and hit.last_agent_name == "Helper"
+    assert hit.final_output == Answer(title="Dune", tags=["sci-fi"])
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_response_cache_misses_when_the_agent_changes(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path, ttl_seconds=60, max_entries=10)
+    cache.put(Agent(name="Helper", instructions="Help.", output_type=Answer), "q", Answer(title="t", tags=[]), "Helper")
+    changed = Agent(name="Helper", instructions="Help, briefly.", output_type=Answer)
+    assert cache.get(changed, "q") is None
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from agents import RunContextWrapper
+
+import tool_cache
+from tool_cache import ToolCache
+from v3_tool_calls import get_ingredient_info
+
+
+def invoke(arguments: str) -> str:
+    return asyncio.run(get_ingredient_info.on_invoke_tool(RunContextWrapper(None), arguments))
+
+
+def test_ingredient_info_is_cached_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ToolCache(backend="sqlite", path=str(tmp_path / "tools.sqlite3"))
+    monkeypatch.setattr(tool_cache, "_default_cache", cache)
+    threads = []
+    get, set_ = cache.store.get, cache.store.set
+    monkeypatch.setattr(cache.store, "get", lambda *a: threads.append(threading.get_ident()) or get(*a))
+    monkeypatch.setattr(cache.store, "set", lambda *a: threads.append(threading.get_ident()) or set_(*a))
+
+    first = invoke('{"ingredient": "chicken"}')
+    assert "protein" in first.lower()
+    # Same ingredient, other case: answered from the cache
+    assert invoke('{"ingredient": " Chicken"}') == first
+    stats = cache.stats()["get_ingredient_info"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert threads and threading.get_ident() not in threads
+
+
+def test_memory_backend_hits(monkeypatch):
+    cache = ToolCache(backend="memory")
+    monkeypatch.setattr(tool_cache, "_default_cache", cache)
+    invoke('{"ingredient": "rice"}')
+    invoke('{"ingredient": "RICE"}')
+    assert cache.stats()["get_ingredient_info"]["hits"] == 1
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+import time
+
+from agents import RunContextWrapper, function_tool
+
+import tool_cache
+from tool_cache import ToolCache
+from tool_executor import ToolStats, nonblocking_tool, tool_stats
+from v3_tool_calls import get_ingredient_info
+
+stats = ToolStats()
+threads = []
+
+
+@function_tool
+@nonblocking_tool(timeout=0.2, stats=stats)
+def slow_lookup(seconds: float) -> str:
+    """Sleep, then answer."""
+    threads.append(threading.get_ident())
+    time.sleep(seconds)
+    return "done"
+
+
+def invoke(tool, arguments: str) -> str:
+    return asyncio.run(tool.on_invoke_tool(RunContextWrapper(None), arguments))
+
+
+def test_tool_runs_in_the_pool_and_times_out():
+    assert invoke(slow_lookup, '{"seconds": 0}') == "done"
+    assert threads[-1] != threading.get_ident()
+    # function_tool turns the timeout into an error message for the model
+    assert "took longer than 0.2s" in invoke(slow_lookup, '{"seconds": 0.5}')
+    summary = stats.summary()["slow_lookup"]
+    assert summary["calls"] == 2 and summary["timeouts"] == 1
+
+
+def test_ingredient_info_is_nonblocking(monkeypatch):
+    monkeypatch.setattr(tool_cache, "_default_cache", ToolCache(backend="memory"))
+    calls = tool_stats.summary().get("get_ingredient_info", {}).get("calls", 0)
+    assert "grain" in invoke(get_ingredient_info, '{"ingredient": "rice"}').lower()
+    assert tool_stats.summary()["get_ingredient_info"]["calls"] == calls + 1
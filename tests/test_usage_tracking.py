@@ -0,0 +1,30 @@
+import asyncio
+
+from agents import Agent
+
+from mock_model import LatencyProfile, MockModel
+from usage_tracking import BudgetController, UsageTracker, shared_tracker
+
+
+def mock_agent(name: str) -> Agent:
+    model = MockModel(latency=LatencyProfile(distribution="fixed", median_ms=0), seed=1, model_name="gpt-4.1-nano")
+    return Agent(name=name, instructions="Answer briefly.", model=model)
+
+
+def test_budgets_share_the_process_tracker():
+    travel, recipe = mock_agent("Travel Planner"), mock_agent("Recipe Helper")
+    travel_budget, recipe_budget = BudgetController([travel]), BudgetController([recipe])
+    assert travel_budget.tracker is recipe_budget.tracker is shared_tracker()
+
+    runs = shared_tracker().runs
+    asyncio.run(travel_budget.run(travel, "Three days in Rome"))
+    asyncio.run(recipe_budget.run(recipe, "Something with potatoes"))
+    assert shared_tracker().runs == runs + 2
+    assert {"Travel Planner", "Recipe Helper"} <= set(shared_tracker().totals)
+
+
+def test_own_tracker_stays_separate():
+    agent = mock_agent("Helper")
+    budget = BudgetController([agent], tracker=UsageTracker())
+    asyncio.run(budget.run(agent, "Hello"))
+    assert budget.tracker is not shared_tracker() and budget.tracker.runs == 1
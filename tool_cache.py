@@ -0,0 +1,283 @@
+
+# ==============================================================================
+# Tool Cache: remember tool results so repeated calls skip the work
+# The model asks for get_ingredient_info("chicken") or search_movies(genre="comedy")
+# over and over. cached_tool() wraps a function tool so the same arguments
+# return the saved result, with expiry (TTL) and a size limit (LRU). Arguments
+# are validated against the tool's parameter schema before they become a key,
+# so {"limit": "5"} and {"limit": 5}, or a left-out optional argument and an
+# explicit null, share one entry. The cache
+# lives in memory, or in a SQLite file shared by all worker processes. When the
+# data behind a tool changes, invalidate that tool's entries.
+#
+# Usage:
+#   @cached_tool            (above @function_tool)
+#   @cached_tool(case_insensitive=("genre",))   # "Mystery" and "mystery" give the same result
+#   default_tool_cache().invalidate("search_books") # after the book catalog changed
+#   python tool_cache.py --invalidate search_books # same, for the shared SQLite cache
+#   with bypass_tool_cache(): ...                   # tools run for real, nothing is read or saved
+# ==============================================================================
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+from agents import FunctionTool
+from dotenv import load_dotenv
+
+from common import MemoryLRUStore, SQLiteLRUStore
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+TOOL_CACHE_BACKEND = os.getenv('TOOL_CACHE_BACKEND', 'memory') # "memory" or "sqlite"
+TOOL_CACHE_PATH = os.getenv('TOOL_CACHE_PATH', 'tool_cache.sqlite3')
+TOOL_CACHE_TTL_SECONDS = float(os.getenv('TOOL_CACHE_TTL_SECONDS', '3600'))
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '5000'))
+
+# function_tool returns this text instead of raising when a tool fails; never cache it
+TOOL_ERROR_PREFIX = "An error occurred while running the tool"
+
+# --- Cache ---
+
+JSON_TYPES = {"string": str, "integer": int, "number": float, "boolean": bool, "array": list, "object": dict}
+
+
+def _json_type(prop: Dict[str, Any]) -> Tuple[Any, bool]:
+    """Python type of a JSON schema property, and whether it may be null."""
+    options = prop.get("anyOf", [prop])
+    types = [JSON_TYPES.get(o.get("type"), Any) for o in options if o.get("type") != "null"]
+    nullable = len(types) < len(options)
+    python_type = types[0] if len(types) == 1 else Any
+    return (Optional[python_type] if nullable else python_type), nullable
+
+
+def params_model(schema: Dict[str, Any]) -> Type[BaseModel]:
+    """A pydantic model for a function tool's params_json_schema (the same checks and coercion as the tool's own)."""
+    fields = {}
+    for name, prop in schema.get("properties", {}).items():
+        python_type, nullable = _json_type(prop)
+        if "default" in prop:
+            fields[name] = (python_type, prop["default"])
+        elif nullable:
+            # Strict schemas list every argument as required; optional ones are nullable
+            fields[name] = (python_type, None)
+        else:
+            fields[name] = (python_type, ...)
+    return create_model(schema.get("title", "ToolArguments"), **fields)
+
+
+def arguments_key(
+    arguments: str,
+    params: Optional[Type[BaseModel]] = None,
+    case_insensitive: Iterable[str] = (),
+) -> Optional[str]:
+    """Same arguments, same key. None if they aren't valid JSON or don't pass `params`.
+
+    With `params`, the key is made from the validated arguments: "5" and 5 for an
+    integer, and a left-out optional argument and null, give the same key.
+    String arguments named in `case_insensitive` are lowercased.
+    """
+    try:
+        data = json.loads(arguments) if arguments else {}
+        if params is not None:
+            data = params.model_validate(data).model_dump(mode="json")
+    except (ValueError, ValidationError):
+        return None
+    for name in case_insensitive:
+        if isinstance(data.get(name), str):
+            data[name] = data[name].strip().lower()
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ToolCache:
+    """Tool results keyed on tool name + arguments, with hit and saved-time stats per tool."""
+
+    def __init__(
+        self,
+        backend: str = TOOL_CACHE_BACKEND,
+        path: str = TOOL_CACHE_PATH,
+        ttl_seconds: float = TOOL_CACHE_TTL_SECONDS,
+        max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+    ):
+        if backend == "sqlite":
+            self.store = SQLiteLRUStore(path, ttl_seconds, max_entries, table="tool_results")
+        elif backend == "memory":
+            self.store = MemoryLRUStore(ttl_seconds, max_entries)
+        else:
+            raise ValueError(f"Unknown tool cache backend: {backend}")
+        self.backend = backend
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, tool_name: str, arguments: str, version: str = "", params: Optional[Type[BaseModel]] = None,
+            case_insensitive: Iterable[str] = ()) -> Optional[str]:
+        args = arguments_key(arguments, params, case_insensitive)
+        if args is None:
+            return None
+        # The tool name comes first so invalidate() can remove one tool's entries
+        return f"{tool_name}:{version}:{args}"
+
+    def get(self, key: str) -> Optional[str]:
+        return self.store.get(key)
+
+    def put(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        self.store.set(key, value, ttl_seconds)
+
+    # The SQLite file is disk I/O (and a lock shared with other workers): keep it off the event loop
+    async def aget(self, key: str) -> Optional[str]:
+        if self.backend == "sqlite":
+            return await asyncio.to_thread(self.store.get, key)
+        return self.store.get(key)
+
+    async def aput(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        if self.backend == "sqlite":
+            await asyncio.to_thread(self.store.set, key, value, ttl_seconds)
+        else:
+            self.store.set(key, value, ttl_seconds)
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """Forget one tool's results (or everything)."""
+        if tool_name is None:
+            self.store.clear()
+        else:
+            self.store.delete_prefix(f"{tool_name}:")
+
+    def record(self, tool_name: str, hit: bool, seconds: float):
+        with self._lock:
+            s = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "miss_seconds": 0.0, "hit_seconds": 0.0})
+            if hit:
+                s["hits"] += 1
+                s["hit_seconds"] += seconds
+            else:
+                s["misses"] += 1
+                s["miss_seconds"] += seconds
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hits, misses, hit rate and time saved per tool (a hit saves one average miss)."""
+        with self._lock:
+            result = {}
+            for name, s in self._stats.items():
+                calls = s["hits"] + s["misses"]
+                avg_miss = s["miss_seconds"] / s["misses"] if s["misses"] else 0.0
+                result[name] = {
+                    "hits": int(s["hits"]),
+                    "misses": int(s["misses"]),
+                    "hit_rate": s["hits"] / calls if calls else 0.0,
+                    "avg_miss_ms": avg_miss * 1000,
+                    "saved_seconds": max(0.0, s["hits"] * avg_miss - s["hit_seconds"]),
+                }
+            return result
+
+
+_default_cache: Optional[ToolCache] = None
+_default_lock = threading.Lock()
+
+def default_tool_cache() -> ToolCache:
+    """The process-wide cache used when cached_tool() gets none (created on first use)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ToolCache()
+        return _default_cache
+
+
+def _forget_default_cache():
+    # A forked child must not share the parent's SQLite connection
+    global _default_cache, _default_lock
+    _default_cache = None
+    _default_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_default_cache)
+
+# --- Wrapping tools ---
+
+# Set inside bypass_tool_cache(); seen by every run and tool call started in that block
+_bypass = contextvars.ContextVar("tool_cache_bypass", default=False)
+
+@contextlib.contextmanager
+def bypass_tool_cache():
+    """Tools called in this block skip the cache (e.g. pre-warm runs with mock arguments)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cached_tool(
+    tool: Optional[FunctionTool] = None,
+    cache: Optional[ToolCache] = None,
+    ttl_seconds: Optional[float] = None,
+    version: str = "",
+    case_insensitive: Tuple[str, ...] = (),
+):
+    """A copy of the function tool whose results are cached.
+
+    Only plain string results are cached, and never function_tool's error
+    message. Bump `version` (e.g. a catalog file's timestamp) to start fresh
+    without deleting anything. List the string arguments the tool ignores the
+    case of in `case_insensitive`. Without a tool, returns a decorator:
+    @cached_tool(case_insensitive=("genre",)).
+    """
+    if tool is None:
+        return lambda t: cached_tool(t, cache, ttl_seconds, version, case_insensitive)
+    original = tool.on_invoke_tool
+    params = params_model(tool.params_json_schema)
+
+    async def on_invoke_tool(ctx, arguments: str) -> Any:
+        if _bypass.get():
+            return await original(ctx, arguments)
+        # Resolved per call, so the default cache is only created when a tool runs
+        store = cache if cache is not None else default_tool_cache()
+        start = time.perf_counter()
+        key = store.key(tool.name, arguments, version, params, case_insensitive)
+        if key is not None:
+            hit = await store.aget(key)
+            if hit is not None:
+                store.record(tool.name, True, time.perf_counter() - start)
+                return hit
+        result = await original(ctx, arguments)
+        store.record(tool.name, False, time.perf_counter() - start)
+        if key is not None and isinstance(result, str) and not result.startswith(TOOL_ERROR_PREFIX):
+            await store.aput(key, result, ttl_seconds)
+        return result
+
+    return dataclasses.replace(tool, on_invoke_tool=on_invoke_tool)
+
+
+def print_tool_cache_stats(cache: Optional[ToolCache] = None):
+    cache = cache or default_tool_cache()
+    print("\n" + "="*50)
+    print(f"{'cached tool':<22} {'hits':>6} {'misses':>7} {'hit rate':>9} {'saved ms':>9}")
+    for name, s in cache.stats().items():
+        print(f"{name:<22} {s['hits']:>6} {s['misses']:>7} {s['hit_rate']:>9.0%} {s['saved_seconds'] * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the shared (SQLite) tool cache")
+    parser.add_argument("--path", default=TOOL_CACHE_PATH)
+    parser.add_argument("--invalidate", metavar="TOOL", help="Forget the results of this tool ('all' for every tool)")
+    args = parser.parse_args()
+
+    cache = ToolCache(backend="sqlite", path=args.path)
+    if args.invalidate:
+        cache.invalidate(None if args.invalidate == "all" else args.invalidate)
+        print(f"Invalidated {args.invalidate}")
+    print(f"{len(cache.store)} cached tool results in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
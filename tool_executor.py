@@ -0,0 +1,179 @@
+
+# ==============================================================================
+# Tool Executor: run tools without blocking the event loop
+# Our tools are plain (synchronous) functions. The agents library calls them
+# directly on the event loop, so a slow tool (a database query, a web request)
+# stalls every other run in the process. Wrapping a tool with
+# @nonblocking_tool runs it in a thread pool instead (or awaits it if it is
+# already async), with a timeout and latency stats per tool. The library
+# already runs all tool calls of one model turn at the same time; the
+# PARALLEL_TOOLS settings let the model ask for several in one turn.
+# ==============================================================================
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from agents import ModelSettings
+from dotenv import load_dotenv
+
+from latency_stats import latency_summary
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+TOOL_THREADS = int(os.getenv('TOOL_THREADS', '16')) # max tool calls running at the same time
+TOOL_TIMEOUT_SECONDS = float(os.getenv('TOOL_TIMEOUT_SECONDS', '10'))
+KEEP_LATENCIES = 1000 # recent calls kept per tool for the percentiles
+
+# Let the model request several tool calls in one turn (they then run concurrently)
+PARALLEL_TOOLS = ModelSettings(parallel_tool_calls=True)
+
+# --- Pools ---
+
+_pools: Dict[str, Executor] = {}
+_pools_lock = threading.Lock()
+
+def tool_pool(kind: str = "thread") -> Executor:
+    """The shared pool for tools: "thread" for I/O, "process" for CPU-heavy work."""
+    with _pools_lock:
+        if kind not in _pools:
+            if kind == "thread":
+                _pools[kind] = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+            elif kind == "process":
+                _pools[kind] = ProcessPoolExecutor(max_workers=min(TOOL_THREADS, os.cpu_count() or 1))
+            else:
+                raise ValueError(f"Unknown pool kind: {kind}")
+        return _pools[kind]
+
+
+def _reset_pools():
+    # A forked child has no pool threads: start fresh pools there instead of waiting forever
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools)
+
+# --- Stats ---
+
+class ToolStats:
+    """Calls, errors, timeouts and recent latencies of every wrapped tool."""
+
+    def __init__(self, keep: int = KEEP_LATENCIES):
+        self.keep = keep
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, outcome: str = "ok"):
+        with self._lock:
+            entry = self._tools.setdefault(
+                name, {"calls": 0, "errors": 0, "timeouts": 0, "latencies": deque(maxlen=self.keep)}
+            )
+            entry["calls"] += 1
+            if outcome == "error":
+                entry["errors"] += 1
+            elif outcome == "timeout":
+                entry["timeouts"] += 1
+            entry["latencies"].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    "calls": e["calls"],
+                    "errors": e["errors"],
+                    "timeouts": e["timeouts"],
+                    **latency_summary(list(e["latencies"])),
+                }
+                for name, e in self._tools.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+
+
+tool_stats = ToolStats()
+
+def print_tool_stats(stats: ToolStats = tool_stats):
+    print("\n" + "="*50)
+    print(f"{'tool':<22} {'calls':>6} {'errors':>7} {'timeouts':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, s in stats.summary().items():
+        print(f"{name:<22} {s['calls']:>6} {s['errors']:>7} {s['timeouts']:>9} "
+              f"{s['p50'] * 1000:>8.2f} {s['p95'] * 1000:>8.2f}")
+
+# --- Decorator ---
+
+def nonblocking_tool(
+    func: Optional[Callable] = None,
+    *,
+    timeout: Optional[float] = TOOL_TIMEOUT_SECONDS,
+    pool: str = "thread",
+    stats: ToolStats = tool_stats,
+):
+    """Turn a tool function into an async one that never blocks the event loop.
+
+    Use it under @function_tool:
+
+        @function_tool
+        @nonblocking_tool(timeout=5)
+        def search_books(genre: str) -> str: ...
+
+    Sync functions run in the shared thread pool; async functions are awaited
+    as they are. A call that takes longer than `timeout` raises TimeoutError,
+    which function_tool turns into an error message for the model. A timed
+    out thread can't be stopped, it finishes in the background.
+
+    pool="process" is for CPU-heavy tools. The function and its arguments are
+    pickled to the worker process, so it must be a plain module-level function
+    that is not itself replaced by the decorator, e.g.
+    function_tool(nonblocking_tool(_heavy_search, pool="process"), name_override="heavy_search").
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        name = fn.__name__
+        is_async = inspect.iscoroutinefunction(fn)
+
+        # functools.wraps keeps the name, docstring and signature that function_tool reads
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                if is_async:
+                    call = fn(*args, **kwargs)
+                elif pool == "thread":
+                    # copy_context: the tool sees the same context variables (current trace, ...)
+                    call = asyncio.get_running_loop().run_in_executor(
+                        tool_pool("thread"), functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+                    )
+                else:
+                    call = asyncio.get_running_loop().run_in_executor(
+                        tool_pool(pool), functools.partial(fn, *args, **kwargs)
+                    )
+                return await asyncio.wait_for(call, timeout)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise TimeoutError(f"Tool {name} took longer than {timeout}s") from None
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                stats.record(name, time.perf_counter() - start, outcome)
+
+        return wrapper
+
+    # Used as @nonblocking_tool without parentheses
+    if func is not None:
+        return decorate(func)
+    return decorate
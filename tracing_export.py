@@ -0,0 +1,381 @@
+
+# ==============================================================================
+# Tracing Export: see where the time of each agent run goes, locally
+# The agents library already creates spans for agent turns, model calls,
+# tool calls and handoffs. This processor keeps them, writes one JSON line per
+# run (a span tree with timings, tokens and output sizes) and keeps Prometheus
+# style counters that can be scraped from a small /metrics endpoint.
+#
+# The file is opt-in (TRACE_EXPORT_PATH=traces.jsonl). A background thread
+# writes it, so runs never wait for the disk, and it is rotated like a log
+# (traces.jsonl.1, .2, ...) once it reaches TRACE_EXPORT_MAX_BYTES.
+# ==============================================================================
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import add_trace_processor, set_trace_processors
+from agents.tracing import TracingProcessor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', '') # e.g. traces.jsonl; empty = don't write a file
+TRACE_EXPORT_MAX_BYTES = int(os.getenv('TRACE_EXPORT_MAX_BYTES', str(50 * 1024 * 1024))) # 0 = never rotate
+TRACE_EXPORT_BACKUPS = int(os.getenv('TRACE_EXPORT_BACKUPS', '3')) # rotated files kept
+TRACE_OPEN_TTL_SECONDS = float(os.getenv('TRACE_OPEN_TTL_SECONDS', '600')) # unfinished runs are dropped after this
+TRACE_METRICS_PORT = int(os.getenv('TRACE_METRICS_PORT', '0')) # 0 = no /metrics endpoint
+KEEP_TRACES = 200 # finished runs kept in memory (for the app's waterfall)
+
+# Histogram buckets for span durations (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# --- Span details ---
+
+def _seconds(span) -> Tuple[Optional[datetime], float]:
+    if not span.started_at or not span.ended_at:
+        return None, 0.0
+    start = datetime.fromisoformat(span.started_at)
+    return start, (datetime.fromisoformat(span.ended_at) - start).total_seconds()
+
+
+def _size(value: Any) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def span_details(data) -> Dict[str, Any]:
+    """Name, model, token counts and output size of a span, whatever its type."""
+    kind = data.type
+    details: Dict[str, Any] = {"type": kind, "name": kind}
+    if kind == "agent":
+        details["name"] = data.name
+    elif kind == "function":
+        details["name"] = data.name
+        details["output_bytes"] = _size(data.output)
+    elif kind == "handoff":
+        details["name"] = f"{data.from_agent} -> {data.to_agent}"
+    elif kind == "generation":
+        # Chat Completions models (and the mock model)
+        details["name"] = data.model or "model"
+        usage = data.usage or {}
+        details["input_tokens"] = usage.get("input_tokens", 0)
+        details["output_tokens"] = usage.get("output_tokens", 0)
+        details["output_bytes"] = _size(data.output)
+    elif kind == "response":
+        # Responses API models
+        response = data.response
+        if response is not None:
+            details["name"] = response.model or "model"
+            if response.usage is not None:
+                details["input_tokens"] = response.usage.input_tokens
+                details["output_tokens"] = response.usage.output_tokens
+            details["output_bytes"] = _size([item.model_dump() for item in response.output])
+    elif kind == "custom":
+        details["name"] = data.name
+    return details
+
+# --- Prometheus text format ---
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def format_prometheus(
+    counters: Dict[Tuple[str, Tuple], float],
+    histograms: Dict[Tuple[str, Tuple], List[float]],
+    help_text: Dict[str, str],
+    gauges: Optional[Dict[Tuple[str, Tuple], float]] = None,
+) -> str:
+    """Render counters, gauges and histograms (bucket counts + sum + count) as Prometheus text."""
+    gauges = gauges or {}
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms} | {name for name, _ in gauges})
+    for name in names:
+        if any(n == name for n, _ in histograms):
+            kind = "histogram"
+        else:
+            kind = "gauge" if any(n == name for n, _ in gauges) else "counter"
+        lines.append(f"# HELP {name} {help_text.get(name, name)}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind != "histogram":
+            for (n, labels), value in sorted({**counters, **gauges}.items()):
+                if n == name:
+                    lines.append(f"{name}{_labels(dict(labels))} {value:g}")
+            continue
+        for (n, labels), values in sorted(histograms.items()):
+            if n != name:
+                continue
+            # values = one count per bucket, then +Inf, then sum
+            *bucket_counts, total, value_sum = values
+            cumulative = 0
+            for bound, count in zip(BUCKETS, bucket_counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels({**dict(labels), 'le': f'{bound:g}'})} {cumulative:g}")
+            lines.append(f"{name}_bucket{_labels({**dict(labels), 'le': '+Inf'})} {total:g}")
+            lines.append(f"{name}_sum{_labels(dict(labels))} {value_sum:g}")
+            lines.append(f"{name}_count{_labels(dict(labels))} {total:g}")
+    return "\n".join(lines) + "\n"
+
+# --- File writer ---
+
+class TraceWriter:
+    """Appends JSON lines to a file from a background thread, rotating it when it gets too big."""
+
+    def __init__(self, path: str, max_bytes: int = TRACE_EXPORT_MAX_BYTES, backups: int = TRACE_EXPORT_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str):
+        self._queue.put(line)
+
+    def flush(self):
+        """Wait until every queued line is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_loop(self):
+        while True:
+            line = self._queue.get()
+            try:
+                if line is None:
+                    return
+                self._append(line)
+            except OSError:
+                pass # losing a trace line must never break the app
+            finally:
+                self._queue.task_done()
+
+    def _append(self, line: str):
+        with open(self.path, "a") as f:
+            f.write(line)
+            size = f.tell()
+        if self.max_bytes and size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """traces.jsonl -> traces.jsonl.1 -> traces.jsonl.2 ... (the oldest is deleted)."""
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+# --- Processor ---
+
+METRIC_HELP = {
+    "agent_runs_total": "Finished agent runs (traces)",
+    "agent_span_duration_seconds": "Duration of agent turns, model calls, tool calls and handoffs",
+    "agent_tokens_total": "Model tokens used, by model and direction",
+    "agent_output_bytes_total": "Bytes returned by model calls and tools",
+    "agent_runs_dropped_total": "Runs that never ended and were dropped after TRACE_OPEN_TTL_SECONDS",
+}
+
+
+class SpanRecorder(TracingProcessor):
+    """Collects each run's spans, writes them as JSONL and keeps Prometheus metrics."""
+
+    def __init__(self, path: Optional[str] = TRACE_EXPORT_PATH, keep: int = KEEP_TRACES,
+                 open_ttl_seconds: float = TRACE_OPEN_TTL_SECONDS):
+        self.path = path
+        self.keep = keep
+        self.open_ttl_seconds = open_ttl_seconds
+        self.writer = TraceWriter(path) if path else None
+        self._lock = threading.Lock()
+        # Runs that haven't ended yet, oldest first (trace id -> run, with its start time)
+        self._open: Dict[str, Dict[str, Any]] = {}
+        self._finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+
+    # --- TracingProcessor interface ---
+
+    def on_trace_start(self, trace):
+        with self._lock:
+            self._evict_stale(time.monotonic())
+            self._open[trace.trace_id] = {"trace_id": trace.trace_id, "workflow": trace.name, "spans": [],
+                                          "_opened": time.monotonic()}
+
+    def on_span_start(self, span):
+        pass
+
+    def on_span_end(self, span):
+        if not span.started_at:
+            return
+        _start, seconds = _seconds(span)
+        details = span_details(span.span_data)
+        record = {
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            **details,
+            "started_at": span.started_at,
+            "duration_ms": round(seconds * 1000, 3),
+            "error": span.error["message"] if span.error else None,
+        }
+        with self._lock:
+            run = self._open.get(span.trace_id)
+            if run is not None:
+                run["spans"].append(record)
+            self._observe(details, seconds)
+
+    def on_trace_end(self, trace):
+        with self._lock:
+            run = self._open.pop(trace.trace_id, None)
+            if run is None:
+                return
+            del run["_opened"]
+            self._finish(run)
+            self._counters[("agent_runs_total", (("workflow", run["workflow"]),))] += 1
+            self._finished[trace.trace_id] = run
+            while len(self._finished) > self.keep:
+                self._finished.popitem(last=False)
+            if self.writer is not None:
+                self.writer.write(json.dumps(run, separators=(",", ":")) + "\n")
+
+    def shutdown(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def force_flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    # --- Helpers ---
+
+    def _evict_stale(self, now: float):
+        """Drop runs that never ended (cancelled, crashed) once they are older than open_ttl_seconds."""
+        while self._open:
+            trace_id, run = next(iter(self._open.items()))
+            if now - run["_opened"] < self.open_ttl_seconds:
+                return
+            del self._open[trace_id]
+            self._counters[("agent_runs_dropped_total", ())] += 1
+
+    def _finish(self, run: Dict[str, Any]):
+        """Add start offsets, depth and self time (time not spent in child spans)."""
+        spans = run["spans"]
+        if not spans:
+            run["duration_ms"] = 0.0
+            return
+        starts = {s["span_id"]: datetime.fromisoformat(s["started_at"]) for s in spans}
+        first = min(starts.values())
+        by_id = {s["span_id"]: s for s in spans}
+        children_ms: Dict[str, float] = defaultdict(float)
+        for s in spans:
+            s["start_ms"] = round((starts[s["span_id"]] - first).total_seconds() * 1000, 3)
+            if s["parent_id"] in by_id:
+                children_ms[s["parent_id"]] += s["duration_ms"]
+        for s in spans:
+            depth, parent = 0, s["parent_id"]
+            while parent in by_id:
+                depth, parent = depth + 1, by_id[parent]["parent_id"]
+            s["depth"] = depth
+            # For agent turns, self time is mostly output parsing and runner overhead
+            s["self_ms"] = round(max(0.0, s["duration_ms"] - children_ms[s["span_id"]]), 3)
+        spans.sort(key=lambda s: (s["start_ms"], s["depth"]))
+        run["started_at"] = first.isoformat()
+        run["duration_ms"] = round(max(s["start_ms"] + s["duration_ms"] for s in spans), 3)
+
+    def _observe(self, details: Dict[str, Any], seconds: float):
+        labels = (("name", details["name"]), ("type", details["type"]))
+        key = ("agent_span_duration_seconds", labels)
+        values = self._histograms.setdefault(key, [0.0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+                break
+        values[-2] += 1
+        values[-1] += seconds
+        for direction in ("input", "output"):
+            tokens = details.get(f"{direction}_tokens")
+            if tokens:
+                self._counters[("agent_tokens_total", (("direction", direction), ("model", details["name"])))] += tokens
+        if details.get("output_bytes"):
+            self._counters[("agent_output_bytes_total", (("type", details["type"]),))] += details["output_bytes"]
+
+    # --- Reading ---
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._finished.get(trace_id)
+
+    def last_trace(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next(reversed(self._finished.values()), None)
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            return format_prometheus(dict(self._counters), {k: list(v) for k, v in self._histograms.items()}, METRIC_HELP)
+
+# --- Setup ---
+
+_recorder: Optional[SpanRecorder] = None
+_install_lock = threading.Lock()
+
+def install_tracing(path: Optional[str] = TRACE_EXPORT_PATH, metrics_port: int = TRACE_METRICS_PORT) -> SpanRecorder:
+    """Add the local recorder next to the default OpenAI exporter (once per process)."""
+    global _recorder
+    with _install_lock:
+        if _recorder is None:
+            _recorder = SpanRecorder(path)
+            add_trace_processor(_recorder)
+            if metrics_port:
+                start_metrics_server(_recorder, metrics_port)
+        return _recorder
+
+
+def disable_trace_upload():
+    """Stop sending traces to OpenAI (e.g. when replaying a cassette); the local recorder keeps working."""
+    with _install_lock:
+        set_trace_processors([_recorder] if _recorder is not None else [])
+
+
+def start_metrics_server(recorder: SpanRecorder, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve recorder.prometheus_text() at http://host:port/metrics from a background thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = recorder.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="trace-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,351 @@
+
+# ==============================================================================
+# Usage Tracking: how many tokens (and dollars) each agent spends
+# Every run returns the raw model responses with their token usage. Here we
+# add them up per run and per agent, turn them into a cost, and let a budget
+# controller move the agents down MODEL_TIERS (each model cheaper and faster
+# than the one before) when we spend too much or answers get too slow, and
+# back up again when there is room. Runs get a copy of the agents on the
+# tier's model; the agents themselves are never changed, so runs that are
+# already going keep their model.
+# ==============================================================================
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from agents import Agent, Handoff, Runner
+from dotenv import load_dotenv
+
+from latency_stats import percentile
+from model_factory import with_model
+from common import iter_agents
+
+# Load environment variables
+load_dotenv()
+
+# --- Settings ---
+# Biggest model first; each one must be cheaper and faster than the one before.
+# The budget only moves down from the agents' own model (nothing below gpt-4.1-nano = no fallback)
+MODEL_TIERS = [m.strip() for m in os.getenv('MODEL_TIERS', 'gpt-4.1,gpt-4.1-mini,gpt-4.1-nano').split(',') if m.strip()]
+SPEND_BUDGET_USD = float(os.getenv('SPEND_BUDGET_USD', '1.0')) # max spend per budget window
+LATENCY_BUDGET_SECONDS = float(os.getenv('LATENCY_BUDGET_SECONDS', '10')) # max p95 run latency
+BUDGET_WINDOW_SECONDS = float(os.getenv('BUDGET_WINDOW_SECONDS', '3600'))
+
+# USD per 1M tokens (input, output)
+# Input tokens served from the provider's prompt cache cost a fraction of the input price
+PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "o4-mini": (1.10, 4.40),
+}
+CACHED_INPUT_DISCOUNT = {"gpt-4.1": 0.25, "gpt-4o": 0.5, "o4-mini": 0.25}
+
+# --- Models for usage reports ---
+
+class AgentUsage(BaseModel):
+    agent: str
+    model: str
+    requests: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0 # input tokens served from the provider's prompt cache
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+class RunUsage(BaseModel):
+    agents: Dict[str, AgentUsage] = {}
+    seconds: float = 0.0
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(a.input_tokens for a in self.agents.values())
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(a.output_tokens for a in self.agents.values())
+
+    @property
+    def cost_usd(self) -> float:
+        return sum(a.cost_usd for a in self.agents.values())
+
+# --- Counting ---
+
+def price_for(model: str) -> Tuple[float, float]:
+    """Price of a model name; "mock-gpt-4.1-nano" is priced like gpt-4.1-nano, unknown models are free."""
+    known = [name for name in PRICES if name in model]
+    return PRICES[max(known, key=len)] if known else (0.0, 0.0)
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    input_price, output_price = price_for(model)
+    known = [name for name in CACHED_INPUT_DISCOUNT if name in model]
+    cached_price = input_price * (CACHED_INPUT_DISCOUNT[max(known, key=len)] if known else 1.0)
+    uncached = input_tokens - cached_tokens
+    return (uncached * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+
+
+def model_name(agent: Agent) -> str:
+    if agent.model is None:
+        return "default"
+    if isinstance(agent.model, str):
+        return agent.model
+    return getattr(agent.model, "model_name", None) or type(agent.model).__name__
+
+
+def cheaper_models(model: str, candidates: List[str]) -> List[str]:
+    """Candidates that cost less than `model`, most expensive first."""
+    price = sum(price_for(model))
+    cheaper = [m for m in candidates if price == 0 or sum(price_for(m)) < price]
+    return sorted(cheaper, key=lambda m: sum(price_for(m)), reverse=True)
+
+
+def tiers_below(model: str, tiers: List[str] = MODEL_TIERS) -> List[str]:
+    """`model` followed by the tiers below it.
+
+    A model that isn't in the list (another family, a mock) goes above the
+    tiers that cost less than it; the last tier has nothing below it.
+    """
+    base = model.removeprefix("mock-")
+    if base in tiers:
+        return [model] + tiers[tiers.index(base) + 1:]
+    return [model] + [m for m in tiers if m in cheaper_models(base, tiers)]
+
+
+def _handoff_targets(agent: Agent, graph: List[Agent]) -> Dict[str, Agent]:
+    """Handoff tool name -> agent it leads to."""
+    by_name = {a.name: a for a in graph}
+    targets = {}
+    for h in agent.handoffs:
+        if isinstance(h, Handoff):
+            if h.agent_name in by_name:
+                targets[h.tool_name] = by_name[h.agent_name]
+        else:
+            targets[Handoff.default_tool_name(h)] = h
+    return targets
+
+
+def usage_from_result(starting_agent: Agent, result, seconds: float = 0.0) -> RunUsage:
+    """Split a run's token usage by agent.
+
+    Model responses come in order; a handoff tool call in a response means the
+    next responses belong to the agent it hands off to.
+    """
+    graph = iter_agents(starting_agent)
+    current = starting_agent
+    usage = RunUsage(seconds=seconds)
+    for response in result.raw_responses:
+        model = model_name(current)
+        entry = usage.agents.setdefault(current.name, AgentUsage(agent=current.name, model=model))
+        entry.requests += response.usage.requests
+        cached = response.usage.input_tokens_details.cached_tokens or 0
+        entry.input_tokens += response.usage.input_tokens
+        entry.cached_tokens += cached
+        entry.output_tokens += response.usage.output_tokens
+        entry.cost_usd += cost_usd(model, response.usage.input_tokens, response.usage.output_tokens, cached)
+        targets = _handoff_targets(current, graph)
+        for item in response.output:
+            if getattr(item, "type", None) == "function_call" and item.name in targets:
+                current = targets[item.name]
+                break
+    return usage
+
+# --- Aggregation ---
+
+class UsageTracker:
+    """Totals per agent since start, plus a rolling window of recent runs."""
+
+    def __init__(self, window_seconds: float = BUDGET_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.totals: Dict[str, AgentUsage] = {}
+        self.runs = 0
+        self._recent: Deque[Tuple[float, float, float]] = deque() # (time, cost, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, usage: RunUsage):
+        now = time.time()
+        with self._lock:
+            self.runs += 1
+            for name, agent_usage in usage.agents.items():
+                total = self.totals.setdefault(name, AgentUsage(agent=name, model=agent_usage.model))
+                total.model = agent_usage.model
+                total.requests += agent_usage.requests
+                total.input_tokens += agent_usage.input_tokens
+                total.cached_tokens += agent_usage.cached_tokens
+                total.output_tokens += agent_usage.output_tokens
+                total.cost_usd += agent_usage.cost_usd
+            self._recent.append((now, usage.cost_usd, usage.seconds))
+            self._trim(now)
+
+    def _trim(self, now: float):
+        while self._recent and self._recent[0][0] < now - self.window_seconds:
+            self._recent.popleft()
+
+    def window(self) -> Dict[str, float]:
+        """Spend and latency of the runs in the rolling window."""
+        with self._lock:
+            self._trim(time.time())
+            recent = list(self._recent)
+        return {
+            "runs": len(recent),
+            "spend_usd": sum(cost for _, cost, _ in recent),
+            "p95_seconds": percentile([seconds for _, _, seconds in recent], 95),
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            agents = {name: usage.model_dump() for name, usage in self.totals.items()}
+        return {
+            "runs": self.runs,
+            "input_tokens": sum(a["input_tokens"] for a in agents.values()),
+            "cached_tokens": sum(a["cached_tokens"] for a in agents.values()),
+            "output_tokens": sum(a["output_tokens"] for a in agents.values()),
+            "cost_usd": sum(a["cost_usd"] for a in agents.values()),
+            "agents": agents,
+            "window": self.window(),
+        }
+
+
+_shared: Optional[UsageTracker] = None
+_shared_lock = threading.Lock()
+
+def shared_tracker() -> UsageTracker:
+    """The process's usage tracker: every budget records into it unless given its own."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = UsageTracker()
+        return _shared
+
+
+def print_usage_summary(tracker: UsageTracker):
+    """Print tokens and cost per agent."""
+    summary = tracker.summary()
+    print("\n" + "="*50)
+    print(f"USAGE: {summary['runs']} runs | {summary['input_tokens']} input + {summary['output_tokens']} output tokens"
+          f" | ${summary['cost_usd']:.4f}")
+    for agent in summary["agents"].values():
+        print(f"  {agent['agent']} ({agent['model']}): {agent['requests']} requests, "
+              f"{agent['input_tokens']} in ({agent['cached_tokens']} cached) / {agent['output_tokens']} out, "
+              f"${agent['cost_usd']:.4f}")
+
+# --- Budget controller ---
+
+class BudgetController:
+    """Moves runs down a list of model tiers when over budget, and back up when there is room.
+
+    Hysteresis: we only go back up when spend and latency are below `recover_ratio`
+    of the budget, and never change tier more often than every `cooldown_seconds`.
+    """
+
+    def __init__(
+        self,
+        agents: List[Agent],
+        tiers: Optional[List[str]] = None,
+        spend_budget_usd: float = SPEND_BUDGET_USD,
+        latency_budget_seconds: float = LATENCY_BUDGET_SECONDS,
+        recover_ratio: float = 0.7,
+        cooldown_seconds: float = 60.0,
+        resolve: Optional[Callable[[str], Any]] = None,
+        tracker: Optional[UsageTracker] = None,
+    ):
+        self.roots = list(agents)
+        # Every agent of every graph (handoffs included)
+        self.agents = []
+        for agent in agents:
+            self.agents.extend(a for a in iter_agents(agent) if not any(a is b for b in self.agents))
+        # Tier 0 is whatever model the agents have now
+        self.tiers = tiers or tiers_below(model_name(self.agents[0]))
+        self.spend_budget_usd = spend_budget_usd
+        self.latency_budget_seconds = latency_budget_seconds
+        self.recover_ratio = recover_ratio
+        self.cooldown_seconds = cooldown_seconds
+        # Travel, recipe and entertainment runs all count toward one spend budget
+        self.tracker = tracker or shared_tracker()
+        self.tier = 0
+        self.changes: List[Dict[str, Any]] = []
+        self._resolve = resolve
+        # Agent name -> agent, per tier (tier 0 = the agents we were given)
+        self._graphs: Dict[int, Dict[str, Agent]] = {0: {a.name: a for a in self.agents}}
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def current_model(self) -> str:
+        return self.tiers[self.tier]
+
+    def _graph(self, tier: int) -> Dict[str, Agent]:
+        # One copy of the agents per tier, made the first time the tier is used
+        with self._lock:
+            if tier not in self._graphs:
+                name = self.tiers[tier]
+                model = self._resolve(name) if self._resolve else name
+                copies: Dict[int, Agent] = {}
+                graph = {}
+                for root in self.roots:
+                    graph.update((a.name, a) for a in iter_agents(with_model(root, model, copies)))
+                self._graphs[tier] = graph
+            return self._graphs[tier]
+
+    def agent_for(self, agent: Agent) -> Agent:
+        """The agent to run now: the same agent (by name) on the current tier's model."""
+        return self._graph(self.tier).get(agent.name, agent)
+
+    def record(self, starting_agent: Agent, result, seconds: float) -> RunUsage:
+        """Count a finished run and switch tier if needed."""
+        usage = usage_from_result(starting_agent, result, seconds)
+        self.tracker.record(usage)
+        self.update()
+        return usage
+
+    def update(self):
+        window = self.tracker.window()
+        over_spend = window["spend_usd"] > self.spend_budget_usd
+        over_latency = window["p95_seconds"] > self.latency_budget_seconds
+        room = (
+            window["spend_usd"] < self.spend_budget_usd * self.recover_ratio
+            and window["p95_seconds"] < self.latency_budget_seconds * self.recover_ratio
+        )
+        # A smaller model is both cheaper and faster, so either overrun moves one tier down
+        reason = "over spend budget" if over_spend else "over latency budget" if over_latency else None
+        with self._lock:
+            if time.time() - self._last_change < self.cooldown_seconds:
+                return
+            if reason and self.tier < len(self.tiers) - 1:
+                self._set_tier(self.tier + 1, reason, window)
+            elif reason and (not self.changes or self.changes[-1]["tier"] != self.tier):
+                # Already on the smallest model (e.g. gpt-4.1-nano): say so once, there is nowhere to go
+                self._set_tier(self.tier, f"{reason}, no smaller model in MODEL_TIERS", window)
+            elif room and self.tier > 0:
+                self._set_tier(self.tier - 1, "back under budget", window)
+
+    def _set_tier(self, tier: int, reason: str, window: Dict[str, float]):
+        self.tier = tier
+        self._last_change = time.time()
+        self.changes.append({"time": self._last_change, "tier": tier, "model": self.tiers[tier], "reason": reason,
+                             **window})
+
+    async def run(
+        self,
+        agent: Agent,
+        query: str,
+        run: Callable[..., Awaitable[Any]] = Runner.run,
+        **run_kwargs,
+    ):
+        """Drop-in replacement for Runner.run that counts usage and applies the budget."""
+        agent = self.agent_for(agent)
+        start = time.perf_counter()
+        result = await run(agent, query, **run_kwargs)
+        self.record(agent, result, time.perf_counter() - start)
+        return result
+
+    def routed(self, router) -> Callable[..., Awaitable[Any]]:
+        """A run function that goes through the fast router and this budget."""
+        return functools.partial(router.run, run=self.run)
@@ -8,6 +8,8 @@
 from agents import Agent, Runner
 from dotenv import load_dotenv
 
+from model_factory import resolve_model
+
 # --- Load environment variables ---
 load_dotenv()
 
@@ -15,7 +17,7 @@ load_dotenv()
 agent = Agent(
     name="Assistant", 
     instructions="You are a helpful assistant", # This is the system prompt that tells the AI how to behave, change it if you want
-    model="gpt-4.1-nano" # Change the model here
+    model=resolve_model("gpt-4.1-nano") # Change the model here (MOCK_MODEL=1 runs offline)
 )
 
 # --- Main --
@@ -32,4 +34,4 @@ def main():
 # This ensures that the main() function only runs when this script is executed directly,
 # not when it is imported as a module in another file.
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,16 +6,26 @@
 
 # Imports
 import asyncio
+import functools
 from typing import List
 from pydantic import BaseModel, Field
 from agents import Agent, Runner
 from dotenv import load_dotenv
 import os
+import time
+
+from batch_runner import run_batch, print_batch_summary
+from model_factory import resolve_model
+from tracing_export import install_tracing
+from usage_tracking import BudgetController, print_usage_summary
+from prompt_registry import register_agents
+from cascade import CASCADE, ModelCascade, output_check, print_cascade_stats
+from rate_limiter import RATE_LIMIT, print_rate_limit_stats
 
 # Load environment variables
 load_dotenv()
 
-model = os.getenv('MODEL_CHOICE', 'gpt-4o-mini')
+model = resolve_model(os.getenv('MODEL_CHOICE', 'gpt-4o-mini'))
 
 # --- Models for structured outputs ---
 # This is a template for the Agent's response
@@ -26,6 +36,16 @@ class TravelPlan(BaseModel):
     activities: List[str] = Field(description="List of recommended activities")
     notes: str = Field(description="Additional notes or recommendations")
 
+# Rules the answer must follow (checked by the model cascade, see cascade.py)
+@output_check(TravelPlan)
+def check_travel_plan(plan: TravelPlan) -> List[str]:
+    problems = []
+    if plan.budget <= 0:
+        problems.append("budget must be positive")
+    if plan.duration_days <= 0:
+        problems.append("duration_days must be positive")
+    return problems
+
 # --- Main Travel Agent ---
 
 travel_agent = Agent(
@@ -47,24 +67,43 @@ travel_agent = Agent(
     output_type=TravelPlan # Here we are telling the agent: use this TravelPlan template 
 )
 
+# Clean up the instructions and fix the tool order so every request starts with the same bytes
+register_agents(travel_agent)
+
 # --- Main Function ---
 # Defines the main asynchronous function to run multiple travel agent queries concurrently.
 # It uses 'await' to handle agent responses without blocking the program.
 async def main():
+    # Keep a span tree of every run (timings, tokens, output sizes); TRACE_EXPORT_PATH=traces.jsonl saves them
+    install_tracing()
+    
+    # Counts tokens and cost per agent, and moves to a cheaper model when over budget
+    budget = BudgetController([travel_agent], resolve=resolve_model)
+    
+    # CASCADE=1: try the smallest model first, bigger ones only when the answer fails a check
+    cascade = ModelCascade(travel_agent) if CASCADE else None
+    run = functools.partial(budget.run, run=cascade.run) if cascade else budget.run
+    
     # Example queries to test the system
     queries = [
         "I'm planning a trip to Dubai for 5 days with a budget of $5000. What should I do there?",
         "I want to visit London for a week with a budget of $2000. What activities do you recommend?"
     ]
-    # Iterates through each query, running the travel agent for each one.
-    for query in queries:
+    # Runs the travel agent for all queries at the same time (up to 5 at once).
+    # The results come back in the same order as the queries.
+    start = time.perf_counter()
+    results = await run_batch(travel_agent, queries, concurrency=5, run=run)
+    wall_seconds = time.perf_counter() - start
+
+    for result in results:
         print("\n" + "="*50)
-        print(f"QUERY: {query}")
-        # Runs the travel agent with the current query and waits for the result.
-        result = await Runner.run(travel_agent, query)
+        print(f"QUERY: {result.query}")
+        if not result.ok:
+            print(f"\n❌ ERROR: {result.error}")
+            continue
         # Prints the final output of the travel plan.
         print("\nFINAL RESPONSE:")
-        travel_plan = result.final_output
+        travel_plan = result.output
         
         # Format the output in a nicer way
         print(f"\n🌍 TRAVEL PLAN FOR {travel_plan.destination.upper()} 🌍")
@@ -77,5 +116,12 @@ async def main():
         # Prints any additional notes.
         print(f"\n📝 NOTES: {travel_plan.notes}")
 
+    print_batch_summary(results, wall_seconds)
+    print_usage_summary(budget.tracker)
+    if cascade:
+        print_cascade_stats(cascade)
+    if RATE_LIMIT:
+        print_rate_limit_stats()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -5,17 +5,29 @@
 # ==============================================================================
 
 import asyncio
+import functools
 import json
 from typing import List
 from pydantic import BaseModel, Field
 from agents import Agent, Runner, function_tool
 from dotenv import load_dotenv
 import os
+import time
+
+from batch_runner import run_batch, print_batch_summary
+from model_factory import resolve_model
+from tracing_export import install_tracing
+from usage_tracking import BudgetController, print_usage_summary
+from prompt_registry import register_agents
+from tool_executor import nonblocking_tool, print_tool_stats
+from tool_cache import cached_tool, print_tool_cache_stats
+from cascade import CASCADE, ModelCascade, output_check, print_cascade_stats
+from rate_limiter import RATE_LIMIT, print_rate_limit_stats
 
 # Load environment variables
 load_dotenv()
 
-model = os.getenv('MODEL_CHOICE', 'gpt-4.1-nano')
+model = resolve_model(os.getenv('MODEL_CHOICE', 'gpt-4.1-nano'))
 
 # --- Models for structured outputs ---
 
@@ -26,9 +38,21 @@ class RecipeRecommendation(BaseModel):
     ingredients: List[str] = Field(description="List of ingredients needed")
     instructions: str = Field(description="Simple cooking instructions")
 
+# Rules the answer must follow (checked by the model cascade, see cascade.py)
+@output_check(RecipeRecommendation)
+def check_recipe(recipe: RecipeRecommendation) -> List[str]:
+    problems = []
+    if recipe.difficulty_level not in ("Easy", "Medium", "Hard"):
+        problems.append("difficulty_level must be Easy, Medium or Hard")
+    if recipe.cooking_time_minutes <= 0:
+        problems.append("cooking_time_minutes must be positive")
+    return problems
+
 # --- Tools ---
 # Here is a simple python function called get_ingredient_info, you can experiment with chatgpt
+@cached_tool(case_insensitive=("ingredient",))
 @function_tool
+@nonblocking_tool
 def get_ingredient_info(ingredient: str) -> str:
     """Get basic information about a cooking ingredient including tips."""
     # Simple ingredient database
@@ -74,23 +98,42 @@ recipe_agent = Agent(
     output_type=RecipeRecommendation
 )
 
+# Clean up the instructions and fix the tool order so every request starts with the same bytes
+register_agents(recipe_agent)
+
 # --- Main Function ---
 
 async def main():
+    # Keep a span tree of every run (timings, tokens, output sizes); TRACE_EXPORT_PATH=traces.jsonl saves them
+    install_tracing()
+    
+    # Counts tokens and cost per agent, and moves to a cheaper model when over budget
+    budget = BudgetController([recipe_agent], resolve=resolve_model)
+    
+    # CASCADE=1: try the smallest model first, bigger ones only when the answer fails a check
+    cascade = ModelCascade(recipe_agent) if CASCADE else None
+    run = functools.partial(budget.run, run=cascade.run) if cascade else budget.run
+    
     # Example queries to test the system
     queries = [
         "I have chicken and rice at home. What's an easy recipe I can make?",
         "I'm a complete beginner and only have eggs and bread. Help me make something simple!"
     ]
     
-    for query in queries:
+    # All queries run at the same time, results come back in order
+    start = time.perf_counter()
+    results = await run_batch(recipe_agent, queries, concurrency=5, run=run)
+    wall_seconds = time.perf_counter() - start
+    
+    for result in results:
         print("\n" + "="*50)
-        print(f"QUERY: {query}")
-        
-        result = await Runner.run(recipe_agent, query)
+        print(f"QUERY: {result.query}")
+        if not result.ok:
+            print(f"\n❌ ERROR: {result.error}")
+            continue
         
         print("\nFINAL RESPONSE:")
-        recipe = result.final_output
+        recipe = result.output
         
         # Format the output in a nice way
         print(f"\n🍳 RECIPE RECOMMENDATION: {recipe.recipe_name.upper()} 🍳")
@@ -103,5 +146,14 @@ async def main():
         
         print(f"\n👨‍🍳 INSTRUCTIONS:\n{recipe.instructions}")
 
+    print_batch_summary(results, wall_seconds)
+    print_usage_summary(budget.tracker)
+    print_tool_stats()
+    print_tool_cache_stats()
+    if cascade:
+        print_cascade_stats(cascade)
+    if RATE_LIMIT:
+        print_rate_limit_stats()
+
 if __name__ == "__main__":
     asyncio.run(main())